@@ -0,0 +1,43 @@
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from src.channel_cache import ChannelCache, ChannelSnapshot
+from src.channel_list import Channel
+
+CHANNELS = 50_000
+MEMBERS = 5_000
+WORDS = ['python', 'linux', 'help', 'чат', 'dev', 'music', 'games', 'news', 'welcome', 'rules']
+
+
+def make_snapshot() -> ChannelSnapshot:
+    channels = [
+        Channel(f'#channel{i}', random.randrange(1, 2000), ' '.join(random.choices(WORDS, k=8)))
+        for i in range(CHANNELS)
+    ]
+    members = {'#big': [f'{random.choice(["@", "+", ""])}user{i}' for i in range(MEMBERS)]}
+    return ChannelSnapshot(time.time(), channels, members)
+
+
+async def main():
+    random.seed(1)
+    snapshot = make_snapshot()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ChannelCache(directory)
+        started = time.perf_counter()
+        cache.save('irc.example', 6667, snapshot)
+        await cache.flush()
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        loaded = await cache.load('irc.example', 6667)
+        duration = time.perf_counter() - started
+        size = os.path.getsize(cache.path('irc.example', 6667)) / 1024
+    assert loaded == snapshot
+    print(f'{CHANNELS} channels, {MEMBERS} members: {size:.0f} KiB on disk')
+    print(f'save {saved * 1000:7.1f} ms, load {duration * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import random
+import time
+
+from src.codec import LineDecoder
+
+LINES = 500_000
+LEGACY_SHARE = 0.05
+WORDS = ['hello', 'world', 'привет', 'как', 'дела', 'всё', 'хорошо', 'irc', 'канал', 'сообщение']
+
+
+def make_lines() -> list[bytes]:
+    lines = []
+    for i in range(LINES):
+        text = ' '.join(random.choices(WORDS, k=8))
+        line = f':nick{i % 200}!user@host PRIVMSG #channel :{text}\r\n'
+        if random.random() < LEGACY_SHARE:
+            lines.append(line.encode(random.choice(['cp1251', 'koi8-r'])))
+        elif i % 2:
+            lines.append(line.encode())
+        else:
+            lines.append(f':server 372 nick :message of the day line {i}\r\n'.encode())
+    return lines
+
+
+# What _consume did before: one encoding, undecodable lines dropped
+def legacy_decode(lines: list[bytes]) -> int:
+    decoded = 0
+    for data in lines:
+        try:
+            data.decode('utf-8')
+            decoded += 1
+        except UnicodeDecodeError:
+            pass
+    return decoded
+
+
+def decoder_decode(lines: list[bytes]) -> int:
+    decoder = LineDecoder('utf-8')
+    for data in lines:
+        decoder.decode(data)
+    return decoder.lines
+
+
+def measure(name: str, decode, lines: list[bytes]):
+    started = time.perf_counter()
+    decoded = decode(lines)
+    duration = time.perf_counter() - started
+    print(f'{name:10} {len(lines) / duration:10.0f} lines/s, {len(lines) - decoded} lines lost')
+
+
+def main():
+    random.seed(1)
+    lines = make_lines()
+    measure('legacy', legacy_decode, lines)
+    measure('decoder', decoder_decode, lines)
+    clean = [data for data in lines if data.isascii()]
+    measure('ascii only', decoder_decode, clean)
+
+
+if __name__ == '__main__':
+    main()
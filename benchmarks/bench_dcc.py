@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from src.dcc import DccManager, dcc_ack
+
+SIZE = 256 * 1024 * 1024
+CONCURRENT = 4
+# Block size of the classic DCC clients, each block acknowledged before the next one
+NAIVE_BLOCK = 4096
+
+
+async def naive_transfer(source: str, target: str):
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        with open(source, 'rb') as file:
+            while block := file.read(NAIVE_BLOCK):
+                writer.write(block)
+                await writer.drain()
+                await reader.readexactly(4)
+        writer.close()
+
+    server = await asyncio.start_server(serve, '127.0.0.1', 0)
+    reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+    received = 0
+    with open(target, 'wb') as file:
+        while data := await reader.read(NAIVE_BLOCK):
+            file.write(data)
+            received += len(data)
+            writer.write(dcc_ack(received))
+    writer.close()
+    server.close()
+
+
+async def dcc_transfers(directory: str, sources: list[str]):
+    sender = DccManager(directory)
+    receiver = DccManager(os.path.join(directory, 'in'), auto_accept=True)
+    for source in sources:
+        [command] = await sender.offer('receiver', source)
+        await receiver.on_ctcp('sender', command.parameters[1][1:])
+    await asyncio.gather(*(transfer._task for transfer in sender.transfers + receiver.transfers))
+    assert all(transfer.completed == SIZE for transfer in receiver.transfers)
+
+
+def report(name: str, count: int, duration: float):
+    print(f'{name:<28} {count * SIZE / duration / 1024 / 1024:8.0f} MB/s')
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, 'in'))
+        sources = []
+        for index in range(CONCURRENT):
+            sources.append(os.path.join(directory, f'file{index}.bin'))
+            with open(sources[-1], 'wb') as file:
+                file.write(os.urandom(SIZE))
+
+        started = time.perf_counter()
+        await naive_transfer(sources[0], os.path.join(directory, 'in', 'naive.bin'))
+        report('read/write, 4 KiB blocks', 1, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await dcc_transfers(directory, sources[:1])
+        report('sendfile, 1 MiB buffer', 1, time.perf_counter() - started)
+
+        for name in os.listdir(os.path.join(directory, 'in')):
+            os.remove(os.path.join(directory, 'in', name))
+        started = time.perf_counter()
+        await dcc_transfers(directory, sources)
+        report(f'sendfile, {CONCURRENT} concurrent', CONCURRENT, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import random
+import re
+import time
+from fnmatch import fnmatchcase
+
+from src.filters import DROP, HIGHLIGHT, MASK, REGEX, ROUTE, WORD, FilterEngine, FilterRule
+
+LINES = 200_000
+WORDS = ['hello', 'world', 'python', 'release', 'deploy', 'server', 'channel', 'please', 'thanks', 'build']
+
+
+def make_rules() -> list[FilterRule]:
+    rules = [FilterRule(WORD, f'keyword{i}', HIGHLIGHT) for i in range(300)]
+    rules += [FilterRule(MASK, f'*!*@host{i}.spam.example', DROP) for i in range(200)]
+    rules += [FilterRule(MASK, f'spambot{i}*!*@*', DROP) for i in range(20)]
+    rules += [FilterRule(REGEX, fr'ticket-{i}\d+', ROUTE, 'tickets') for i in range(20)]
+    return rules
+
+
+def make_lines() -> list[tuple[str, str]]:
+    lines = []
+    for i in range(LINES):
+        words = random.choices(WORDS, k=12)
+        if i % 50 == 0:
+            words.append(f'keyword{random.randrange(300)}')
+        if i % 200 == 0:
+            words.append(f'ticket-{random.randrange(20)}42')
+        host = f'host{random.randrange(1000)}.spam.example' if i % 100 == 0 else 'users.example'
+        lines.append((f'nick{i % 500}!user@{host}', ' '.join(words)))
+    return lines
+
+
+# Every rule checked on its own for every line
+def naive_match(rules: list[FilterRule], prefix: str, text: str) -> bool:
+    matched = False
+    words = text.lower().split()
+    for rule in rules:
+        if rule.kind == WORD:
+            matched |= rule.pattern in words
+        elif rule.kind == MASK:
+            matched |= fnmatchcase(prefix.lower(), rule.pattern.lower())
+        else:
+            matched |= re.search(rule.pattern, text, re.IGNORECASE) is not None
+    return matched
+
+
+def measure(name: str, match, lines: list[tuple[str, str]]):
+    started = time.perf_counter()
+    matched = sum(1 for prefix, text in lines if match(prefix, text))
+    duration = time.perf_counter() - started
+    print(f'{name:8} {len(lines) / duration:10.0f} lines/s, {matched} matched')
+
+
+def main():
+    random.seed(1)
+    rules = make_rules()
+    lines = make_lines()
+    measure('naive', lambda prefix, text: naive_match(rules, prefix, text), lines[: LINES // 20])
+    engine = FilterEngine(rules)
+    measure('compiled', lambda prefix, text: engine.match(prefix, text, 'me') is not None, lines)
+
+
+if __name__ == '__main__':
+    main()
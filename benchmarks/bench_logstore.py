@@ -0,0 +1,47 @@
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from src.logstore import LogStore
+
+LINES = 1_000_000
+SEARCHES = 50
+WORDS = [f'word{i}' for i in range(5000)]
+
+
+async def measure(store: LogStore) -> list[float]:
+    durations = []
+    for _ in range(SEARCHES):
+        started = time.perf_counter()
+        await store.search(random.choice(WORDS), limit=100)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def main():
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as directory:
+        store = LogStore(str(Path(directory) / 'bench.sqlite3'))
+        # About three months of history for a busy channel
+        started_at = time.time() - 90 * 24 * 3600
+        started = time.perf_counter()
+        for i in range(LINES):
+            text = ' '.join(random.choices(WORDS, k=8))
+            store.append(f'#channel{i % 30}', f'<nick{i % 500}> {text}', timestamp=started_at + i * 7.8)
+        append_duration = time.perf_counter() - started
+        store.flush()
+        write_duration = time.perf_counter() - started
+
+        durations = asyncio.run(measure(store))
+        store.close()
+
+    print(f'append: {LINES / append_duration:10.0f} lines/s on the caller thread')
+    print(f'write:  {LINES / write_duration:10.0f} lines/s to disk')
+    print(f'search: p50 {statistics.median(durations) * 1000:.1f} ms, max {max(durations) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
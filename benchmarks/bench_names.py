@@ -0,0 +1,80 @@
+import asyncio
+import random
+import string
+import time
+
+from src.client import IrcClient
+from src.isupport import ISupport
+from src.membership import ChannelMembership
+
+NAMES = 10_000
+NAMES_PER_LINE = 40
+PREFIXES = ['', '', '', '', '', '', '+', '@', '@+', '%', '~@']
+PREFIX = '(qaohv)~&@%+'
+
+
+def make_names() -> list[str]:
+    letters = string.ascii_letters + '[]\\^_'
+    return [random.choice(PREFIXES) + ''.join(random.choices(letters, k=9)) for _ in range(NAMES)]
+
+
+# What _on_366 and MemberIndex._store did before: PREFIX re-parsed and scanned for every name
+def legacy_prefix(isupport: ISupport) -> dict[str, str]:
+    modes, _, prefixes = isupport.get('PREFIX', PREFIX).lstrip('(').partition(')')
+    return dict(zip(modes, prefixes))
+
+
+def legacy_parse(isupport: ISupport, names: list[str]) -> list[tuple]:
+    parsed = []
+    prefixes = ''.join(legacy_prefix(isupport).values())
+    for name in names:
+        nick = name.lstrip(prefixes)
+        prefix = next((char for char in legacy_prefix(isupport).values() if char in name[: len(name) - len(nick)]), '')
+        parsed.append((ChannelMembership.from_prefix(prefix), nick, prefix))
+    return parsed
+
+
+def compiled_parse(isupport: ISupport, names: list[str]) -> list[tuple]:
+    parsed = []
+    split_prefixes, highest_prefix = isupport.split_prefixes, isupport.highest_prefix
+    for name in names:
+        prefixes, nick = split_prefixes(name)
+        prefix = highest_prefix(prefixes)
+        parsed.append((ChannelMembership.from_prefix(prefix), nick, prefix))
+    return parsed
+
+
+async def client_names(client: IrcClient, names: list[str]) -> int:
+    await client._process_response(':nick!user@host JOIN #channel')
+    for start in range(0, len(names), NAMES_PER_LINE):
+        await client._process_response(f':host 353 nick = #channel :{" ".join(names[start:start + NAMES_PER_LINE])}')
+    await client._process_response(':host 366 nick #channel :End of /NAMES list.')
+    return len(client.channel_state('#channel').members)
+
+
+def make_client() -> IrcClient:
+    client = IrcClient('localhost', 6667, 'nick', 'utf-8', keepalive_interval=0)
+    client.isupport.update([f'PREFIX={PREFIX}', 'CHANTYPES=#&', 'CASEMAPPING=rfc1459'])
+    return client
+
+
+def measure(name: str, run) -> int:
+    started = time.perf_counter()
+    members = run()
+    duration = time.perf_counter() - started
+    print(f'{name:8} {duration * 1000:8.1f} ms, {NAMES / duration:10.0f} names/s, {members} members')
+    return members
+
+
+def main():
+    random.seed(1)
+    names = make_names()
+    isupport = make_client().isupport
+    measure('legacy', lambda: len(legacy_parse(isupport, names)))
+    measure('compiled', lambda: len(compiled_parse(isupport, names)))
+    # The whole 353/366 path, including the sorted member index
+    measure('client', lambda: asyncio.run(client_names(make_client(), names)))
+
+
+if __name__ == '__main__':
+    main()
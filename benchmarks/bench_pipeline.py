@@ -0,0 +1,95 @@
+import asyncio
+import contextlib
+import io
+import selectors
+import time
+
+from benchmarks.mock_server import MockIrcServer
+from src.client import IrcClient
+
+LINES = 20000
+IDLE_SECONDS = 2
+
+
+class CountingSelector(selectors.DefaultSelector):
+    wakeups = 0
+
+    def select(self, timeout=None):
+        CountingSelector.wakeups += 1
+        return super().select(timeout)
+
+
+class PollingIrcClient(IrcClient):
+    # The 10 ms polling loops the client used before the event-driven pipeline
+    async def _open_connection(self):
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _consume(self):
+        while True:
+            try:
+                data = await self.reader.readuntil(separator=b'\r\n')
+                await self._process_response(data.decode(self.encoding))
+            except asyncio.exceptions.IncompleteReadError:
+                break
+            await asyncio.sleep(0.01)
+
+    async def _produce(self):
+        while True:
+            if self.commands:
+                self._write_command(self.commands.popleft())
+                await self.writer.drain()
+            await asyncio.sleep(0.01)
+
+
+async def _noop(*args):
+    pass
+
+
+async def measure(client_class: type[IrcClient], lines: int) -> tuple[float, float]:
+    received = 0
+    done = asyncio.Event()
+
+    async def on_message(text):
+        nonlocal received
+        received += 1
+        if received == lines:
+            done.set()
+
+    server = MockIrcServer(f':nick!user@host PRIVMSG #bench :message {i}' for i in range(lines))
+    await server.start()
+    client = client_class(server.host, server.port, 'bench', 'utf-8', _noop, _noop, on_message)
+    await client.connect()
+    task = asyncio.create_task(client.handle())
+
+    started = time.perf_counter()
+    await done.wait()
+    throughput = lines / (time.perf_counter() - started)
+
+    CountingSelector.wakeups = 0
+    await asyncio.sleep(IDLE_SECONDS)
+    wakeups = CountingSelector.wakeups / IDLE_SECONDS
+
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    client.writer.close()
+    await server.stop()
+    return throughput, wakeups
+
+
+def run(client_class: type[IrcClient], lines: int) -> tuple[float, float]:
+    loop = asyncio.SelectorEventLoop(CountingSelector())
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return loop.run_until_complete(measure(client_class, lines))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    for name, client_class, lines in (
+        ('polling (before)', PollingIrcClient, LINES // 20),
+        ('event-driven (after)', IrcClient, LINES),
+    ):
+        throughput, wakeups = run(client_class, lines)
+        print(f'{name:>22}: {throughput:10.0f} lines/s, {wakeups:6.1f} wakeups per idle second')
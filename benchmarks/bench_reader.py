@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from benchmarks.mock_server import MockIrcServer
+from src.reader import open_line_connection
+
+LINES = 500_000
+
+
+async def read_stream(host: str, port: int) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    count = 0
+    while True:
+        try:
+            await reader.readuntil(b'\r\n')
+        except asyncio.IncompleteReadError:
+            break
+        count += 1
+        if count == LINES:
+            break
+    writer.close()
+    return count
+
+
+async def read_protocol(host: str, port: int) -> int:
+    reader, writer = await open_line_connection(host, port)
+    count = 0
+    while count < LINES and (lines := await reader.read_lines()):
+        count += len(lines)
+    writer.close()
+    return count
+
+
+async def measure(name: str, read, server: MockIrcServer):
+    started = time.perf_counter()
+    count = await read(server.host, server.port)
+    duration = time.perf_counter() - started
+    print(f'{name:13} {count / duration:10.0f} lines/s')
+
+
+async def main():
+    names = ' '.join(f'@nick{i}' for i in range(40))
+    lines = [
+        f':irc.server.net 353 me = #channel :{names}' if i % 2 else f':irc.server.net 322 me #chan{i} {i} :topic {i}'
+        for i in range(LINES)
+    ]
+    server = MockIrcServer(lines)
+    await server.start()
+    await measure('StreamReader', read_stream, server)
+    await measure('LineProtocol', read_protocol, server)
+    await server.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
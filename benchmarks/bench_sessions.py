@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+from benchmarks.mock_server import MockIrcd
+from src.manager import ConnectionManager, Session, run_sharded
+
+SESSIONS = 1000
+CHANNELS = 10
+MESSAGES = 100
+CLIENT_OPTIONS = {'scrollback_lines': 100}
+
+
+def run_ircd(connection):
+    async def main():
+        ircd = MockIrcd()
+        await ircd.start()
+        connection.send(ircd.port)
+        loop = asyncio.get_running_loop()
+        while (command := await loop.run_in_executor(None, connection.recv)) != 'stop':
+            for i in range(command):
+                for channel in ircd.channels:
+                    ircd.broadcast(channel, f':talker!user@mock PRIVMSG {channel} :message number {i}')
+        await ircd.stop()
+
+    asyncio.run(main())
+
+
+def sessions(port: int, count: int) -> list[Session]:
+    return [
+        Session('127.0.0.1', port, f'bot{i}', channels=(f'#bench{i % CHANNELS}', f'#bench{(i + 1) % CHANNELS}'))
+        for i in range(count)
+    ]
+
+
+async def wait_for(manager: ConnectionManager, key: str, expected: int) -> float:
+    started = time.perf_counter()
+    while manager.stats()[key] < expected:
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def rss_kib() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def measure(port: int, count: int, connection) -> list[str]:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    manager = ConnectionManager(**CLIENT_OPTIONS)
+    for session in sessions(port, count):
+        manager.add(session)
+    connect_duration = await wait_for(manager, 'joined_channels', 2 * count)
+    per_session = (tracemalloc.get_traced_memory()[0] - baseline) / count
+    tracemalloc.stop()
+    report = [f'connect: {count} sessions joined in {connect_duration:.2f} s, {per_session / 1024:.1f} KiB per session']
+
+    rss_before = rss_kib()
+    received = manager.stats()['lines_received']
+    expected = received + count * 2 * MESSAGES
+    connection.send(MESSAGES)
+    duration = await wait_for(manager, 'lines_received', expected)
+    lines = manager.stats()['lines_received'] - received
+    report.append(f'traffic: {lines} lines in {duration:.2f} s, {lines / duration:.0f} lines/s')
+    report.append(f'memory:  max RSS grew by {(rss_kib() - rss_before) / count:.1f} KiB per session during traffic')
+    await manager.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=SESSIONS)
+    parser.add_argument('--workers', type=int, default=1, help='shard the sessions over worker processes')
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, 4 * args.sessions + 64)), hard))
+
+    connection, ircd_connection = multiprocessing.Pipe()
+    ircd = multiprocessing.Process(target=run_ircd, args=(ircd_connection,))
+    ircd.start()
+    port = connection.recv()
+    if args.workers > 1:
+        stats = asyncio.run(run_sharded(sessions(port, args.sessions), args.workers, CLIENT_OPTIONS, duration=5))
+        report = [f'sharded: {args.workers} workers, {stats["registered"]}/{stats["sessions"]} sessions registered']
+    else:
+        report = asyncio.run(measure(port, args.sessions, connection))
+    print('\n'.join(report))
+    connection.send('stop')
+    ircd.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import random
+import time
+from collections import deque
+
+from src.splitter import split_message
+
+MAX_MESSAGE_SIZE = 384
+PASTE_BYTES = 4 * 1024 * 1024
+WORDS = ['привет', 'hello', 'мир', 'world', 'сообщение', 'message', 'é', '👍', 'x' * 600]
+
+
+# The per-character splitter the client used before
+def legacy_split(text: str) -> list[str]:
+    chunks = []
+    words = deque(text.split(' '))
+    while words:
+        if len(words[0].encode()) <= MAX_MESSAGE_SIZE:
+            block, block_size = [], -1
+            while words and block_size + 1 + len(words[0].encode()) <= MAX_MESSAGE_SIZE:
+                word = words.popleft()
+                block.append(word)
+                block_size += len(word.encode()) + 1
+            chunks.append(' '.join(block))
+        else:
+            chars = deque(words.popleft())
+            while chars:
+                block, block_size = [], 0
+                while chars and block_size + len(chars[0].encode()) <= MAX_MESSAGE_SIZE:
+                    char = chars.popleft()
+                    block.append(char)
+                    block_size += len(char.encode())
+                chunks.append(''.join(block))
+    return chunks
+
+
+def measure(name: str, split, text: str):
+    started = time.perf_counter()
+    chunks = split(text)
+    duration = time.perf_counter() - started
+    size = len(text.encode()) / 1024 / 1024
+    print(f'{name:7} {duration:6.3f} s, {size / duration:7.1f} MiB/s, {len(chunks)} messages')
+
+
+def main():
+    random.seed(1)
+    words = []
+    while sum(map(len, words)) < PASTE_BYTES // 2:
+        words.append(random.choice(WORDS))
+    text = ' '.join(words)
+    measure('legacy', legacy_split, text)
+    measure('bytes', lambda paste: split_message(paste, 'utf-8', MAX_MESSAGE_SIZE), text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from src.tls import create_context
+
+HANDSHAKES = 300
+
+
+def make_certificate(directory: str) -> tuple[str, str]:
+    certfile, keyfile = str(Path(directory) / 'cert.pem'), str(Path(directory) / 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-days', '1', '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+         '-keyout', keyfile, '-out', certfile],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    writer.write(b':localhost 001 bench :Welcome\r\n')
+    await reader.read()
+    writer.close()
+
+
+async def handshake(port: int, context: ssl.SSLContext) -> tuple[float, bool]:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection('localhost', port, ssl=context)
+    duration = time.perf_counter() - started
+    ssl_object = writer.get_extra_info('ssl_object')
+    # Reading the welcome line also processes the session ticket sent after the handshake
+    await reader.readline()
+    if hasattr(context, 'remember'):
+        context.remember(ssl_object)
+    writer.close()
+    await writer.wait_closed()
+    return duration, ssl_object.session_reused
+
+
+async def measure(name: str, port: int, contexts) -> str:
+    results = [await handshake(port, next(contexts)) for _ in range(HANDSHAKES)]
+    durations = [duration * 1000 for duration, _ in results]
+    resumed = sum(reused for _, reused in results)
+    return (
+        f'{name:9} p50 {statistics.median(durations):.2f} ms, mean {statistics.mean(durations):.2f} ms, '
+        f'{resumed}/{HANDSHAKES} resumed'
+    )
+
+
+def fresh_contexts(cafile: str):
+    while True:
+        yield create_context(cafile=cafile)
+
+
+def same_context(cafile: str):
+    context = create_context(cafile=cafile)
+    while True:
+        yield context
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = make_certificate(directory)
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(certfile, keyfile)
+        server = await asyncio.start_server(handle_connection, 'localhost', 0, ssl=server_context)
+        port = server.sockets[0].getsockname()[1]
+        print(await measure('full', port, fresh_contexts(certfile)))
+        print(await measure('resumed', port, same_context(certfile)))
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Iterable
+
+
+class MockIrcServer:
+    def __init__(
+        self, lines: Iterable[str] = (), host: str = '127.0.0.1', port: int = 0, close_when_sent: bool = False
+    ):
+        self.lines = list(lines)
+        self.close_when_sent = close_when_sent
+        self.host = host
+        self.port = port
+        self.received: list[bytes] = []
+        self._server: asyncio.base_events.Server = None
+        self._handlers: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._on_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handler = asyncio.current_task()
+        self._handlers[handler] = writer
+        handler.add_done_callback(self._handlers.pop)
+        payload = ''.join(f'{line}\r\n' for line in self.lines).encode()
+        writer.write(payload)
+        await writer.drain()
+        # Half-close: the client sees EOF, while its own writes are still read and not reset
+        if self.close_when_sent:
+            writer.write_eof()
+        try:
+            while data := await reader.readline():
+                self.received.append(data)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+# Just enough of an ircd for many sessions: registration, JOIN/NAMES, PING and channel broadcasts
+class MockIrcd(MockIrcServer):
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((), host, port)
+        self.channels: dict[str, dict[str, asyncio.StreamWriter]] = {}
+
+    def broadcast(self, channel: str, line: str):
+        data = f'{line}\r\n'.encode()
+        for writer in self.channels.get(channel, {}).values():
+            writer.write(data)
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handler = asyncio.current_task()
+        self._handlers[handler] = writer
+        handler.add_done_callback(self._handlers.pop)
+        nick = '*'
+        try:
+            while (data := await reader.readline()) and not data.startswith(b'QUIT'):
+                command, *params = data.decode().split()
+                if command == 'NICK':
+                    nick = params[0]
+                else:
+                    writer.write(self._reply(nick, command, params, writer).encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for members in self.channels.values():
+                if members.get(nick) is writer:
+                    del members[nick]
+            writer.close()
+
+    def _reply(self, nick: str, command: str, params: list[str], writer: asyncio.StreamWriter) -> str:
+        if command == 'USER':
+            return f':mock 001 {nick} :Welcome\r\n:mock 005 {nick} CHANTYPES=# :are supported\r\n'
+        if command == 'PING':
+            return f':mock PONG mock {params[0]}\r\n'
+        if command != 'JOIN':
+            return ''
+        reply = []
+        for channel in params[0].split(','):
+            members = self.channels.setdefault(channel, {})
+            members[nick] = writer
+            reply.append(
+                f':{nick}!bench@mock JOIN {channel}\r\n'
+                f':mock 353 {nick} = {channel} :{" ".join(members)}\r\n'
+                f':mock 366 {nick} {channel} :End of /NAMES list.\r\n'
+            )
+        return ''.join(reply)
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Callable
+
+from benchmarks.mock_server import MockIrcServer
+from src.client import IrcClient
+
+Result = namedtuple('Result', ['scenario', 'mode', 'lines', 'lines_per_second', 'p50', 'p99', 'peak_kib'])
+
+NICK = 'me'
+INPROCESS, SOCKET = 'inprocess', 'socket'
+MODES = (INPROCESS, SOCKET)
+CLIENT_OPTIONS = {'flood_rate': 0, 'keepalive_interval': 0}
+THRESHOLDS = 'benchmarks/thresholds.json'
+# WireTrace lines: '2026-01-01 12:00:00,000 << :server 001 me :Welcome'
+TRACE_LINE = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3} (<<|>>) (.*)$')
+
+
+def registration() -> list[str]:
+    return [f':mock 001 {NICK} :Welcome', f':mock 005 {NICK} CHANTYPES=# PREFIX=(ov)@+ :are supported']
+
+
+def names_lines(channel: str, names: list[str], per_line: int = 40) -> list[str]:
+    lines = [
+        f':mock 353 {NICK} = {channel} :{" ".join(names[i:i + per_line])}' for i in range(0, len(names), per_line)
+    ]
+    return [*lines, f':mock 366 {NICK} {channel} :End of /NAMES list.']
+
+
+def list_stream(channels: int = 10000) -> list[str]:
+    replies = (f':mock 322 {NICK} #channel{i} {i % 500} :Topic of channel {i}' for i in range(channels))
+    return [*registration(), *replies, f':mock 323 {NICK} :End of /LIST']
+
+
+def names_stream(users: int = 5000, repeat: int = 10) -> list[str]:
+    names = [f'{("@", "+", "")[i % 3]}user{i}' for i in range(users)]
+    lines = registration()
+    for _ in range(repeat):
+        # Joining again resets the member list, as after a reconnect
+        lines += [f':{NICK}!{NICK}@mock JOIN #big', *names_lines('#big', names)]
+    return lines
+
+
+def netsplit_stream(users: int = 5000, channels: int = 10) -> list[str]:
+    lines = registration()
+    for channel in range(channels):
+        names = [f'user{i}' for i in range(users) if channel in (i % channels, (i + 1) % channels)]
+        lines += [f':{NICK}!{NICK}@mock JOIN #channel{channel}', *names_lines(f'#channel{channel}', names)]
+    lines += [f':user{i}!user@leaf.mock QUIT :irc.hub.net irc.leaf.net' for i in range(users)]
+    lines += [f':user{i}!user@leaf.mock JOIN #channel{i % channels}' for i in range(users)]
+    return lines
+
+
+def privmsg_storm(messages: int = 100000, channels: int = 10, senders: int = 500) -> list[str]:
+    lines = registration()
+    lines += [f':{NICK}!{NICK}@mock JOIN #channel{channel}' for channel in range(channels)]
+    lines += [
+        f':user{i % senders}!user@mock PRIVMSG #channel{i % channels} :message number {i} in the storm'
+        for i in range(messages)
+    ]
+    return lines
+
+
+def load_recording(path: str) -> list[str]:
+    lines = []
+    with open(path, encoding='utf-8', errors='replace') as file:
+        for line in file:
+            line = line.rstrip('\r\n')
+            if match := TRACE_LINE.match(line):
+                # Only what the server sent is replayed
+                if match[1] == '<<':
+                    lines.append(match[2])
+            elif line:
+                lines.append(line)
+    return lines
+
+
+SCENARIOS: dict[str, Callable[[], list[str]]] = {
+    'list': list_stream,
+    'names': names_stream,
+    'netsplit': netsplit_stream,
+    'privmsg': privmsg_storm,
+}
+
+
+# Records how long every received line takes, from the decoded line to the last event handler
+class ReplayClient(IrcClient):
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__(host, port, NICK, 'utf-8', **CLIENT_OPTIONS)
+        self.latencies: list[float] = []
+
+    async def _process_response(self, response: str):
+        started = time.perf_counter()
+        await super()._process_response(response)
+        self.latencies.append(time.perf_counter() - started)
+
+
+async def replay_inprocess(lines: list[str]) -> ReplayClient:
+    client = ReplayClient()
+    client.update_channels()
+    for line in lines:
+        await client._process_response(line)
+    return client
+
+
+async def replay_socket(lines: list[str]) -> ReplayClient:
+    server = MockIrcServer(lines, close_when_sent=True)
+    await server.start()
+    client = ReplayClient(server.host, server.port)
+    try:
+        await client.connect()
+        await client.handle()
+    finally:
+        await server.stop()
+    return client
+
+
+async def peak_kib(lines: list[str]) -> float:
+    tracemalloc.start()
+    try:
+        await replay_inprocess(lines)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+async def measure(scenario: str, lines: list[str], mode: str) -> Result:
+    replay = replay_inprocess if mode == INPROCESS else replay_socket
+    started = time.perf_counter()
+    client = await replay(lines)
+    duration = time.perf_counter() - started
+    if len(client.latencies) != len(lines):
+        raise RuntimeError(f'{scenario}/{mode}: {len(client.latencies)} of {len(lines)} lines were handled')
+    latencies = sorted(client.latencies)
+    # Allocations are traced separately, tracing would distort the timings
+    peak = await peak_kib(lines) if mode == INPROCESS else None
+    return Result(
+        scenario, mode, len(lines), len(lines) / duration, percentile(latencies, 0.5), percentile(latencies, 0.99), peak
+    )
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def format_result(result: Result) -> str:
+    peak = f'{result.peak_kib:9.0f} KiB' if result.peak_kib is not None else f'{"-":>13}'
+    return (
+        f'{result.scenario + "/" + result.mode:20} {result.lines:7} lines {result.lines_per_second:10.0f} lines/s '
+        f'p50 {result.p50 * 1e6:7.1f} us  p99 {result.p99 * 1e6:8.1f} us  peak {peak}'
+    )
+
+
+# Limits per 'scenario/mode': min_lines_per_second, max_p99_ms and max_peak_kib; missing limits are not checked
+def check(results: list[Result], thresholds: dict[str, dict[str, float]]) -> list[str]:
+    failures = []
+    for result in results:
+        name = f'{result.scenario}/{result.mode}'
+        limits = thresholds.get(name, {})
+        if result.lines_per_second < limits.get('min_lines_per_second', 0):
+            failures.append(f'{name}: {result.lines_per_second:.0f} lines/s < {limits["min_lines_per_second"]}')
+        if result.p99 * 1000 > limits.get('max_p99_ms', float('inf')):
+            failures.append(f'{name}: p99 {result.p99 * 1000:.3f} ms > {limits["max_p99_ms"]}')
+        if result.peak_kib is not None and result.peak_kib > limits.get('max_peak_kib', float('inf')):
+            failures.append(f'{name}: peak {result.peak_kib:.0f} KiB > {limits["max_peak_kib"]}')
+    return failures
+
+
+async def run(scenarios: dict[str, list[str]], modes: tuple[str, ...]) -> list[Result]:
+    results = []
+    for scenario, lines in scenarios.items():
+        for mode in modes:
+            result = await measure(scenario, lines, mode)
+            print(format_result(result), flush=True)
+            results.append(result)
+    return results
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay server streams through IrcClient')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='may be repeated, default all')
+    parser.add_argument('--recording', action='append', default=[], metavar='PATH', help='raw lines or a --trace log')
+    parser.add_argument('--mode', choices=(*MODES, 'both'), default='both')
+    parser.add_argument('--check', nargs='?', const=THRESHOLDS, metavar='THRESHOLDS', help='fail on regressions')
+    parser.add_argument('--json', metavar='PATH', help='write the results as JSON')
+    args = parser.parse_args(argv)
+
+    names = args.scenario or ([] if args.recording else list(SCENARIOS))
+    scenarios = {name: SCENARIOS[name]() for name in names}
+    scenarios.update((path, load_recording(path)) for path in args.recording)
+    modes = MODES if args.mode == 'both' else (args.mode,)
+    results = asyncio.run(run(scenarios, modes))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump([result._asdict() for result in results], file, indent=2)
+    if args.check:
+        with open(args.check) as file:
+            failures = check(results, json.load(file))
+        for failure in failures:
+            print(f'REGRESSION {failure}', file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
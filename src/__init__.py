@@ -0,0 +1,67 @@
+# Protocol core of the client; the Qt front end lives in src.window and is never imported from here
+from src.capabilities import SaslCredentials
+from src.channel_cache import ChannelCache, ChannelSnapshot
+from src.channel_list import Channel, ChannelListUpdate
+from src.channel_state import ChannelState, ChatLine
+from src.client import Command, IrcClient
+from src.dcc import DccManager, Transfer
+from src.events import (
+    CHANNELS,
+    DISCONNECTED,
+    JOINED_CHANNELS,
+    MEMBERS,
+    MESSAGE,
+    RAW,
+    REGISTERED,
+    TRANSFER,
+    Event,
+    EventBus,
+)
+from src.filters import FilterEngine, FilterRule
+from src.logstore import LogEntry, LogStore
+from src.manager import ConnectionManager, Session
+from src.members import Member, MembersUpdate
+from src.membership import ChannelMembership
+from src.message import Message, parse_message
+from src.metrics import Metrics, WireTrace, serve_metrics
+from src.users import User, UserRegistry
+
+__all__ = [
+    'CHANNELS',
+    'DISCONNECTED',
+    'JOINED_CHANNELS',
+    'MEMBERS',
+    'MESSAGE',
+    'RAW',
+    'REGISTERED',
+    'TRANSFER',
+    'Channel',
+    'ChannelCache',
+    'ChannelListUpdate',
+    'ChannelMembership',
+    'ChannelSnapshot',
+    'ChannelState',
+    'ChatLine',
+    'Command',
+    'ConnectionManager',
+    'DccManager',
+    'Event',
+    'EventBus',
+    'FilterEngine',
+    'FilterRule',
+    'IrcClient',
+    'LogEntry',
+    'LogStore',
+    'Member',
+    'MembersUpdate',
+    'Message',
+    'Metrics',
+    'SaslCredentials',
+    'Session',
+    'Transfer',
+    'User',
+    'UserRegistry',
+    'WireTrace',
+    'parse_message',
+    'serve_metrics',
+]
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import os
+import signal
+import sys
+
+from src.capabilities import SaslCredentials
+from src.channel_cache import LIST_TTL, ChannelCache
+from src.channel_state import ChatLine
+from src.client import REALNAME, IrcClient
+from src.dcc import DccManager, Transfer
+from src.events import MESSAGE, TRANSFER
+from src.filters import DROP, HIGHLIGHT, MASK, REGEX, ROUTE, WORD, FilterEngine, FilterRule
+from src.logstore import LogStore
+from src.metrics import Metrics, WireTrace, serve_metrics
+from src.tls import TLS_PORT, create_context
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m src', description='Headless IRC client without Qt')
+    parser.add_argument('server', help='host:port')
+    parser.add_argument('nickname')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--join', action='append', default=[], metavar='CHANNEL', help='may be repeated')
+    parser.add_argument('--log', metavar='PATH', help='SQLite chat log')
+    parser.add_argument('--cache', metavar='DIRECTORY', help='keep the channel list between runs')
+    parser.add_argument(
+        '--list-ttl', type=float, default=LIST_TTL, metavar='SECONDS', help='how long a cached channel list is used'
+    )
+    parser.add_argument('--quiet', action='store_true', help='do not print chat lines')
+    parser.add_argument('--realname', default=REALNAME)
+    parser.add_argument('--tls', action='store_true', help=f'connect over TLS, port {TLS_PORT} by default')
+    parser.add_argument('--fingerprint', help='pinned SHA-256 fingerprint of the server certificate')
+    parser.add_argument('--cafile')
+    parser.add_argument('--certfile', help='client certificate for SASL EXTERNAL / CertFP')
+    parser.add_argument('--keyfile')
+    parser.add_argument('--sasl-username', help='SASL PLAIN account, the password is read from IRC_SASL_PASSWORD')
+    parser.add_argument('--sasl-external', action='store_true', help='SASL EXTERNAL with the TLS client certificate')
+    parser.add_argument('--trace', metavar='PATH', help='log every line on the wire to a rotating file')
+    parser.add_argument('--highlight', action='append', default=[], metavar='WORD', help='may be repeated')
+    parser.add_argument('--ignore', action='append', default=[], metavar='MASK', help='nick!user@host glob')
+    parser.add_argument(
+        '--route', action='append', default=[], metavar='REGEX=BUFFER', help='move matching messages to BUFFER'
+    )
+    parser.add_argument('--dcc-dir', metavar='DIRECTORY', help='accept DCC file transfers into DIRECTORY')
+    parser.add_argument('--dcc-accept', action='store_true', help='start offered transfers without asking')
+    parser.add_argument('--dcc-address', help='address put into our DCC offers, the local one by default')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on 127.0.0.1:PORT/metrics')
+    return parser.parse_args(argv)
+
+
+def make_filters(args: argparse.Namespace) -> FilterEngine:
+    rules = [FilterRule(WORD, word, HIGHLIGHT) for word in args.highlight]
+    rules += [FilterRule(MASK, mask, DROP) for mask in args.ignore]
+    for route in args.route:
+        pattern, _, buffer = route.rpartition('=')
+        rules.append(FilterRule(REGEX, pattern, ROUTE, buffer))
+    return FilterEngine(rules)
+
+
+async def main(args: argparse.Namespace):
+    host, _, port = args.server.partition(':')
+    log_store = LogStore(args.log) if args.log else None
+    sasl = None
+    if args.sasl_external:
+        sasl = SaslCredentials('EXTERNAL')
+    elif args.sasl_username:
+        sasl = SaslCredentials('PLAIN', args.sasl_username, os.environ.get('IRC_SASL_PASSWORD', ''))
+    tls = None
+    if args.tls or args.fingerprint or args.certfile:
+        tls = create_context(args.fingerprint is None, args.cafile, args.certfile, args.keyfile)
+    client = IrcClient(
+        host,
+        port or (TLS_PORT if tls else 6667),
+        args.nickname,
+        args.encoding,
+        log_store=log_store,
+        realname=args.realname,
+        sasl=sasl,
+        tls=tls,
+        fingerprint=args.fingerprint,
+        metrics=Metrics() if args.metrics_port else None,
+        trace=WireTrace(args.trace) if args.trace else None,
+        filters=make_filters(args),
+        channel_cache=ChannelCache(args.cache, args.list_ttl) if args.cache else None,
+        dcc=DccManager(args.dcc_dir, args.dcc_address, args.dcc_accept) if args.dcc_dir else None,
+    )
+    server = await serve_metrics(client.metrics, port=args.metrics_port) if args.metrics_port else None
+
+    if not args.quiet:
+        @client.events.on(MESSAGE)
+        async def print_line(line: ChatLine):
+            mark = '!' if line.highlight else ''
+            print(f'{mark}[{line.channel or "*"}] {line.text}', flush=True)
+
+        @client.events.on(TRANSFER)
+        async def print_transfer(transfer: Transfer):
+            speed = transfer.throughput / 1024 / 1024
+            print(f'[dcc] {transfer!r} {transfer.progress:.0%} {speed:.1f} MB/s {transfer.error or ""}', flush=True)
+
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, client.close)
+    # Held until the server accepts the registration
+    for channel in args.join:
+        client.join(channel)
+    try:
+        await client.run()
+    finally:
+        if server is not None:
+            server.close()
+        if client.trace is not None:
+            client.trace.close()
+        if client.channel_cache is not None:
+            await client.channel_cache.flush()
+        if client.dcc is not None:
+            await client.dcc.close()
+        if log_store is not None:
+            log_store.close()
+
+
+def run(argv: list[str] = None):
+    args = parse_args(argv)
+    if uvloop is not None:
+        uvloop.run(main(args))
+    else:
+        asyncio.run(main(args))
+
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,30 @@
+import random
+from typing import Callable
+
+INITIAL_DELAY = 1.0
+MAX_DELAY = 60.0
+FACTOR = 2.0
+
+
+# Exponential backoff with random jitter so clients dropped together don't reconnect together
+class Backoff:
+    def __init__(
+        self,
+        initial: float = INITIAL_DELAY,
+        maximum: float = MAX_DELAY,
+        factor: float = FACTOR,
+        randomize: Callable[[float, float], float] = random.uniform,
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.randomize = randomize
+        self.attempts = 0
+
+    def next(self) -> float:
+        ceiling = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        return self.randomize(self.initial / 2, ceiling)
+
+    def reset(self):
+        self.attempts = 0
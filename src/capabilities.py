@@ -0,0 +1,127 @@
+import base64
+from collections import namedtuple
+from datetime import datetime
+
+from src.command_queue import Command
+
+WANTED_CAPABILITIES = (
+    'away-notify',
+    'batch',
+    'chghost',
+    'echo-message',
+    'message-tags',
+    'multi-prefix',
+    'server-time',
+    'sasl',
+)
+SASL_MECHANISMS = ('PLAIN', 'EXTERNAL')
+SASL_CHUNK_SIZE = 400
+
+SaslCredentials = namedtuple('SaslCredentials', ['mechanism', 'username', 'password'], defaults=['', ''])
+# timer: replays a batch that never ends once BATCH_TIMEOUT has passed since BATCH +ref
+Batch = namedtuple('Batch', ['type', 'params', 'messages', 'timer'])
+BATCH_TIMEOUT = 60
+
+
+def parse_capabilities(text: str) -> dict[str, str]:
+    capabilities = {}
+    for capability in text.split():
+        name, _, value = capability.partition('=')
+        capabilities[name] = value
+    return capabilities
+
+
+def server_time(tags: dict[str, str]) -> float | None:
+    try:
+        return datetime.fromisoformat(tags['time'].replace('Z', '+00:00')).timestamp()
+    except (KeyError, ValueError):
+        return None
+
+
+def sasl_payload(credentials: SaslCredentials) -> bytes:
+    if credentials.mechanism == 'PLAIN':
+        return f'{credentials.username}\0{credentials.username}\0{credentials.password}'.encode()
+    # EXTERNAL: the identity comes from the TLS client certificate
+    return b''
+
+
+def authenticate_commands(payload: bytes) -> list[Command]:
+    encoded = base64.b64encode(payload).decode()
+    chunks = [encoded[i:i + SASL_CHUNK_SIZE] for i in range(0, len(encoded), SASL_CHUNK_SIZE)]
+    # An empty or exactly chunk-sized last piece has to be terminated with '+'
+    if not chunks or len(chunks[-1]) == SASL_CHUNK_SIZE:
+        chunks.append('+')
+    return [Command('AUTHENTICATE', [chunk]) for chunk in chunks]
+
+
+# CAP LS 302 negotiation and SASL; every step returns the commands to send next
+class CapabilityNegotiation:
+    def __init__(self, sasl: SaslCredentials = None, wanted: tuple[str, ...] = WANTED_CAPABILITIES):
+        self.sasl = sasl
+        self.wanted = wanted
+        self.available: dict[str, str] = {}
+        self.enabled: set[str] = set()
+        self.negotiating = False
+
+    def __contains__(self, capability: str) -> bool:
+        return capability in self.enabled
+
+    def start(self) -> list[Command]:
+        self.available.clear()
+        self.enabled.clear()
+        self.negotiating = True
+        return [Command('CAP', ['LS', '302'])]
+
+    def end(self) -> list[Command]:
+        if not self.negotiating:
+            return []
+        self.negotiating = False
+        return [Command('CAP', ['END'])]
+
+    def on_cap(self, params: list[str]) -> list[Command]:
+        if len(params) < 3:
+            return []
+        subcommand, capabilities = params[1].upper(), parse_capabilities(params[-1])
+        if subcommand == 'LS':
+            self.available.update(capabilities)
+            # '*' before the list means more LS lines follow
+            return [] if params[2] == '*' else self._request(self.available) or self.end()
+        if subcommand == 'ACK':
+            return self._on_ack(capabilities)
+        if subcommand == 'NAK':
+            return self.end()
+        if subcommand == 'NEW':
+            self.available.update(capabilities)
+            return self._request(capabilities)
+        if subcommand == 'DEL':
+            for name in capabilities:
+                self.available.pop(name, None)
+                self.enabled.discard(name)
+        return []
+
+    def on_authenticate(self, param: str) -> list[Command]:
+        if param != '+' or self.sasl is None:
+            return []
+        return authenticate_commands(sasl_payload(self.sasl))
+
+    def _request(self, capabilities: dict[str, str]) -> list[Command]:
+        requested = [name for name in self.wanted if name in capabilities and name not in self.enabled]
+        if 'sasl' in requested and not self._sasl_supported(capabilities['sasl']):
+            requested.remove('sasl')
+        return [Command('CAP', ['REQ', ':' + ' '.join(requested)])] if requested else []
+
+    def _sasl_supported(self, mechanisms: str) -> bool:
+        if self.sasl is None or not self.negotiating or self.sasl.mechanism not in SASL_MECHANISMS:
+            return False
+        # CAP 302 servers may list their mechanisms; older ones advertise a bare 'sasl'
+        return not mechanisms or self.sasl.mechanism in mechanisms.split(',')
+
+    def _on_ack(self, capabilities: dict[str, str]) -> list[Command]:
+        for name in capabilities:
+            if name.startswith('-'):
+                self.enabled.discard(name[1:])
+            else:
+                self.enabled.add(name)
+        if 'sasl' in capabilities and self.negotiating:
+            return [Command('AUTHENTICATE', [self.sasl.mechanism])]
+        return self.end()
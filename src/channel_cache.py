@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import zlib
+from collections import namedtuple
+
+from src.channel_list import Channel
+
+# 2: client_count is stored as a number
+CACHE_VERSION = 2
+# Seconds before a cached LIST is requested again
+LIST_TTL = 3600
+
+# time: when channels was received; members: casemapped channel -> 'prefix+nick' names
+ChannelSnapshot = namedtuple('ChannelSnapshot', ['time', 'channels', 'members'])
+
+
+def empty_snapshot() -> ChannelSnapshot:
+    return ChannelSnapshot(0.0, [], {})
+
+
+# Last LIST result and member lists per server, zlib-compressed JSON in one file per host and port.
+# Reads and writes run in the default executor, writes replace the file atomically.
+class ChannelCache:
+    def __init__(self, directory: str, ttl: float = LIST_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._writes: set[asyncio.Future] = set()
+
+    def path(self, host: str, port: str | int) -> str:
+        return os.path.join(self.directory, f'{host}-{port}.channels')
+
+    def is_fresh(self, snapshot: ChannelSnapshot) -> bool:
+        return time.time() - snapshot.time < self.ttl
+
+    async def load(self, host: str, port: str | int) -> ChannelSnapshot:
+        return await asyncio.get_running_loop().run_in_executor(None, self.read, self.path(host, port))
+
+    # Does not wait for the disk; flush() does
+    def save(self, host: str, port: str | int, snapshot: ChannelSnapshot):
+        # The client keeps changing its snapshot while the copy is written
+        snapshot = snapshot._replace(channels=list(snapshot.channels), members=dict(snapshot.members))
+        future = asyncio.get_running_loop().run_in_executor(None, self.write, self.path(host, port), snapshot)
+        self._writes.add(future)
+        future.add_done_callback(self._writes.discard)
+
+    async def flush(self):
+        if self._writes:
+            await asyncio.gather(*self._writes)
+
+    @staticmethod
+    def read(path: str) -> ChannelSnapshot:
+        try:
+            with open(path, 'rb') as file:
+                data = json.loads(zlib.decompress(file.read()))
+            if data.get('version') != CACHE_VERSION:
+                return empty_snapshot()
+            channels = [Channel(*channel) for channel in data['channels']]
+            return ChannelSnapshot(data['time'], channels, data['members'])
+        # A missing or damaged cache only costs a fresh LIST
+        except (OSError, ValueError, KeyError, TypeError, zlib.error):
+            return empty_snapshot()
+
+    @staticmethod
+    def write(path: str, snapshot: ChannelSnapshot):
+        data = {
+            'version': CACHE_VERSION,
+            'time': snapshot.time,
+            'channels': snapshot.channels,
+            'members': snapshot.members,
+        }
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False) as file:
+            file.write(zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode(), 6))
+        os.replace(file.name, path)
@@ -0,0 +1,98 @@
+import time
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+# client_count is parsed once from RPL_LIST, see parse_client_count()
+Channel = namedtuple('Channel', ['channel', 'client_count', 'topic'])
+# Without reset, channels are new or changed rows and removed lists the names of the rows to drop
+ChannelListUpdate = namedtuple('ChannelListUpdate', ['channels', 'reset', 'done', 'removed'], defaults=[()])
+
+
+def parse_client_count(text: str) -> int:
+    try:
+        return int(text)
+    except ValueError:
+        # A broken server is no reason to lose the channel
+        return 0
+
+
+# Collects RPL_LIST replies of a single LIST request and hands them out in batches.
+# When revalidating a list that is already shown, the old one stays until RPL_LISTEND and the difference
+# is handed out then.
+class ChannelListing:
+    def __init__(self, batch_size: int = 500, batch_interval: float = 0.25):
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.channels: list[Channel] = []
+        self.min_users: int = None
+        self.mask: str = None
+
+        self._received: list[Channel] = self.channels
+        self._revalidating = False
+        self._pending: list[Channel] = []
+        self._reset = True
+        self._last_flush = time.monotonic()
+
+    def start(self, min_users: int = None, mask: str = None, revalidate: bool = False):
+        self._received = []
+        self._revalidating = revalidate
+        if not revalidate:
+            self.channels = self._received
+        self.min_users = min_users
+        self.mask = mask.lower() if mask else None
+        self._pending = []
+        self._reset = True
+        self._last_flush = time.monotonic()
+
+    def matches(self, channel: Channel) -> bool:
+        if self.min_users is not None and channel.client_count < self.min_users:
+            return False
+        return self.mask is None or fnmatchcase(channel.channel.lower(), self.mask)
+
+    def add(self, channel: Channel) -> ChannelListUpdate | None:
+        if not self.matches(channel):
+            return None
+        self._received.append(channel)
+        if self._revalidating:
+            return None
+        self._pending.append(channel)
+        now = time.monotonic()
+        if len(self._pending) >= self.batch_size or now - self._last_flush >= self.batch_interval:
+            return self._flush(now, done=False)
+        return None
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    # Hands out what add() has collected so far; the client calls it batch_interval after the last 322
+    def flush(self) -> ChannelListUpdate | None:
+        return self._flush(time.monotonic(), done=False) if self._pending else None
+
+    def finish(self) -> ChannelListUpdate:
+        if self._revalidating:
+            return self._diff()
+        return self._flush(time.monotonic(), done=True)
+
+    # Shows a list received earlier, e.g. from ChannelCache
+    def restore(self, channels: list[Channel]) -> ChannelListUpdate:
+        self.channels = self._received = list(channels)
+        self._revalidating = False
+        self._pending = []
+        self._reset = False
+        return ChannelListUpdate(list(channels), True, True)
+
+    def _diff(self) -> ChannelListUpdate:
+        previous = {channel.channel: channel for channel in self.channels}
+        changed = [channel for channel in self._received if previous.pop(channel.channel, None) != channel]
+        self.channels = self._received
+        self._revalidating = False
+        self._reset = False
+        return ChannelListUpdate(changed, False, True, list(previous))
+
+    def _flush(self, now: float, done: bool) -> ChannelListUpdate:
+        update = ChannelListUpdate(self._pending, self._reset, done)
+        self._pending = []
+        self._reset = False
+        self._last_flush = now
+        return update
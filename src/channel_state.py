@@ -0,0 +1,44 @@
+from collections import namedtuple
+
+from src.isupport import ISupport
+from src.members import MemberIndex
+from src.scrollback import Scrollback
+from src.users import UserRegistry
+
+ChatLine = namedtuple('ChatLine', ['channel', 'text', 'time', 'highlight'], defaults=[None, False])
+
+BUFFER_SIZE = 1000
+
+
+class ChannelState:
+    def __init__(
+        self,
+        name: str,
+        isupport: ISupport,
+        buffer_size: int = BUFFER_SIZE,
+        spill: bool = False,
+        users: UserRegistry = None,
+    ):
+        self.name: str = name
+        self.topic: str = ''
+        self.modes: dict[str, str] = {}
+        self.members: MemberIndex = MemberIndex(isupport, users, name)
+        self.buffer: Scrollback = Scrollback(buffer_size, spill)
+        self.unread: int = 0
+        self.highlights: int = 0
+        self.names: list[str] = []
+
+    def apply_modes(self, changes: list[tuple[bool, str, str]], isupport: ISupport):
+        for adding, mode, param in changes:
+            if mode in isupport.list_modes:
+                continue
+            if adding:
+                self.modes[mode] = param
+            else:
+                self.modes.pop(mode, None)
+
+    @property
+    def mode_string(self) -> str:
+        modes = ''.join(sorted(self.modes))
+        params = ' '.join(param for _, param in sorted(self.modes.items()) if param)
+        return f'+{modes} {params}'.rstrip() if modes else ''
@@ -1,20 +1,49 @@
 import asyncio
-from asyncio import StreamReader, StreamWriter
-from collections import deque, namedtuple
+import ssl
+import time
 from typing import Callable
 
+from src.backoff import Backoff
+from src.capabilities import BATCH_TIMEOUT, Batch, CapabilityNegotiation, SaslCredentials, server_time
+from src.channel_cache import ChannelCache, ChannelSnapshot
+from src.channel_list import Channel, ChannelListing, parse_client_count
+from src.channel_state import BUFFER_SIZE, ChannelState, ChatLine
+from src.codec import FALLBACK_ENCODINGS, LineDecoder
+from src.command_queue import Command, CommandQueue
+from src.dcc import DccManager, Transfer
+from src.events import (
+    CHANNELS,
+    DISCONNECTED,
+    JOINED_CHANNELS,
+    MEMBERS,
+    MESSAGE,
+    RAW,
+    REGISTERED,
+    TRANSFER,
+    EventBus,
+)
+from src.filters import DROP, HIGHLIGHT, ROUTE, FilterEngine
+from src.flood import BURST, RATE, TokenBucket
+from src.isupport import ISupport
+from src.logstore import LogStore
+from src.members import Member, MembersUpdate
 from src.membership import ChannelMembership
+from src.message import Message, parse_message
+from src.metrics import Metrics, Sample, WireTrace
+from src.reader import LineProtocol, LineWriter, open_line_connection
+from src.splitter import MAX_LINE_BYTES, default_hostmask, payload_size, split_message
+from src.tls import FingerprintMismatchError, ResumingSSLContext, check_fingerprint
+from src.users import UserRegistry
 
-Channel = namedtuple('Channel', ['channel', 'client_count', 'topic'])
-Command = namedtuple('Command', ['command', 'parameters'])
-Member = namedtuple('Member', ['membership', 'nick', 'prefix'])
+SERVER_INFO_COMMANDS = ('372', '371', '375', '250', '265', '255', '254', '252', '251', 'NOTICE', '002', '003', '900')
+# Queued commands that belong to a previous connection; connect() queues its own
+SESSION_COMMANDS = {'CAP', 'AUTHENTICATE', 'NICK', 'USER', 'PASS', 'PING', 'PONG', 'LIST'}
+SASL_RESULTS = ('902', '903', '904', '905', '906', '907')
 
-MAX_MESSAGE_SIZE = 384
-
-
-def parse_user(response: str) -> tuple[str, str]:
-    nick, full_name = response.lstrip(':').split(' ')[0].split('!')
-    return nick, full_name
+CONNECT_TIMEOUT = 30
+KEEPALIVE_INTERVAL = 60
+KEEPALIVE_TIMEOUT = 30
+REALNAME = 'Pavel Egorov'
 
 
 class IrcClient:
@@ -24,175 +53,753 @@ class IrcClient:
         port: str | int,
         nickname: str,
         encoding: str,
-        on_update_channels: Callable,
-        on_update_members: Callable,
-        on_receiving_message: Callable,
+        on_update_channels: Callable = None,
+        on_update_members: Callable = None,
+        on_receiving_message: Callable = None,
+        on_update_joined_channels: Callable = None,
+        scrollback_lines: int = BUFFER_SIZE,
+        spill_scrollback: bool = False,
+        log_store: LogStore = None,
+        flood_rate: float = RATE,
+        flood_burst: float = BURST,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+        backoff: Backoff = None,
+        realname: str = REALNAME,
+        sasl: SaslCredentials = None,
+        tls: ssl.SSLContext = None,
+        fingerprint: str = None,
+        fallback_encodings: tuple[str, ...] = FALLBACK_ENCODINGS,
+        metrics: Metrics = None,
+        trace: WireTrace = None,
+        filters: FilterEngine = None,
+        channel_cache: ChannelCache = None,
+        dcc: DccManager = None,
     ):
+        if fingerprint and tls is None:
+            raise ValueError('A pinned certificate fingerprint needs a TLS connection')
         self.host: str = host
         self.port: str | int = port
         self.nickname: str = nickname
+        # The nick asked for; nickname may carry the '_' fallbacks of ERR_NICKNAMEINUSE until it is regained
+        self.preferred_nickname: str = nickname
+        self.realname: str = realname
+        self.hostmask: str = None
         self.encoding: str = encoding
-
-        self.reader: StreamReader = None
-        self.writer: StreamWriter = None
-
-        self.channels: list[Channel] = []
-        self.last_channel: str = None
-        self.members: list[Member] = []
-        self.commands: deque[Command] = deque()
-
-        self.checks = [
-            self._on_ping,
-            self._on_322,
-            self._on_323,
-            self._on_353,
-            self._on_366,
-            self._on_chat_message,
-            self._on_members_list_change,
-            self._info_from_server
-        ]
-
-        self.on_receiving_message = on_receiving_message
-        self.on_update_members = on_update_members
-        self.on_update_channels = on_update_channels
+        self.decoder: LineDecoder = LineDecoder(encoding, fallback_encodings)
+        self.scrollback_lines: int = scrollback_lines
+        self.spill_scrollback: bool = spill_scrollback
+        self.log_store: LogStore = log_store
+        self.keepalive_interval: float = keepalive_interval
+        self.keepalive_timeout: float = keepalive_timeout
+        self.backoff: Backoff = backoff or Backoff()
+        self.tls: ssl.SSLContext = tls
+        self.fingerprint: str = fingerprint
+        self.tls_resumed: bool = False
+        # Both are off by default and cost one check per line then
+        self.metrics: Metrics = metrics
+        self.trace: WireTrace = trace
+        # Highlight, ignore and routing rules for incoming messages
+        self.filters: FilterEngine = filters
+        # Channel list and member lists of the previous session, shown until the server sends fresh ones
+        self.channel_cache: ChannelCache = channel_cache
+        self.snapshot: ChannelSnapshot = None
+        self._caching_list: bool = False
+        # Hands out the last RPL_LIST batch when the server pauses before the next one
+        self._channels_flush: asyncio.Task = None
+        # DCC file transfers offered to us and by us; CTCP DCC requests are ignored without it
+        self.dcc: DccManager = dcc
+
+        self.registered: bool = False
+        self.capabilities: CapabilityNegotiation = CapabilityNegotiation(sasl)
+        self.batches: dict[str, Batch] = {}
+        # Replays of batches whose timer ran out, kept until they finish
+        self._expired_batches: set[asyncio.Task] = set()
+        # Channels whose member updates are held back until the enclosing BATCH ends
+        self._batched_channels: set[str] | None = None
+        self.closing: bool = False
+        self.lines_received: int = 0
+        self.reader: LineProtocol = None
+        self.writer: LineWriter = None
+
+        self.isupport: ISupport = ISupport()
+        if self.dcc is not None:
+            self.dcc.casefold = self.isupport.casefold
+        self.users: UserRegistry = UserRegistry(self.isupport)
+        self.channel_listing: ChannelListing = ChannelListing()
+        self.current_channel: str = None
+        self.joined_channels: dict[str, ChannelState] = {}
+        self.commands: CommandQueue = CommandQueue(
+            TokenBucket(flood_rate, flood_burst) if flood_rate else None, encoding
+        )
+
+        self.events: EventBus = EventBus()
+        for name, handler in (
+            (MESSAGE, on_receiving_message),
+            (MEMBERS, on_update_members),
+            (CHANNELS, on_update_channels),
+            (JOINED_CHANNELS, on_update_joined_channels),
+        ):
+            if handler is not None:
+                self.events.add_handler(name, handler)
+        if dcc is not None:
+            dcc.on_update = lambda transfer: self.events.emit(TRANSFER, transfer)
+
+    @property
+    def channels(self) -> list[Channel]:
+        return self.channel_listing.channels
+
+    def channel_state(self, channel: str) -> ChannelState | None:
+        return self.joined_channels.get(self.isupport.casefold(channel)) if channel else None
+
+    def switch_channel(self, channel: str | None):
+        # The status tab has no channel, so nothing typed there is sent anywhere
+        if channel is None:
+            self.current_channel = None
+            return
+        state = self.channel_state(channel)
+        if state is not None:
+            self.current_channel = state.name
+            state.unread = 0
+            state.highlights = 0
 
     async def connect(self):
-        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        # Never fall back to plaintext while the user believes the server is pinned
+        if self.fingerprint and self.tls is None:
+            raise ValueError('A pinned certificate fingerprint needs a TLS connection')
+        self.reader, self.writer = await asyncio.wait_for(self._open_connection(), CONNECT_TIMEOUT)
+        if (ssl_object := self.writer.get_extra_info('ssl_object')) is not None:
+            self.tls_resumed = ssl_object.session_reused
+            if self.fingerprint:
+                try:
+                    check_fingerprint(ssl_object, self.fingerprint)
+                except ssl.SSLError:
+                    self.writer.close()
+                    raise
+        if self.dcc is not None and (sockname := self.writer.get_extra_info('sockname')) is not None:
+            # The address the server sees is unknown; the one we reach it from is the best guess for DCC offers
+            self.dcc.local_address = sockname[0]
+        self.registered = False
+        self.nickname = self.preferred_nickname
+        self.hostmask = None
+        self.isupport.reset()
+        for batch in self.batches.values():
+            batch.timer.cancel()
+        self.batches.clear()
+        # Commands queued while offline wait until the server has accepted the registration
+        self.commands.discard(SESSION_COMMANDS)
+        self.commands.hold()
         self._authorize()
-        self.update_channels()
+        if self.channel_cache is None:
+            self.update_channels()
+        else:
+            await self._restore_channels()
+
+    # Stale-while-revalidate: the cached list is shown at once and LIST is only sent once it is older than the TTL
+    async def _restore_channels(self):
+        if self.snapshot is None:
+            self.snapshot = await self.channel_cache.load(self.host, self.port)
+            if self.snapshot.channels:
+                await self.events.emit(CHANNELS, self.channel_listing.restore(self.snapshot.channels))
+        if not self.channel_cache.is_fresh(self.snapshot):
+            self.update_channels(revalidate=bool(self.channel_listing.channels))
+
+    def _save_snapshot(self):
+        if self.channel_cache is not None and self.snapshot is not None:
+            self.channel_cache.save(self.host, self.port, self.snapshot)
+
+    def _cached_members(self, channel: str) -> list[Member]:
+        if self.snapshot is None:
+            return []
+        members = []
+        for name in self.snapshot.members.get(self.isupport.casefold(channel), ()):
+            prefixes, nick = self.isupport.split_prefixes(name)
+            prefix = self.isupport.highest_prefix(prefixes)
+            members.append(Member(ChannelMembership.from_prefix(prefix), nick, prefix, self.isupport.rank(prefix)))
+        return members
+
+    async def _open_connection(self) -> tuple[LineProtocol, LineWriter]:
+        return await open_line_connection(self.host, self.port, ssl=self.tls)
 
     async def handle(self):
-        consume_task = asyncio.create_task(self._consume())
-        produce_task = asyncio.create_task(self._produce())
-        done, pending = await asyncio.wait([consume_task, produce_task], return_when=asyncio.FIRST_COMPLETED)
-        for task in pending:
-            task.cancel()
+        tasks = [asyncio.create_task(self._consume()), asyncio.create_task(self._produce())]
+        if self.keepalive_interval:
+            tasks.append(asyncio.create_task(self._keepalive()))
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            ssl_object = self.writer.get_extra_info('ssl_object')
+            if ssl_object is not None and isinstance(self.tls, ResumingSSLContext):
+                self.tls.remember(ssl_object)
+            self.writer.close()
+
+    # Keeps the session alive until close(): reconnects with backoff and rejoins the channels on 001
+    async def run(self):
+        self.closing = False
+        if self.metrics is not None:
+            self.metrics.add_collector(self._collect_metrics)
+        try:
+            await self._run()
+        finally:
+            if self.metrics is not None:
+                self.metrics.remove_collector(self._collect_metrics)
+
+    async def _run(self):
+        while not self.closing:
+            try:
+                await self.connect()
+            except FingerprintMismatchError as error:
+                # Another certificate will not appear by retrying; reconnecting would only hammer the server
+                await self._emit_message(None, f'Cannot connect to {self.host}:{self.port}: {error}')
+                break
+            except (OSError, asyncio.TimeoutError) as error:
+                await self._emit_message(None, f'Cannot connect to {self.host}:{self.port}: {error or "timeout"}')
+            else:
+                await self.handle()
+                self._save_snapshot()
+                await self._emit_message(None, f'Disconnected from {self.host}:{self.port}')
+                await self.events.emit(DISCONNECTED)
+            if self.closing:
+                break
+            delay = self.backoff.next()
+            if self.metrics is not None:
+                self.metrics.inc('reconnects_total')
+            await self._emit_message(None, f'Reconnecting in {delay:.1f} s')
+            await asyncio.sleep(delay)
 
     async def _consume(self):
         while True:
             try:
-                data = await self.reader.readuntil(separator=b'\r\n')
-                try:
-                    response = data.decode(self.encoding)
-                    await self._process_response(response)
-                except UnicodeDecodeError:
-                    ...
-            except asyncio.exceptions.IncompleteReadError:
+                lines = await self.reader.read_lines()
+            except OSError:
+                break
+            if not lines:
                 break
-            await asyncio.sleep(0.01)
+            self.lines_received += len(lines)
+            if self.metrics is not None:
+                self.metrics.inc('bytes_received_total', amount=sum(map(len, lines)) + 2 * len(lines))
+            for data in lines:
+                await self._process_response(self.decoder.decode(data))
+
+    # One timer per connection instead of a timeout on every read; returning ends the connection
+    async def _keepalive(self):
+        while True:
+            seen = self.lines_received
+            await asyncio.sleep(self.keepalive_interval)
+            if self.lines_received != seen:
+                continue
+            # A quiet link may be half-open: the server has to answer the PING in time
+            self.commands.append(Command('PING', [':keepalive']))
+            await asyncio.sleep(self.keepalive_timeout)
+            if self.lines_received == seen:
+                return
 
     async def _produce(self):
         while True:
-            if self.commands:
-                command = self.commands.popleft()
-                await self._send_command(command)
-            await asyncio.sleep(0.01)
+            command = await self.commands.get()
+            for command in [command, *self.commands.pop_ready()]:
+                self._write_command(command)
+            try:
+                await self.writer.drain()
+            except OSError:
+                break
 
     async def _process_response(self, response: str):
-        print(f'Getting response {response}')
-        response = response.rstrip('\r\n')
-        for check in self.checks:
-            await check(response)
-
-    async def _on_chat_message(self, response: str):
-        if response.split(' ')[1] == 'PRIVMSG':
-            nick, fullname = parse_user(response)
-            message = response.split(':')[2]
-            await self.on_receiving_message(f'<{nick} ({fullname})> {message}')
-
-    async def _on_members_list_change(self, response: str):
-        if response.split(' ')[1] not in ('PART', 'JOIN', 'KICK'):
-            return
-        nick, full_name = parse_user(response)
-        if response.split(' ')[1] == 'KICK':
-            kicked = response.split(' ')[3]
-            channel = response.split(' ')[2]
-            message = f'{nick} ({full_name}) kicked {kicked} from {channel}'
-            if self.last_channel == channel:
-                self.members = [member for member in self.members if member.nick != kicked]
-        if response.split(' ')[1] == 'PART':
-            channels = response.rstrip().split(' ')[2].split(',')
-            message = f'{nick} ({full_name}) has left {",".join(channels)}'
-            if self.last_channel in channels:
-                self.members = [member for member in self.members if member.nick != nick]
-        if response.split(' ')[1] == 'JOIN':
-            channels = response.rstrip().split(' ')[2].lstrip(':').split(',')
-            message = f'{nick} ({full_name}) has joined {",".join(channels)}'
-            if nick == self.nickname:
-                self.last_channel = channels[0]
-            if self.last_channel in channels:
-                membership, nick, prefix = ChannelMembership.parse_name(nick)
-                self.members.append(Member(membership, nick, prefix))
-        await self.on_update_members(sorted(self.members))
-        await self.on_receiving_message(message)
-
-    async def _on_ping(self, response: str):
-        if 'PING' in response:
-            self.commands.append(Command("PONG", [":" + response.split(":")[1]]))
+        if self.trace is not None:
+            self.trace.received(response)
+        message = parse_message(response)
+        if self.metrics is None:
+            await self._handle_message(message)
+            return
+        started = time.perf_counter()
+        await self._handle_message(message)
+        self.metrics.inc('lines_received_total', message.command)
+        self.metrics.observe('handler_seconds', time.perf_counter() - started, message.command)
+
+    def _collect_metrics(self) -> list[Sample]:
+        commands = self.commands.stats()
+        return [
+            ('sessions_registered', '', int(self.registered)),
+            ('joined_channels', '', len(self.joined_channels)),
+            ('queue_depth', 'urgent', commands['urgent_depth']),
+            ('queue_depth', 'normal', commands['normal_depth']),
+            ('queue_depth', 'chat', commands['chat_depth']),
+            *self._filter_samples(),
+        ]
+
+    def _filter_samples(self) -> list[Sample]:
+        if self.filters is None:
+            return []
+        return [('filter_hits', f'{rule.kind}:{rule.pattern}', hits) for rule, hits in self.filters.hits.items()]
+
+    async def _handle_message(self, message: Message):
+        batch = self.batches.get(message.tags.get('batch'))
+        if batch is not None:
+            batch.messages.append(message)
+            # A nested batch collects its lines from now on; its end is replayed with the outer batch
+            if message.command == 'BATCH' and message.params and message.params[0].startswith('+'):
+                await self._on_batch(message)
+            return
+        name = self.handlers.get(message.command)
+        if name is not None:
+            await getattr(self, name)(message)
+        await self.events.emit(RAW, message)
+
+    def _is_me(self, nick: str) -> bool:
+        return self.isupport.casefold(nick) == self.isupport.casefold(self.nickname)
+
+    def _is_channel(self, target: str) -> bool:
+        return self.isupport.is_channel(target)
+
+    async def _emit_members(self, update: MembersUpdate):
+        if self._batched_channels is not None:
+            self._batched_channels.add(update.channel)
+        else:
+            await self.events.emit(MEMBERS, update)
+
+    async def _emit_message(self, channel: str | None, text: str, timestamp: float = None, highlight: bool = False):
+        state = self.channel_state(channel)
+        if state is not None:
+            channel = state.name
+            state.buffer.append(text)
+            if channel != self.current_channel:
+                state.unread += 1
+                state.highlights += highlight
+        if self.log_store is not None:
+            self.log_store.append(channel, text, timestamp)
+        await self.events.emit(MESSAGE, ChatLine(channel, text, timestamp, highlight))
+
+    async def _emit_joined_channels(self):
+        await self.events.emit(JOINED_CHANNELS, list(self.joined_channels.values()))
+
+    async def _drop_channel(self, state: ChannelState):
+        del self.joined_channels[self.isupport.casefold(state.name)]
+        if self.snapshot is not None:
+            self.snapshot.members.pop(self.isupport.casefold(state.name), None)
+        state.members.clear()
+        state.buffer.close()
+        if self.current_channel == state.name:
+            self.current_channel = next((other.name for other in self.joined_channels.values()), None)
+        await self._emit_joined_channels()
+
+    async def _on_chat_message(self, message: Message):
+        if len(message.params) < 2:
+            return
+        target = message.params[0]
+        # With echo-message our own private messages come back addressed to the other side
+        channel = target if self._is_channel(target) or self._is_me(message.nick) else message.nick
+        text = f'<{message.nick} ({message.full_name})> {message.trailing}'
+        highlight = False
+        if self.filters is not None and not self._is_me(message.nick):
+            verdict = self.filters.match(message.prefix, message.trailing, self.nickname)
+            if verdict is not None:
+                if verdict.action == DROP:
+                    return
+                if verdict.action == ROUTE:
+                    text = f'[{channel}] {text}'
+                    channel = verdict.buffer
+                highlight = verdict.action == HIGHLIGHT
+        # DCC requests are not chat, echoed copies of our own offers included
+        if message.trailing.startswith('\x01DCC '):
+            if not self._is_me(message.nick):
+                await self._on_dcc(message)
+            return
+        await self._emit_message(channel, text, server_time(message.tags), highlight)
+
+    async def _on_dcc(self, message: Message):
+        if self.dcc is None or self._is_channel(message.params[0]):
+            return
+        self._send(await self.dcc.on_ctcp(message.nick, message.trailing))
+
+    async def _on_kick(self, message: Message):
+        if len(message.params) < 2:
+            return
+        channel, kicked = message.params[:2]
+        text = f'{message.nick} ({message.full_name}) kicked {kicked} from {channel}'
+        state = self.channel_state(channel)
+        if state is None:
+            await self._emit_message(None, text)
+        elif self._is_me(kicked):
+            await self._drop_channel(state)
+            await self._emit_message(None, text)
+        else:
+            if member := state.members.remove(kicked):
+                await self._emit_members(MembersUpdate(state.name, removed=[member]))
+            await self._emit_message(state.name, text)
+
+    async def _on_part(self, message: Message):
+        if not message.params:
+            return
+        for channel in message.params[0].split(','):
+            text = f'{message.nick} ({message.full_name}) has left {channel}'
+            state = self.channel_state(channel)
+            if state is None:
+                continue
+            if self._is_me(message.nick):
+                await self._drop_channel(state)
+                await self._emit_message(None, text)
+                continue
+            if member := state.members.remove(message.nick):
+                await self._emit_members(MembersUpdate(state.name, removed=[member]))
+            await self._emit_message(state.name, text)
+
+    async def _on_join(self, message: Message):
+        if not message.params:
+            return
+        for channel in message.params[0].split(','):
+            state = self.channel_state(channel)
+            if self._is_me(message.nick):
+                self.hostmask = message.prefix
+                # A rejoin after reconnecting keeps the channel that was open
+                if state is None or self.current_channel is None:
+                    self.current_channel = channel
+                if state is None:
+                    state = ChannelState(
+                        channel, self.isupport, self.scrollback_lines, self.spill_scrollback, self.users
+                    )
+                    self.joined_channels[self.isupport.casefold(channel)] = state
+                await self._emit_joined_channels()
+                # Until RPL_ENDOFNAMES the member list of the previous session is shown
+                await self._emit_members(MembersUpdate(state.name, added=self._cached_members(channel), reset=True))
+            elif state is not None:
+                await self._emit_members(MembersUpdate(state.name, added=[state.members.add(message.nick)]))
+                self.users.update(message.prefix)
+            await self._emit_message(channel, f'{message.nick} ({message.full_name}) has joined {channel}')
+
+    async def _on_quit(self, message: Message):
+        text = f'{message.nick} ({message.full_name}) has quit ({message.trailing})'
+        self._regain_nickname(message.nick)
+        for state, member in self._remove_everywhere(message.nick):
+            await self._emit_members(MembersUpdate(state.name, removed=[member]))
+            await self._emit_message(state.name, text)
+
+    def _shared_channels(self, nick: str) -> list[ChannelState]:
+        user = self.users.get(nick)
+        if user is None:
+            return []
+        return [state for channel in list(user.channels) if (state := self.joined_channels.get(channel))]
+
+    def _remove_everywhere(self, nick: str) -> list[tuple[ChannelState, Member]]:
+        removed = []
+        for state in self._shared_channels(nick):
+            if (member := state.members.remove(nick)) is not None:
+                removed.append((state, member))
+        return removed
+
+    async def _on_nick(self, message: Message):
+        if not message.params:
+            return
+        new_nick = message.params[0]
+        text = f'{message.nick} ({message.full_name}) is now known as {new_nick}'
+        is_me = self._is_me(message.nick)
+        if is_me:
+            self.nickname = new_nick
+            # A nick change of our own after registration is the one to keep
+            if self.registered:
+                self.preferred_nickname = new_nick
+            if self.hostmask:
+                self.hostmask = new_nick + self.hostmask[len(message.nick):]
+            await self._emit_message(None, text)
+        else:
+            self._regain_nickname(message.nick)
+        for state in self._shared_channels(message.nick):
+            if renamed := state.members.rename(message.nick, new_nick):
+                await self._emit_members(MembersUpdate(state.name, changed=[renamed]))
+                await self._emit_message(state.name, text)
+
+    # Takes the preferred nick back once whoever held it at registration quits or renames
+    def _regain_nickname(self, nick: str):
+        preferred = self.preferred_nickname
+        if not self.registered or self.nickname == preferred:
+            return
+        if self.isupport.casefold(nick) == self.isupport.casefold(preferred):
+            self.commands.append(Command('NICK', [preferred]))
+
+    # away-notify
+    async def _on_away(self, message: Message):
+        if user := self.users.get(message.nick):
+            user.away = message.trailing or None
+
+    async def _on_chghost(self, message: Message):
+        if len(message.params) >= 2 and (user := self.users.get(message.nick)):
+            self.users.update(f'{user.nick}!{message.params[0]}@{message.params[1]}')
+
+    async def _on_mode(self, message: Message):
+        if len(message.params) < 2:
+            return
+        target, modes, *params = message.params
+        text = f'{message.nick} sets mode {" ".join(message.params[1:])} on {target}'
+        state = self.channel_state(target)
+        if state is None:
+            await self._emit_message(None, text)
+            return
+        changes = self.isupport.parse_modes(modes, params)
+        state.apply_modes(changes, self.isupport)
+        prefix = self.isupport.prefix
+        changed = []
+        for adding, mode, nick in changes:
+            if mode in prefix and nick and (change := state.members.set_prefix(nick, prefix[mode], adding)):
+                changed.append(change)
+        if changed:
+            await self._emit_members(MembersUpdate(state.name, changed=changed))
+        await self._emit_message(state.name, text)
+
+    async def _on_topic(self, message: Message):
+        if len(message.params) < 2:
+            return
+        channel, topic = message.params[0], message.trailing
+        if state := self.channel_state(channel):
+            state.topic = topic
+        await self._emit_message(channel, f'{message.nick} changed the topic of {channel} to: {topic}')
+
+    async def _on_ping(self, message: Message):
+        self.commands.append(Command("PONG", [":" + message.trailing]))
+
+    # RPL_ISUPPORT
+    async def _on_005(self, message: Message):
+        self.isupport.update(message.params[1:-1])
 
     # RPL_LIST
-    async def _on_322(self, response: str):
-        if response.split(' ')[1] == '322':
-            channel, client_count, *topic = response.split(' ')[3:]
-            topic = ' '.join(topic)[1:]
-            self.channels.append(Channel(channel, client_count, topic))
+    async def _on_322(self, message: Message):
+        if len(message.params) < 3:
+            return
+        channel, client_count = message.params[1:3]
+        topic = message.params[3] if len(message.params) > 3 else ''
+        update = self.channel_listing.add(Channel(channel, parse_client_count(client_count), topic))
+        if update is not None:
+            self._cancel_channels_flush()
+            await self.events.emit(CHANNELS, update)
+        elif self.channel_listing.pending and self._channels_flush is None:
+            self._channels_flush = asyncio.create_task(self._flush_channels_later())
+
+    async def _flush_channels_later(self):
+        await asyncio.sleep(self.channel_listing.batch_interval)
+        self._channels_flush = None
+        if (update := self.channel_listing.flush()) is not None:
+            await self.events.emit(CHANNELS, update)
+
+    def _cancel_channels_flush(self):
+        if self._channels_flush is not None:
+            self._channels_flush.cancel()
+            self._channels_flush = None
 
     # RPL_LISTEND
-    async def _on_323(self, response: str):
-        if response.split(' ')[1] == '323':
-            await self.on_update_channels(sorted(self.channels, key=lambda c: int(c.client_count), reverse=True))
+    async def _on_323(self, message: Message):
+        self._cancel_channels_flush()
+        await self.events.emit(CHANNELS, self.channel_listing.finish())
+        if self._caching_list and self.snapshot is not None:
+            self.snapshot = self.snapshot._replace(time=time.time(), channels=self.channels)
+            self._save_snapshot()
+
+    # RPL_CHANNELMODEIS
+    async def _on_324(self, message: Message):
+        if len(message.params) < 3 or not (state := self.channel_state(message.params[1])):
+            return
+        state.modes.clear()
+        state.apply_modes(self.isupport.parse_modes(message.params[2], message.params[3:]), self.isupport)
+
+    # RPL_TOPIC
+    async def _on_332(self, message: Message):
+        if len(message.params) < 3:
+            return
+        channel, topic = message.params[1], message.trailing
+        if state := self.channel_state(channel):
+            state.topic = topic
+        await self._emit_message(channel, f'Topic of {channel}: {topic}')
 
     # RPL_NAMREPLY
-    async def _on_353(self, response: str):
-        if response.split(' ')[1] == '353':
-            self.members = []
-            names = response.rstrip().split(' ')[5:]
-            names[0] = names[0].lstrip(':')
-            for name in names:
-                membership, nick, prefix = ChannelMembership.parse_name(name)
-                self.members.append(Member(membership, nick, prefix))
+    async def _on_353(self, message: Message):
+        if len(message.params) < 4 or not (state := self.channel_state(message.params[2])):
+            return
+        state.names.extend(message.params[3].split())
 
     # RPL_ENDOFNAMES
-    async def _on_366(self, response: str):
-        if response.split(' ')[1] == '366':
-            await self.on_update_members(sorted(self.members))
+    async def _on_366(self, message: Message):
+        if len(message.params) < 2 or not (state := self.channel_state(message.params[1])):
+            return
+        state.members.replace(state.names)
+        state.names = []
+        if self.snapshot is not None:
+            names = [member.prefix + member.nick for member in state.members]
+            self.snapshot.members[self.isupport.casefold(state.name)] = names
+        await self._emit_members(MembersUpdate(state.name, added=list(state.members), reset=True))
+
+    async def _on_cap(self, message: Message):
+        self._send(self.capabilities.on_cap(message.params))
+
+    async def _on_authenticate(self, message: Message):
+        self._send(self.capabilities.on_authenticate(message.trailing))
+
+    # RPL_SASLSUCCESS, ERR_SASLFAIL and friends: registration goes on either way
+    async def _on_sasl_result(self, message: Message):
+        self._send(self.capabilities.end())
+        await self._info_from_server(message)
+
+    async def _on_batch(self, message: Message):
+        if not message.params or len(message.params[0]) < 2:
+            return
+        sign, reference = message.params[0][0], message.params[0][1:]
+        if sign == '+':
+            if reference in self.batches:
+                return
+            batch_type = message.params[1] if len(message.params) > 1 else ''
+            timer = asyncio.get_running_loop().call_later(BATCH_TIMEOUT, self._expire_batch, reference)
+            self.batches[reference] = Batch(batch_type, message.params[2:], [], timer)
+        elif sign == '-' and (batch := self.batches.pop(reference, None)) is not None:
+            batch.timer.cancel()
+            await self._end_batch(batch)
+
+    async def _end_batch(self, batch: Batch):
+        if batch.type in ('netsplit', 'netjoin'):
+            await self._apply_netsplit(batch)
+        else:
+            await self._apply_batch(batch)
+
+    # A server that never ends a batch would keep its lines forever; they are handled as they are
+    def _expire_batch(self, reference: str):
+        if (batch := self.batches.pop(reference, None)) is None:
+            return
+        task = asyncio.create_task(self._end_batch(batch))
+        self._expired_batches.add(task)
+        task.add_done_callback(self._expired_batches.discard)
+
+    # Members changed by the batch get one reset update per channel instead of one per message
+    async def _apply_batch(self, batch: Batch):
+        outer, self._batched_channels = self._batched_channels, set()
+        try:
+            for message in batch.messages:
+                await self._handle_message(message)
+        finally:
+            channels, self._batched_channels = self._batched_channels, outer
+        for channel in channels:
+            if state := self.channel_state(channel):
+                await self._emit_members(MembersUpdate(state.name, added=list(state.members), reset=True))
+
+    async def _apply_netsplit(self, batch: Batch):
+        counts: dict[str, int] = {}
+        for message in batch.messages:
+            if message.command == 'QUIT':
+                states = [state for state, _ in self._remove_everywhere(message.nick)]
+            elif message.command == 'JOIN' and message.params and not self._is_me(message.nick):
+                states = [state for channel in message.params[0].split(',') if (state := self.channel_state(channel))]
+                for state in states:
+                    state.members.add(message.nick)
+                self.users.update(message.prefix)
+            else:
+                continue
+            for state in states:
+                counts[state.name] = counts.get(state.name, 0) + 1
+        servers = ' '.join(batch.params[:2])
+        action = 'quit' if batch.type == 'netsplit' else 'joined'
+        for channel, count in counts.items():
+            state = self.channel_state(channel)
+            await self._emit_members(MembersUpdate(state.name, added=list(state.members), reset=True))
+            await self._emit_message(state.name, f'{batch.type.capitalize()} {servers}: {count} users {action}')
+
+    # RPL_WELCOME
+    async def _on_001(self, message: Message):
+        self.registered = True
+        self.capabilities.negotiating = False
+        if message.params:
+            self.nickname = message.params[0]
+        self.backoff.reset()
+        self._rejoin()
+        self.commands.release()
+        await self._info_from_server(message)
+        await self.events.emit(REGISTERED, self.nickname)
+
+    # ERR_NICKNAMEINUSE
+    async def _on_433(self, message: Message):
+        if not self.registered:
+            # Most often our own previous session that the server has not dropped yet
+            self.nickname += '_'
+            self.commands.append(Command("NICK", [self.nickname]))
+        await self._info_from_server(message)
+
+    # RPL_VISIBLEHOST
+    async def _on_396(self, message: Message):
+        if len(message.params) >= 2 and self.hostmask:
+            self.hostmask = f'{self.hostmask.partition("@")[0]}@{message.params[1]}'
+        await self._info_from_server(message)
 
     # Server_info
-    async def _info_from_server(self, response: str):
-        splited = response.split(' ')
-        if splited[1] in ('372', '371', '375', '250', '265', '255', '254', '252', '251', 'NOTICE', '001', '002', '003'):
-            await self.on_receiving_message(f'<{splited[0]}> {" ".join(response.split(":")[2:])}')
-
-    async def _send_command(self, command: Command):
-        message = f'{command.command} {" ".join(command.parameters)}\r\n'
-        print(f'Sending command: {message}')
-        self.writer.write(message.encode(self.encoding))
-        await self.writer.drain()
+    async def _info_from_server(self, message: Message):
+        await self._emit_message(None, f'<{message.prefix}> {message.trailing}')
+
+    def _write_command(self, command: Command):
+        line = f'{command.command} {" ".join(command.parameters)}'
+        data = f'{line}\r\n'.encode(self.encoding, 'replace')
+        if self.trace is not None:
+            self.trace.sent(line)
+        if self.metrics is not None:
+            self.metrics.inc('lines_sent_total', command.command.upper())
+            self.metrics.inc('bytes_sent_total', amount=len(data))
+        self.writer.write(data)
+
+    def _send(self, commands: list[Command]):
+        for command in commands:
+            self.commands.append(command)
 
     def _authorize(self):
+        self._send(self.capabilities.start())
         self.commands.append(Command("NICK", [self.nickname]))
-        self.commands.append(Command("USER", [self.nickname, "8", "*", ":Pavel Egorov"]))
-
-    def update_channels(self):
-        self.commands.append(Command("LIST", []))
+        self.commands.append(Command("USER", [self.nickname, "8", "*", ":" + self.realname]))
+
+    def _rejoin(self):
+        batch, size = [], len('JOIN \r\n')
+        for state in self.joined_channels.values():
+            length = len(state.name.encode(self.encoding, 'replace')) + 1
+            if batch and size + length > MAX_LINE_BYTES:
+                self.commands.append(Command("JOIN", [','.join(batch)]))
+                batch, size = [], len('JOIN \r\n')
+            batch.append(state.name)
+            size += length
+        if batch:
+            self.commands.append(Command("JOIN", [','.join(batch)]))
+
+    def update_channels(self, min_users: int = None, mask: str = None, revalidate: bool = False):
+        # Only a complete list replaces the cached one
+        self._caching_list = min_users is None and not mask
+        conditions = []
+        elist = self.isupport.elist
+        if min_users is not None and 'U' in elist:
+            conditions.append(f'>{min_users - 1}')
+            min_users = None
+        if mask and 'M' in elist:
+            conditions.append(mask)
+            mask = None
+        # Filters the server can't apply are applied locally to the RPL_LIST replies
+        self._cancel_channels_flush()
+        self.channel_listing.start(min_users, mask, revalidate)
+        self.commands.append(Command("LIST", [','.join(conditions)] if conditions else []))
 
     def update_members(self):
-        self.commands.append(Command("NAMES", [self.last_channel]))
+        if self.current_channel is not None:
+            self.commands.append(Command("NAMES", [self.current_channel]))
 
     def join_channel(self, channel: Channel):
-        self.commands.append(Command("JOIN", [channel.channel]))
-        self.last_channel = channel.channel
+        self.join(channel.channel)
+
+    def join(self, channel: str):
+        if self.channel_state(channel) is not None:
+            self.switch_channel(channel)
+        else:
+            self.commands.append(Command("JOIN", [channel]))
 
     def leave_channel(self):
-        self.commands.append(Command("JOIN", ["0"]))
+        if self.current_channel is not None:
+            self.commands.append(Command("PART", [self.current_channel]))
 
     def kick(self, member: Member, comment: str):
-        self.commands.append(Command("KICK", [self.last_channel, member.nick, ':' + comment]))
+        self.commands.append(Command("KICK", [self.current_channel, member.nick, ':' + comment]))
 
     def ban(self, member: Member):
-        self.commands.append(Command("MODE", [self.last_channel, '+b', member.nick]))
+        self.commands.append(Command("MODE", [self.current_channel, '+b', member.nick]))
 
     def close(self):
+        self.closing = True
         self.commands.append(Command("QUIT", ["Bye!"]))
 
     async def execute_command(self, command: str):
@@ -200,35 +807,54 @@ class IrcClient:
         command = Command(command.split(' ')[0], command.split(' ')[1:])
         self.commands.append(command)
 
-    async def send_message(self, message):
-        await self._send_text_by_blocks(message)
-
-    async def _send_text_by_blocks(self, text):
-        words = deque(text.split(' '))
-        whitespace_size = 1
-        while words:
-            block = []
-            block_size = -1
-            if len(words[0].encode()) <= MAX_MESSAGE_SIZE:
-                while words and (block_size + whitespace_size) + len(words[0].encode()) <= MAX_MESSAGE_SIZE:
-                    word = words.popleft()
-                    block.append(word)
-                    block_size += len(word.encode()) + whitespace_size
-                await self._send_single_message(' '.join(block))
-            else:
-                await self._send_word_by_blocks(words.popleft())
-
-    async def _send_word_by_blocks(self, word):
-        chars = deque(word)
-        while chars:
-            block = []
-            block_size = 0
-            while chars and block_size + len(chars[0].encode()) <= MAX_MESSAGE_SIZE:
-                char = chars.popleft()
-                block.append(char)
-                block_size += len(char.encode())
-            await self._send_single_message(''.join(block))
-
-    async def _send_single_message(self, message):
-        await self.on_receiving_message(f'<{self.nickname} (YOU)> {message}')
-        self.commands.append(Command("PRIVMSG", [self.last_channel, ":" + message]))
+    async def send_message(self, message, target: str = None):
+        target = target or self.current_channel
+        if target is None:
+            return
+        hostmask = self.hostmask or default_hostmask(self.nickname)
+        max_bytes = payload_size(hostmask, 'PRIVMSG', target, self.encoding)
+        for chunk in split_message(message, self.encoding, max_bytes):
+            await self._send_single_message(target, chunk)
+
+    async def send_file(self, nick: str, path: str, passive: bool = False):
+        self._send(await self.dcc.offer(nick, path, passive))
+
+    async def accept_transfer(self, transfer: Transfer):
+        self._send(await self.dcc.accept(transfer))
+
+    async def _send_single_message(self, target: str, message):
+        # With echo-message the server sends our line back and it is shown then
+        if 'echo-message' not in self.capabilities:
+            await self._emit_message(target, f'<{self.nickname} (YOU)> {message}')
+        self.commands.append(Command("PRIVMSG", [target, ":" + message]))
+
+    # Command -> method name, shared by every client instance. Looked up on the instance, so subclasses
+    # can override an _on_* method or extend the table with {**IrcClient.handlers, ...}
+    handlers: dict[str, str] = {
+        'PING': '_on_ping',
+        'CAP': '_on_cap',
+        'AUTHENTICATE': '_on_authenticate',
+        'BATCH': '_on_batch',
+        'QUIT': '_on_quit',
+        'PRIVMSG': '_on_chat_message',
+        'JOIN': '_on_join',
+        'PART': '_on_part',
+        'KICK': '_on_kick',
+        'NICK': '_on_nick',
+        'AWAY': '_on_away',
+        'CHGHOST': '_on_chghost',
+        'MODE': '_on_mode',
+        'TOPIC': '_on_topic',
+        '001': '_on_001',
+        '005': '_on_005',
+        '322': '_on_322',
+        '323': '_on_323',
+        '324': '_on_324',
+        '332': '_on_332',
+        '353': '_on_353',
+        '366': '_on_366',
+        '396': '_on_396',
+        '433': '_on_433',
+        **dict.fromkeys(SERVER_INFO_COMMANDS, '_info_from_server'),
+        **dict.fromkeys(SASL_RESULTS, '_on_sasl_result'),
+    }
@@ -0,0 +1,103 @@
+import asyncio
+from typing import Callable
+
+from src.channel_state import ChatLine
+from src.members import Member, MembersUpdate
+
+FRAME_INTERVAL = 0.033
+MAX_PENDING_LINES = 1000
+
+
+class PendingMembers:
+    def __init__(self, reset: bool):
+        self.reset = reset
+        self.added: dict[str, Member] = {}
+        self.removed: dict[str, Member] = {}
+
+
+# Buffers IrcClient callbacks and hands them to the UI once per frame
+class UpdateCoalescer:
+    def __init__(
+        self,
+        on_lines: Callable[[str, list[str]], None],
+        on_members: Callable[[MembersUpdate], None],
+        interval: float = FRAME_INTERVAL,
+        max_pending_lines: int = MAX_PENDING_LINES,
+    ):
+        self.on_lines = on_lines
+        self.on_members = on_members
+        self.interval = interval
+        self.max_pending_lines = max_pending_lines
+
+        self._lines: dict[str, list[str]] = {}
+        self._members: dict[str, PendingMembers] = {}
+        self._flush_handle: asyncio.TimerHandle = None
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.merged = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'merged': self.merged,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+        }
+
+    def pending_lines(self, channel: str) -> int:
+        return len(self._lines.get(channel, ()))
+
+    async def push_message(self, line: ChatLine):
+        lines = self._lines.setdefault(line.channel, [])
+        lines.append(line.text)
+        if len(lines) > self.max_pending_lines:
+            del lines[0]
+            self.dropped += 1
+        else:
+            self._queued()
+
+    async def push_members(self, update: MembersUpdate):
+        pending = self._members.get(update.channel)
+        if update.reset or pending is None:
+            if pending is not None:
+                self.merged += 1
+            pending = self._members[update.channel] = PendingMembers(update.reset)
+            self._queued()
+        else:
+            self.merged += 1
+        for member in update.removed:
+            self._remove_member(pending, member)
+        for old, new in update.changed:
+            self._remove_member(pending, old)
+            pending.added[new.nick] = new
+        for member in update.added:
+            pending.added[member.nick] = member
+
+    def flush(self):
+        self._flush_handle = None
+        lines, self._lines = self._lines, {}
+        members, self._members = self._members, {}
+        self.queue_depth = 0
+        self.flushes += 1
+        for channel, pending in members.items():
+            self.on_members(
+                MembersUpdate(channel, list(pending.added.values()), list(pending.removed.values()), (), pending.reset)
+            )
+        for channel, channel_lines in lines.items():
+            self.on_lines(channel, channel_lines)
+
+    def _remove_member(self, pending: PendingMembers, member: Member):
+        if pending.added.pop(member.nick, None) is not None:
+            self.merged += 1
+        elif not pending.reset:
+            pending.removed[member.nick] = member
+
+    def _queued(self):
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.interval, self.flush)
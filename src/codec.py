@@ -0,0 +1,81 @@
+import codecs
+from collections import OrderedDict
+
+FALLBACK_ENCODINGS = ('cp1251', 'koi8-r')
+SENDER_CACHE_SIZE = 4096
+REPLACEMENT_PENALTY = 10
+
+
+def line_sender(data: bytes) -> bytes:
+    start = 0
+    if data.startswith(b'@'):
+        start = data.find(b' ') + 1
+        while data.startswith(b' ', start):
+            start += 1
+    if not data.startswith(b':', start):
+        return b''
+    end = data.find(b' ', start)
+    prefix = data[start + 1:end if end != -1 else len(data)]
+    return prefix.partition(b'!')[0]
+
+
+def text_score(text: str) -> int:
+    # Legacy Cyrillic code pages differ mostly in which half is lowercase, and prose is mostly lowercase
+    return sum(char.islower() for char in text) - REPLACEMENT_PENALTY * text.count('\ufffd')
+
+
+# Decodes UTF-8 first and falls back to a legacy code page per line instead of dropping it;
+# with detection the best code page is picked per sender and remembered
+class LineDecoder:
+    def __init__(self, encoding: str = 'utf-8', fallbacks: tuple[str, ...] = FALLBACK_ENCODINGS, detect: bool = True):
+        names = (encoding, *fallbacks)
+        self.fallbacks: tuple[str, ...] = tuple(
+            dict.fromkeys(name for name in names if codecs.lookup(name).name != 'utf-8')
+        ) or ('latin-1',)
+        self.detect: bool = detect
+        self._senders: OrderedDict[bytes, str] = OrderedDict()
+
+        self.lines = 0
+        self.fallback_lines: dict[str, int] = dict.fromkeys(self.fallbacks, 0)
+        self.replaced = 0
+        self.cache_hits = 0
+
+    def stats(self) -> dict[str, float]:
+        fallback = sum(self.fallback_lines.values())
+        return {
+            'lines': self.lines,
+            'fallback': fallback,
+            'fallback_rate': fallback / self.lines if self.lines else 0.0,
+            'replaced': self.replaced,
+            'cache_hits': self.cache_hits,
+            **{f'fallback_{name}': count for name, count in self.fallback_lines.items()},
+        }
+
+    def decode(self, data: bytes) -> str:
+        self.lines += 1
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+        encoding = self._fallback_encoding(data)
+        self.fallback_lines[encoding] += 1
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            self.replaced += 1
+            return data.decode(encoding, 'replace')
+
+    def _fallback_encoding(self, data: bytes) -> str:
+        if not self.detect or len(self.fallbacks) == 1:
+            return self.fallbacks[0]
+        sender = line_sender(data)
+        if sender and (encoding := self._senders.get(sender)) is not None:
+            self._senders.move_to_end(sender)
+            self.cache_hits += 1
+            return encoding
+        encoding = max(self.fallbacks, key=lambda name: text_score(data.decode(name, 'replace')))
+        if sender:
+            self._senders[sender] = encoding
+            if len(self._senders) > SENDER_CACHE_SIZE:
+                self._senders.popitem(last=False)
+        return encoding
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import deque, namedtuple
+
+from src.flood import TokenBucket, message_cost
+
+Command = namedtuple('Command', ['command', 'parameters'])
+
+URGENT, NORMAL, CHAT = range(3)
+COMMAND_PRIORITIES = {
+    'PING': URGENT,
+    'PONG': URGENT,
+    'QUIT': URGENT,
+    'NICK': URGENT,
+    'PASS': URGENT,
+    'USER': URGENT,
+    # Capability negotiation and SASL happen before registration, while the other lanes are held
+    'CAP': URGENT,
+    'AUTHENTICATE': URGENT,
+    'PRIVMSG': CHAT,
+    'NOTICE': CHAT,
+}
+
+
+def command_size(command, encoding: str = 'utf-8') -> int:
+    line = f'{command.command} {" ".join(command.parameters)}\r\n'
+    return len(line.encode(encoding, 'replace'))
+
+
+# Outgoing commands in priority lanes; everything but URGENT is paced by the token bucket
+# and held back entirely while the connection is not registered
+class CommandQueue:
+    def __init__(self, bucket: TokenBucket = None, encoding: str = 'utf-8'):
+        self.bucket = bucket
+        self.encoding = encoding
+        self.held = False
+        self._lanes = (deque(), deque(), deque())
+        self._ready = asyncio.Event()
+
+        self.sent = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def __len__(self):
+        return sum(map(len, self._lanes))
+
+    def __iter__(self):
+        return (command for lane in self._lanes for _, command in lane)
+
+    def __contains__(self, command):
+        return any(command == queued for queued in self)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            'urgent_depth': len(self._lanes[URGENT]),
+            'normal_depth': len(self._lanes[NORMAL]),
+            'chat_depth': len(self._lanes[CHAT]),
+            'sent': self.sent,
+            'average_latency': self.total_latency / self.sent if self.sent else 0.0,
+            'max_latency': self.max_latency,
+        }
+
+    def append(self, command):
+        self._lanes[COMMAND_PRIORITIES.get(command.command.upper(), NORMAL)].append((time.monotonic(), command))
+        self._ready.set()
+
+    def hold(self):
+        self.held = True
+
+    def release(self):
+        self.held = False
+        self._ready.set()
+
+    def discard(self, commands: set[str]):
+        for lane in self._lanes:
+            kept = [item for item in lane if item[1].command.upper() not in commands]
+            lane.clear()
+            lane.extend(kept)
+
+    def popleft(self):
+        lane = next((lane for lane in self._lanes if lane), self._lanes[URGENT])
+        return self._take(lane)
+
+    def pop_ready(self) -> list:
+        commands = []
+        while (lane := self._ready_lane()) is not None:
+            commands.append(self._take(lane))
+        return commands
+
+    async def get(self):
+        while True:
+            if (lane := self._ready_lane()) is not None:
+                return self._take(lane)
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+    def _ready_lane(self) -> deque | None:
+        if self._lanes[URGENT]:
+            return self._lanes[URGENT]
+        lane = self._lanes[NORMAL] or self._lanes[CHAT]
+        if not lane or self.held:
+            return None
+        if self.bucket is not None and self.bucket.delay(message_cost(command_size(lane[0][1], self.encoding))):
+            return None
+        return lane
+
+    def _next_delay(self) -> float | None:
+        lane = self._lanes[NORMAL] or self._lanes[CHAT]
+        if not lane or self.held or self.bucket is None:
+            return None
+        return self.bucket.delay(message_cost(command_size(lane[0][1], self.encoding)))
+
+    def _take(self, lane: deque):
+        queued_at, command = lane.popleft()
+        if self.bucket is not None:
+            self.bucket.consume(message_cost(command_size(command, self.encoding)))
+        latency = time.monotonic() - queued_at
+        self.sent += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if not len(self):
+            self._ready.clear()
+        return command
@@ -0,0 +1,483 @@
+import asyncio
+import ipaddress
+import itertools
+import os
+import time
+from typing import Awaitable, Callable
+
+from src.command_queue import Command
+
+# Received data lands in one buffer of this size per transfer and goes to the file from there
+RECEIVE_BUFFER_SIZE = 1024 * 1024
+# loop.sendfile() is called per chunk so the progress moves during large files
+SEND_CHUNK_SIZE = 8 * 1024 * 1024
+# Offers nobody connects to are withdrawn
+OFFER_TIMEOUT = 300
+CONNECT_TIMEOUT = 30
+ACK_TIMEOUT = 30
+
+SEND = 'send'
+RECEIVE = 'receive'
+
+OFFERED = 'offered'
+RESUMING = 'resuming'
+CONNECTING = 'connecting'
+TRANSFERRING = 'transferring'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED = (DONE, FAILED)
+
+
+def encode_address(host: str) -> str:
+    address = ipaddress.ip_address(host)
+    return str(int(address)) if address.version == 4 else str(address)
+
+
+def decode_address(text: str) -> str:
+    return str(ipaddress.IPv4Address(int(text))) if text.isdigit() else str(ipaddress.ip_address(text))
+
+
+def quote_filename(filename: str) -> str:
+    return f'"{filename}"' if ' ' in filename else filename
+
+
+# '\x01DCC SEND "file name" 2130706433 5000 1024\x01' -> ('SEND', 'file name', ['2130706433', '5000', '1024'])
+def parse_dcc(text: str) -> tuple[str, str, list[str]] | None:
+    if not text.startswith('\x01DCC '):
+        return None
+    command, _, rest = text.strip('\x01')[4:].lstrip().partition(' ')
+    rest = rest.lstrip()
+    if rest.startswith('"'):
+        filename, _, rest = rest[1:].partition('"')
+    else:
+        filename, _, rest = rest.partition(' ')
+    return command.upper(), filename, rest.split()
+
+
+def dcc_ack(position: int) -> bytes:
+    # The classic 32-bit acknowledgement wraps for files over 4 GiB
+    return (position & 0xFFFFFFFF).to_bytes(4, 'big')
+
+
+class Transfer:
+    def __init__(self, direction: str, nick: str, filename: str, path: str, size: int, token: str = None):
+        self.direction: str = direction
+        self.nick: str = nick
+        self.filename: str = filename
+        self.path: str = path
+        self.size: int = size
+        # Set for passive (reverse) DCC, where the receiver listens
+        self.token: str = token
+        # The peer's address when receiving; the port we listen on when sending
+        self.host: str = None
+        self.port: int = 0
+        # Where the data of this connection starts, past zero after DCC RESUME
+        self.position: int = 0
+        self.transferred: int = 0
+        self.state: str = OFFERED
+        self.error: str = None
+        self.started: float = None
+        self.finished: float = None
+
+        self._connected: asyncio.Future = None
+        self._server: asyncio.AbstractServer = None
+        self._task: asyncio.Task = None
+        self._file = None
+        self._expiry: asyncio.TimerHandle = None
+
+    def __repr__(self):
+        return f'Transfer({self.direction} {self.filename!r} {self.nick}: {self.state} {self.completed}/{self.size})'
+
+    @property
+    def passive(self) -> bool:
+        return self.token is not None
+
+    @property
+    def completed(self) -> int:
+        return self.position + self.transferred
+
+    @property
+    def progress(self) -> float:
+        return self.completed / self.size if self.size else 1.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    # Bytes per second of this connection, resumed bytes excluded
+    @property
+    def throughput(self) -> float:
+        elapsed = self.elapsed
+        return self.transferred / elapsed if elapsed else 0.0
+
+
+# Receives straight into a preallocated buffer and acknowledges every chunk written to the file.
+# The file is opened by DccManager before connecting and closed when the transfer task ends.
+class ReceiveProtocol(asyncio.BufferedProtocol):
+    def __init__(self, transfer: Transfer, buffer_size: int = RECEIVE_BUFFER_SIZE):
+        self.transfer = transfer
+        self.transport: asyncio.Transport = None
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._buffer_size = buffer_size
+        self._view: memoryview = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        transfer = self.transfer
+        # Only the first connection to a passive offer is ours
+        if transfer._connected is None or transfer._connected.done():
+            transport.close()
+            return
+        self.transport = transport
+        self._view = memoryview(bytearray(self._buffer_size))
+        transfer._connected.set_result(self)
+        # Nothing to receive for an empty file
+        if transfer.completed >= transfer.size:
+            transport.close()
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self._view
+
+    def buffer_updated(self, nbytes: int):
+        transfer = self.transfer
+        # Nothing past the offered size is written or acknowledged
+        accepted = min(nbytes, transfer.size - transfer.completed)
+        transfer._file.write(self._view[:accepted])
+        transfer.transferred += accepted
+        self.transport.write(dcc_ack(transfer.completed))
+        if accepted < nbytes and not self.done.done():
+            self.done.set_exception(ConnectionError(f'Sender went past the offered {transfer.size} bytes'))
+        if transfer.completed >= transfer.size:
+            self.transport.close()
+
+    def connection_lost(self, exception: Exception | None):
+        if self.done.done():
+            return
+        if exception is not None:
+            self.done.set_exception(exception)
+        else:
+            self.done.set_result(None)
+
+
+# DCC SEND/RECV with passive DCC and RESUME/ACCEPT. Like CapabilityNegotiation every step returns
+# the CTCP commands to send; the transfers themselves run as separate connections in their own tasks.
+class DccManager:
+    def __init__(
+        self,
+        directory: str = '.',
+        address: str = None,
+        auto_accept: bool = False,
+        buffer_size: int = RECEIVE_BUFFER_SIZE,
+        offer_timeout: float = OFFER_TIMEOUT,
+    ):
+        self.directory = directory
+        # Advertised in offers; IrcClient fills in local_address from its own connection
+        self.address: str = address
+        self.local_address: str = None
+        self.auto_accept = auto_accept
+        # Nicks are compared casemapped; IrcClient swaps in the casemapping of its server
+        self.casefold: Callable[[str], str] = str.lower
+        self.buffer_size = buffer_size
+        self.offer_timeout = offer_timeout
+        self.transfers: list[Transfer] = []
+        self.on_update: Callable[[Transfer], Awaitable[None]] = None
+        self._tokens = itertools.count(1)
+        self._updates: set[asyncio.Task] = set()
+
+    @property
+    def advertised_address(self) -> str:
+        return self.address or self.local_address or '127.0.0.1'
+
+    def stats(self) -> dict[str, float]:
+        active = [transfer for transfer in self.transfers if transfer.state == TRANSFERRING]
+        return {
+            'active': len(active),
+            'done': sum(transfer.state == DONE for transfer in self.transfers),
+            'failed': sum(transfer.state == FAILED for transfer in self.transfers),
+            'bytes': sum(transfer.transferred for transfer in self.transfers),
+            'throughput': sum(transfer.throughput for transfer in active),
+        }
+
+    async def offer(self, nick: str, path: str, passive: bool = False) -> list[Command]:
+        filename = os.path.basename(path)
+        transfer = Transfer(SEND, nick, filename, path, os.path.getsize(path))
+        self.transfers.append(transfer)
+        address = encode_address(self.advertised_address)
+        if passive:
+            transfer.token = str(next(self._tokens))
+            transfer._connected = asyncio.get_running_loop().create_future()
+            self._start(transfer, self._send_passive(transfer))
+            port = 0
+        else:
+            transfer._connected = asyncio.get_running_loop().create_future()
+            transfer._server = await asyncio.start_server(
+                lambda reader, writer: self._on_send_connection(transfer, reader, writer), self._bind_host(), 0
+            )
+            transfer.port = port = transfer._server.sockets[0].getsockname()[1]
+            self._start(transfer, self._send_active(transfer))
+        await self._updated(transfer)
+        token = f' {transfer.token}' if passive else ''
+        return [self._ctcp(nick, f'DCC SEND {quote_filename(filename)} {address} {port} {transfer.size}{token}')]
+
+    async def accept(self, transfer: Transfer) -> list[Command]:
+        if transfer.direction != RECEIVE or transfer.state != OFFERED:
+            return []
+        existing = os.path.getsize(transfer.path) if os.path.exists(transfer.path) else 0
+        if 0 < existing < transfer.size:
+            transfer.state = RESUMING
+            # The ACCEPT has to confirm this offset
+            transfer.position = existing
+            token = f' {transfer.token}' if transfer.passive else ''
+            resume = f'DCC RESUME {quote_filename(transfer.filename)} {transfer.port} {existing}{token}'
+            return [self._ctcp(transfer.nick, resume)]
+        if existing:
+            transfer.path = self._free_path(transfer.path)
+        return await self._receive(transfer)
+
+    def cancel(self, transfer: Transfer):
+        if transfer._task is not None:
+            transfer._task.cancel()
+
+    async def close(self):
+        for transfer in self.transfers:
+            self.cancel(transfer)
+        await asyncio.gather(*(transfer._task for transfer in self.transfers if transfer._task), return_exceptions=True)
+        for transfer in self.transfers:
+            if transfer._expiry is not None:
+                transfer._expiry.cancel()
+
+    async def on_ctcp(self, nick: str, text: str) -> list[Command]:
+        parsed = parse_dcc(text)
+        if parsed is None:
+            return []
+        command, filename, args = parsed
+        try:
+            if command == 'SEND':
+                return await self._on_send(nick, filename, args)
+            if command == 'RESUME':
+                return self._on_resume(nick, filename, args)
+            if command == 'ACCEPT':
+                return await self._on_accept(nick, args)
+        except (ValueError, IndexError):
+            pass
+        return []
+
+    async def _on_send(self, nick: str, filename: str, args: list[str]) -> list[Command]:
+        host, port, size = decode_address(args[0]), int(args[1]), int(args[2])
+        token = args[3] if len(args) > 3 else None
+        # The receiver's answer to our passive offer
+        if token is not None and port and (transfer := self._find(SEND, nick, token=token)):
+            if transfer.state == OFFERED and not transfer._connected.done():
+                transfer._connected.set_result((host, port))
+            return []
+        filename = os.path.basename(filename.replace('\\', '/')).lstrip('.') or 'download'
+        transfer = Transfer(RECEIVE, nick, filename, os.path.join(self.directory, filename), size, token)
+        transfer.host, transfer.port = host, port
+        self.transfers.append(transfer)
+        transfer._expiry = asyncio.get_running_loop().call_later(self.offer_timeout, self._expire, transfer)
+        await self._updated(transfer)
+        return await self.accept(transfer) if self.auto_accept else []
+
+    def _on_resume(self, nick: str, filename: str, args: list[str]) -> list[Command]:
+        port, position = int(args[0]), int(args[1])
+        token = args[2] if len(args) > 2 else None
+        transfer = self._find(SEND, nick, port=port, token=token)
+        if transfer is None or transfer.state != OFFERED or not 0 <= position <= transfer.size:
+            return []
+        transfer.position = position
+        suffix = f' {token}' if token is not None else ''
+        return [self._ctcp(nick, f'DCC ACCEPT {quote_filename(filename)} {port} {position}{suffix}')]
+
+    async def _on_accept(self, nick: str, args: list[str]) -> list[Command]:
+        port, position = int(args[0]), int(args[1])
+        token = args[2] if len(args) > 2 else None
+        transfer = self._find(RECEIVE, nick, port=port, token=token)
+        if transfer is None or transfer.state != RESUMING:
+            return []
+        # Anything but the offset we asked for would overwrite or skip data in the partial file
+        if position != transfer.position:
+            await self._fail(transfer, f'Resume at {position} instead of {transfer.position} refused')
+            return []
+        return await self._receive(transfer)
+
+    def _find(self, direction: str, nick: str, port: int = None, token: str = None) -> Transfer | None:
+        casefold = self.casefold
+        nick = casefold(nick)
+        for transfer in reversed(self.transfers):
+            if transfer.direction != direction or casefold(transfer.nick) != nick or transfer.state in FINISHED:
+                continue
+            if (token is not None and transfer.token == token) or (token is None and transfer.port == port):
+                return transfer
+        return None
+
+    async def _receive(self, transfer: Transfer) -> list[Command]:
+        if transfer._expiry is not None:
+            transfer._expiry.cancel()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            transfer._file = open(transfer.path, 'r+b' if transfer.position else 'wb')
+            transfer._file.seek(transfer.position)
+            transfer._file.truncate()
+        except OSError as error:
+            await self._fail(transfer, str(error))
+            return []
+        transfer.state = CONNECTING
+        transfer._connected = asyncio.get_running_loop().create_future()
+        if not transfer.passive:
+            self._start(transfer, self._receive_active(transfer))
+            return []
+        # Passive DCC: the sender connects to us
+        transfer._server = await asyncio.get_running_loop().create_server(
+            lambda: ReceiveProtocol(transfer, self.buffer_size), self._bind_host(), 0
+        )
+        port = transfer._server.sockets[0].getsockname()[1]
+        self._start(transfer, self._receive_passive(transfer))
+        address = encode_address(self.advertised_address)
+        send = f'DCC SEND {quote_filename(transfer.filename)} {address} {port} {transfer.size} {transfer.token}'
+        return [self._ctcp(transfer.nick, send)]
+
+    async def _receive_active(self, transfer: Transfer):
+        _, protocol = await asyncio.wait_for(
+            asyncio.get_running_loop().create_connection(
+                lambda: ReceiveProtocol(transfer, self.buffer_size), transfer.host, transfer.port
+            ),
+            CONNECT_TIMEOUT,
+        )
+        await self._receive_data(transfer, protocol)
+
+    async def _receive_passive(self, transfer: Transfer):
+        protocol = await asyncio.wait_for(transfer._connected, self.offer_timeout)
+        await self._receive_data(transfer, protocol)
+
+    async def _receive_data(self, transfer: Transfer, protocol: ReceiveProtocol):
+        await self._begin(transfer)
+        await protocol.done
+        if transfer.completed < transfer.size:
+            raise ConnectionError(f'Connection closed at {transfer.completed} of {transfer.size} bytes')
+
+    def _on_send_connection(self, transfer: Transfer, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if transfer._connected.done():
+            writer.close()
+        else:
+            transfer._connected.set_result((reader, writer))
+
+    async def _send_active(self, transfer: Transfer):
+        reader, writer = await asyncio.wait_for(transfer._connected, self.offer_timeout)
+        await self._send_data(transfer, reader, writer)
+
+    async def _send_passive(self, transfer: Transfer):
+        host, port = await asyncio.wait_for(transfer._connected, self.offer_timeout)
+        transfer.state = CONNECTING
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+        await self._send_data(transfer, reader, writer)
+
+    # The file goes out with loop.sendfile() (os.sendfile() on selector loops) while the acks are read alongside
+    async def _send_data(self, transfer: Transfer, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await self._begin(transfer)
+        # uvloop has no loop.sendfile()
+        sendfile = getattr(asyncio.get_running_loop(), 'sendfile', None)
+        acks = asyncio.create_task(self._read_acks(transfer, reader))
+        try:
+            with open(transfer.path, 'rb') as file:
+                while transfer.completed < transfer.size:
+                    count = min(SEND_CHUNK_SIZE, transfer.size - transfer.completed)
+                    if sendfile is not None:
+                        try:
+                            transfer.transferred += await sendfile(writer.transport, file, transfer.completed, count)
+                            continue
+                        except (NotImplementedError, RuntimeError):
+                            sendfile = None
+                    await self._write_chunk(transfer, file, writer, count)
+            await asyncio.wait_for(acks, ACK_TIMEOUT)
+        finally:
+            acks.cancel()
+            writer.close()
+
+    async def _write_chunk(self, transfer: Transfer, file, writer: asyncio.StreamWriter, count: int):
+        file.seek(transfer.completed)
+        while count > 0:
+            if writer.transport.is_closing():
+                raise ConnectionError(f'Connection closed at {transfer.completed} of {transfer.size} bytes')
+            data = file.read(min(count, self.buffer_size))
+            if not data:
+                raise EOFError(f'{transfer.path} is shorter than {transfer.size} bytes')
+            writer.write(data)
+            await writer.drain()
+            transfer.transferred += len(data)
+            count -= len(data)
+
+    @staticmethod
+    async def _read_acks(transfer: Transfer, reader: asyncio.StreamReader):
+        expected, pending = dcc_ack(transfer.size), b''
+        while data := await reader.read(65536):
+            pending += data
+            end = len(pending) // 4 * 4
+            if end and pending[end - 4:end] == expected:
+                return
+            pending = pending[end:]
+        # Receivers that close once they have everything count as done
+        if transfer.completed < transfer.size:
+            raise ConnectionError('Receiver closed the connection')
+
+    async def _begin(self, transfer: Transfer):
+        if transfer._server is not None:
+            transfer._server.close()
+            transfer._server = None
+        transfer.state = TRANSFERRING
+        transfer.started = time.monotonic()
+        await self._updated(transfer)
+
+    def _start(self, transfer: Transfer, coroutine: Awaitable):
+        transfer._task = asyncio.get_running_loop().create_task(self._run(transfer, coroutine))
+
+    async def _run(self, transfer: Transfer, coroutine: Awaitable):
+        try:
+            await coroutine
+            transfer.state = DONE
+        except asyncio.CancelledError:
+            transfer.state, transfer.error = FAILED, 'cancelled'
+        except asyncio.TimeoutError:
+            transfer.state, transfer.error = FAILED, 'timeout'
+        except Exception as error:
+            transfer.state, transfer.error = FAILED, str(error) or type(error).__name__
+        finally:
+            transfer.finished = time.monotonic()
+            if transfer._server is not None:
+                transfer._server.close()
+                transfer._server = None
+            if transfer._file is not None:
+                transfer._file.close()
+        await self._updated(transfer)
+
+    async def _fail(self, transfer: Transfer, error: str):
+        transfer.state, transfer.error, transfer.finished = FAILED, error, time.monotonic()
+        await self._updated(transfer)
+
+    # Offers nobody accepts are dropped from the list
+    def _expire(self, transfer: Transfer):
+        if transfer.state not in (OFFERED, RESUMING):
+            return
+        self.transfers.remove(transfer)
+        task = asyncio.get_running_loop().create_task(self._fail(transfer, 'offer expired'))
+        self._updates.add(task)
+        task.add_done_callback(self._updates.discard)
+
+    async def _updated(self, transfer: Transfer):
+        if self.on_update is not None:
+            await self.on_update(transfer)
+
+    def _bind_host(self) -> str:
+        return '::' if ':' in self.advertised_address else '0.0.0.0'
+
+    @staticmethod
+    def _free_path(path: str) -> str:
+        stem, extension = os.path.splitext(path)
+        for number in itertools.count(1):
+            candidate = f'{stem}.{number}{extension}'
+            if not os.path.exists(candidate):
+                return candidate
+
+    @staticmethod
+    def _ctcp(nick: str, text: str) -> Command:
+        return Command('PRIVMSG', [nick, f':\x01{text}\x01'])
@@ -0,0 +1,55 @@
+import asyncio
+from collections import defaultdict, namedtuple
+from typing import AsyncIterator, Awaitable, Callable
+
+Event = namedtuple('Event', ['name', 'payload'])
+
+RAW = 'raw'
+MESSAGE = 'message'
+CHANNELS = 'channels'
+MEMBERS = 'members'
+JOINED_CHANNELS = 'joined_channels'
+REGISTERED = 'registered'
+DISCONNECTED = 'disconnected'
+TRANSFER = 'transfer'
+
+EVENT_QUEUE_SIZE = 1000
+
+Handler = Callable[[object], Awaitable[None]]
+
+
+# Client events for async handlers (`@events.on(MESSAGE)`) and async iterators (`async for event in events.stream()`)
+class EventBus:
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._streams: list[tuple[set[str], asyncio.Queue]] = []
+
+    def on(self, name: str) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            self.add_handler(name, handler)
+            return handler
+
+        return register
+
+    def add_handler(self, name: str, handler: Handler):
+        self._handlers[name].append(handler)
+
+    def remove_handler(self, name: str, handler: Handler):
+        self._handlers[name].remove(handler)
+
+    async def emit(self, name: str, payload=None):
+        for handler in self._handlers.get(name, ()):
+            await handler(payload)
+        for names, queue in self._streams:
+            if not names or name in names:
+                # A slow reader pushes back on the connection instead of losing events
+                await queue.put(Event(name, payload))
+
+    async def stream(self, *names: str, max_size: int = EVENT_QUEUE_SIZE) -> AsyncIterator[Event]:
+        subscription = (set(names), asyncio.Queue(max_size))
+        self._streams.append(subscription)
+        try:
+            while True:
+                yield await subscription[1].get()
+        finally:
+            self._streams.remove(subscription)
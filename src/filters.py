@@ -0,0 +1,189 @@
+import re
+from collections import namedtuple
+
+WORD = 'word'
+MASK = 'mask'
+REGEX = 'regex'
+
+DROP = 'drop'
+ROUTE = 'route'
+HIGHLIGHT = 'highlight'
+# The strongest action wins when several rules match one line
+ACTION_ORDER = (DROP, ROUTE, HIGHLIGHT)
+
+# kind: WORD matches a whole word, MASK a nick!user@host glob, REGEX the message text.
+# buffer is where ROUTE sends the line.
+FilterRule = namedtuple('FilterRule', ['kind', 'pattern', 'action', 'buffer'], defaults=[HIGHLIGHT, None])
+Verdict = namedtuple('Verdict', ['action', 'buffer', 'rules'])
+
+REGEX_SPECIAL = set('.^$*+?{}[]|()')
+QUANTIFIERS = set('*+?{')
+GLOB_SPECIAL = set('*?')
+
+
+def trie_pattern(words: list[str]) -> str:
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: dict) -> str:
+    ending = '' in node
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else f'(?:{"|".join(branches)})'
+    return f'(?:{pattern})?' if ending else pattern
+
+
+# The literal every match of the pattern starts with; '' when it can't be told without parsing
+def literal_prefix(pattern: str) -> str:
+    if '|' in pattern or pattern.startswith('(?'):
+        return ''
+    literal, index = [], 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            escaped = pattern[index + 1:index + 2]
+            if not escaped or escaped.isalnum():
+                break
+            char, index = escaped, index + 1
+        elif char in REGEX_SPECIAL:
+            break
+        literal.append(char)
+        index += 1
+    # A quantifier applies to the last char only
+    if index < len(pattern) and pattern[index] in QUANTIFIERS and literal:
+        literal.pop()
+    return ''.join(literal)
+
+
+# A nick!user@host glob whose wildcards do not run across the ! and @ separators
+def mask_pattern(mask: str) -> str:
+    nick, _, host = mask.partition('@')
+    nick, _, user = nick.partition('!')
+    parts = []
+    for glob, other in ((nick or '*', '[^!]'), (user or '*', '[^@]'), (host or '*', '.')):
+        wildcards = {'*': other + '*', '?': other}
+        parts.append(''.join(wildcards.get(char) or re.escape(char) for char in glob))
+    return f'{parts[0]}!{parts[1]}@{parts[2]}$'
+
+
+# Highlight words and ignore masks are compiled into one matcher each, regex rules on their own so their
+# groups, flags and backreferences keep working. They are rebuilt on the first line after the rules or our nick change.
+class FilterEngine:
+    def __init__(self, rules: list[FilterRule] = ()):
+        # Rule -> hit count, in the order the rules were added
+        self.hits: dict[FilterRule, int] = {}
+        self.nick: str = None
+        self._text: re.Pattern = None
+        self._masks: re.Pattern = None
+        self._hosts: dict[str, FilterRule] = {}
+        self._words: dict[str, FilterRule] = {}
+        self._groups: dict[str, FilterRule] = {}
+        self._compiled: dict[str, re.Pattern] = {}
+        # Regex rules, strongest action first; the gated ones can only match where _starts does
+        self._gated: list[tuple[re.Pattern, FilterRule]] = []
+        self._ungated: list[tuple[re.Pattern, FilterRule]] = []
+        self._starts: re.Pattern = None
+        self._ascii_starts: re.Pattern = None
+        self._dirty = True
+        for rule in rules:
+            self.add(rule)
+
+    @property
+    def rules(self) -> list[FilterRule]:
+        return list(self.hits)
+
+    def add(self, rule: FilterRule):
+        if rule.kind not in (WORD, MASK, REGEX) or rule.action not in ACTION_ORDER:
+            raise ValueError(f'Unknown filter rule {rule}')
+        if rule.kind == REGEX:
+            self._compiled[rule.pattern] = re.compile(rule.pattern, re.IGNORECASE)
+        self.hits.setdefault(rule, 0)
+        self._dirty = True
+
+    def remove(self, rule: FilterRule):
+        if self.hits.pop(rule, None) is not None:
+            self._dirty = True
+
+    def clear(self):
+        self.hits.clear()
+        self._dirty = True
+
+    def match(self, prefix: str | None, text: str, nick: str = None) -> Verdict | None:
+        if self._dirty or nick != self.nick:
+            self.nick = nick
+            self._compile()
+        matched = []
+        if prefix and (self._hosts or self._masks is not None):
+            if (rule := self._hosts.get(prefix.rpartition('@')[2].lower())) is not None:
+                matched.append(rule)
+            if self._masks is not None and (not matched or rule.action != DROP):
+                if found := self._masks.match(prefix):
+                    matched.append(self._groups[found.lastgroup])
+        if not any(rule.action == DROP for rule in matched):
+            if self._text is not None:
+                for found in self._text.finditer(text):
+                    rule = self._words.get(found.group().lower())
+                    if rule is not None and rule not in matched:
+                        matched.append(rule)
+            regexes = self._ungated
+            if self._starts is not None:
+                # Lowering ASCII text is cheaper than a case-insensitive scan
+                if self._ascii_starts.search(text.lower()) if text.isascii() else self._starts.search(text):
+                    regexes = self._gated + regexes
+            for pattern, rule in regexes:
+                if rule not in matched and pattern.search(text):
+                    matched.append(rule)
+        if not matched:
+            return None
+        for rule in matched:
+            if rule in self.hits:
+                self.hits[rule] += 1
+        rule = min(matched, key=lambda rule: ACTION_ORDER.index(rule.action))
+        return Verdict(rule.action, rule.buffer, matched)
+
+    def _compile(self):
+        self._dirty = False
+        rules = sorted(self.hits, key=lambda rule: ACTION_ORDER.index(rule.action))
+        self._words = {}
+        for rule in rules:
+            if rule.kind == WORD:
+                self._words.setdefault(rule.pattern.lower(), rule)
+        if self.nick:
+            self._words.setdefault(self.nick.lower(), FilterRule(WORD, self.nick))
+
+        self._groups, self._hosts = {}, {}
+        self._gated, self._ungated = [], []
+        masks, prefixes = [], []
+        for index, rule in enumerate(rules):
+            if rule.kind == REGEX:
+                pattern = self._compiled[rule.pattern]
+                # Only the ASCII start, case-insensitive matching of other letters is not the same as lower()
+                prefix = literal_prefix(rule.pattern)
+                if prefix := prefix[: next((i for i, char in enumerate(prefix) if not char.isascii()), len(prefix))]:
+                    self._gated.append((pattern, rule))
+                    prefixes.append(prefix.lower())
+                else:
+                    self._ungated.append((pattern, rule))
+            elif rule.kind == MASK:
+                nick_user, _, host = rule.pattern.rpartition('@')
+                # The usual *!*@host ignore is a dict lookup
+                if nick_user in ('*', '*!*') and not GLOB_SPECIAL.intersection(host):
+                    self._hosts.setdefault(host.lower(), rule)
+                    continue
+                masks.append(f'(?P<r{index}>{mask_pattern(rule.pattern)})')
+                self._groups[f'r{index}'] = rule
+        self._compiled = {rule.pattern: self._compiled[rule.pattern] for rule in rules if rule.kind == REGEX}
+        # A word does not match inside a longer word; the longest alternative is tried first
+        words = fr'(?<!\w){trie_pattern(list(self._words))}(?!\w)'
+        self._text = re.compile(words, re.IGNORECASE) if self._words else None
+        # One scan for the literal starts of the regex rules decides whether they need to run at all
+        self._starts = re.compile(trie_pattern(prefixes), re.IGNORECASE) if prefixes else None
+        self._ascii_starts = re.compile(trie_pattern(prefixes)) if prefixes else None
+        self._masks = re.compile('|'.join(masks), re.IGNORECASE) if masks else None
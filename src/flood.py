@@ -0,0 +1,35 @@
+import time
+from typing import Callable
+
+# ircu-style penalty: every line costs 2 seconds plus 1 second per 120 bytes
+RATE = 0.5
+BURST = 5
+BYTES_PER_TOKEN = 240
+
+
+def message_cost(size: int) -> float:
+    return 1 + size / BYTES_PER_TOKEN
+
+
+class TokenBucket:
+    def __init__(self, rate: float = RATE, burst: float = BURST, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, cost: float) -> float:
+        self._refill()
+        # A line costing more than the whole burst is sent as soon as the bucket is full
+        cost = min(cost, self.burst)
+        return 0 if self.tokens >= cost else (cost - self.tokens) / self.rate
+
+    def consume(self, cost: float):
+        self._refill()
+        self.tokens -= cost
@@ -0,0 +1,111 @@
+import re
+import string
+
+ESCAPED_CHAR = re.compile(r'\\x([0-9A-Fa-f]{2})')
+
+ASCII_CASEMAP = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+CASEMAPS = {
+    'ascii': ASCII_CASEMAP,
+    'rfc1459': str.maketrans(string.ascii_uppercase + '[]\\~', string.ascii_lowercase + '{}|^'),
+    'strict-rfc1459': str.maketrans(string.ascii_uppercase + '[]\\', string.ascii_lowercase + '{}|'),
+}
+
+DEFAULT_PREFIX = '(qaohv)~&@%+'
+DEFAULT_CHANMODES = 'beI,k,l,imnpst'
+DEFAULT_CHANTYPES = '#&'
+
+
+def unescape_value(value: str) -> str:
+    return ESCAPED_CHAR.sub(lambda match: chr(int(match.group(1), 16)), value)
+
+
+# RPL_ISUPPORT (005) tokens advertised by the server.
+# Lookup tables are compiled once per update, so the parsing paths never re-read the raw tokens.
+class ISupport:
+    def __init__(self):
+        self.features: dict[str, str] = {}
+        self._compile()
+
+    def __contains__(self, feature: str) -> bool:
+        return feature in self.features
+
+    def get(self, feature: str, default: str = None) -> str:
+        return self.features.get(feature, default)
+
+    # Every connection advertises its own tokens
+    def reset(self):
+        self.features.clear()
+        self._compile()
+
+    def update(self, tokens: list[str]):
+        for token in tokens:
+            if token.startswith('-'):
+                self.features.pop(token[1:].upper(), None)
+                continue
+            feature, _, value = token.partition('=')
+            self.features[feature.upper()] = unescape_value(value)
+        self._compile()
+
+    def _compile(self):
+        self._casemap: dict[int, str] = CASEMAPS.get(
+            self.features.get('CASEMAPPING', 'rfc1459').lower(), ASCII_CASEMAP
+        )
+        self.chantypes: frozenset[str] = frozenset(self.features.get('CHANTYPES', DEFAULT_CHANTYPES))
+
+        modes, _, prefixes = self.features.get('PREFIX', DEFAULT_PREFIX).lstrip('(').partition(')')
+        # mode letter -> prefix char, highest first
+        self.prefix: dict[str, str] = dict(zip(modes, prefixes))
+        # prefix char -> rank, 0 is the highest
+        self.prefix_ranks: dict[str, int] = {char: rank for rank, char in enumerate(self.prefix.values())}
+
+        chanmodes = self.features.get('CHANMODES', DEFAULT_CHANMODES).split(',')
+        self.chanmodes: list[str] = (chanmodes + ['', '', '', ''])[:4]
+        self.list_modes: frozenset[str] = frozenset(self.chanmodes[0] + ''.join(self.prefix))
+        self._always_param: frozenset[str] = frozenset(self.chanmodes[0] + self.chanmodes[1] + ''.join(self.prefix))
+        self._set_param: frozenset[str] = frozenset(self.chanmodes[2])
+
+    def casefold(self, text: str) -> str:
+        return text.translate(self._casemap)
+
+    def is_channel(self, target: str) -> bool:
+        return bool(target) and target[0] in self.chantypes
+
+    @property
+    def elist(self) -> str:
+        return self.features.get('ELIST', '').upper()
+
+    # With multi-prefix a NAMES entry carries every prefix highest first, so only a strictly
+    # descending run is taken and a nick that itself starts with a prefix char keeps it
+    def split_prefixes(self, name: str) -> tuple[str, str]:
+        ranks = self.prefix_ranks
+        end, last = 0, -1
+        for char in name:
+            rank = ranks.get(char)
+            if rank is None or rank <= last:
+                break
+            end, last = end + 1, rank
+        return name[:end], name[end:]
+
+    def highest_prefix(self, prefixes: str) -> str:
+        ranks = self.prefix_ranks
+        if len(prefixes) < 2:
+            return prefixes if prefixes in ranks else ''
+        return min((char for char in prefixes if char in ranks), key=ranks.__getitem__, default='')
+
+    # Members without a prefix rank below every prefix the server advertises
+    def rank(self, prefix: str) -> int:
+        return self.prefix_ranks.get(prefix, len(self.prefix_ranks))
+
+    def parse_modes(self, modes: str, params: list[str]) -> list[tuple[bool, str, str]]:
+        always_param, set_param = self._always_param, self._set_param
+        params = iter(params)
+        changes = []
+        adding = True
+        for mode in modes:
+            if mode in '+-':
+                adding = mode == '+'
+            elif mode in always_param or (adding and mode in set_param):
+                changes.append((adding, mode, next(params, None)))
+            else:
+                changes.append((adding, mode, None))
+        return changes
@@ -0,0 +1,105 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+from datetime import datetime
+
+LogEntry = namedtuple('LogEntry', ['time', 'channel', 'text'])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    channel TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_channel_time ON messages (channel, time);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(text, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+'''
+
+
+def fts_query(query: str) -> str:
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+# Append-only chat log in SQLite with an FTS5 index, written from a background thread
+class LogStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self.closed = False
+        with closing(self._connect()) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+        self._thread = threading.Thread(target=self._write_loop, name='log-store', daemon=True)
+        self._thread.start()
+
+    # Lines arriving after close() have nobody to write them and are dropped
+    def append(self, channel: str | None, text: str, timestamp: float = None):
+        if not self.closed:
+            self._queue.put((timestamp or time.time(), channel or '', text))
+
+    def flush(self):
+        if not self.closed:
+            self._queue.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    async def search(self, query: str, channel: str = None, limit: int = 100) -> list[LogEntry]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._search, query, channel, limit)
+
+    async def export(self, channel: str | None, path: str, encoding: str = 'utf-8'):
+        await asyncio.get_running_loop().run_in_executor(None, self._export, channel, path, encoding)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _write_loop(self):
+        connection = self._connect()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            rows = [item for item in batch if item is not None]
+            running = len(rows) == len(batch)
+            with connection:
+                connection.executemany('INSERT INTO messages (time, channel, text) VALUES (?, ?, ?)', rows)
+            for _ in batch:
+                self._queue.task_done()
+        connection.close()
+
+    def _search(self, query: str, channel: str | None, limit: int) -> list[LogEntry]:
+        self.flush()
+        sql = (
+            'SELECT m.time, m.channel, m.text FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid '
+            'WHERE messages_fts MATCH ?'
+        )
+        params = [fts_query(query)]
+        if channel is not None:
+            sql += ' AND m.channel = ?'
+            params.append(channel)
+        sql += ' ORDER BY m.time DESC LIMIT ?'
+        params.append(limit)
+        with closing(self._connect()) as connection:
+            return [LogEntry(*row) for row in connection.execute(sql, params)]
+
+    def _export(self, channel: str | None, path: str, encoding: str):
+        self.flush()
+        with closing(self._connect()) as connection, open(path, 'w', encoding=encoding) as log_file:
+            rows = connection.execute('SELECT time, text FROM messages WHERE channel = ? ORDER BY id', [channel or ''])
+            for timestamp, text in rows:
+                log_file.write(f'[{datetime.fromtimestamp(timestamp):%d.%m.%Y %H:%M:%S}] {text}\n')
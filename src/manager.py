@@ -0,0 +1,129 @@
+import asyncio
+import signal
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from src.client import IrcClient
+
+Session = namedtuple('Session', ['host', 'port', 'nickname', 'encoding', 'channels'], defaults=['utf-8', ()])
+
+CLOSE_TIMEOUT = 5
+
+
+def session_name(session: Session) -> str:
+    return f'{session.nickname}@{session.host}:{session.port}'
+
+
+def merge_stats(stats: list[dict[str, float]]) -> dict[str, float]:
+    merged = {}
+    for shard in stats:
+        for key, value in shard.items():
+            merged[key] = max(merged.get(key, value), value) if key.startswith('max_') else merged.get(key, 0) + value
+    return merged
+
+
+# Many IrcClient sessions on one event loop; every client shares the class-level dispatch table
+class ConnectionManager:
+    def __init__(self, **client_options):
+        self.client_options = client_options
+        self.clients: dict[str, IrcClient] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def __len__(self):
+        return len(self.clients)
+
+    def __iter__(self):
+        return iter(self.clients.values())
+
+    def __contains__(self, name: str):
+        return name in self.clients
+
+    def add(self, session: Session, **client_options) -> IrcClient:
+        name = session_name(session)
+        if name in self.clients:
+            raise ValueError(f'Session {name} already exists')
+        client = IrcClient(
+            session.host, session.port, session.nickname, session.encoding, **{**self.client_options, **client_options}
+        )
+        for channel in session.channels:
+            client.join(channel)
+        self.clients[name] = client
+        self._tasks[name] = asyncio.get_running_loop().create_task(client.run())
+        return client
+
+    async def remove(self, name: str):
+        client = self.clients.pop(name)
+        task = self._tasks.pop(name)
+        client.close()
+        await self._wait_closed([task])
+
+    async def close(self):
+        for client in self.clients.values():
+            client.close()
+        tasks = list(self._tasks.values())
+        self.clients.clear()
+        self._tasks.clear()
+        await self._wait_closed(tasks)
+
+    async def _wait_closed(self, tasks: list[asyncio.Task]):
+        if not tasks:
+            return
+        # Sessions waiting out a reconnect delay or a server that ignores QUIT are cut off
+        _, pending = await asyncio.wait(tasks, timeout=CLOSE_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, float]:
+        stats = {
+            'sessions': len(self.clients),
+            'registered': 0,
+            'joined_channels': 0,
+            'lines_received': 0,
+            'commands_queued': 0,
+            'commands_sent': 0,
+            'max_command_latency': 0.0,
+        }
+        for client in self.clients.values():
+            commands = client.commands.stats()
+            stats['registered'] += client.registered
+            stats['joined_channels'] += len(client.joined_channels)
+            stats['lines_received'] += client.lines_received
+            stats['commands_queued'] += len(client.commands)
+            stats['commands_sent'] += commands['sent']
+            stats['max_command_latency'] = max(stats['max_command_latency'], commands['max_latency'])
+        return stats
+
+
+async def serve(sessions: list[Session], client_options: dict = None, duration: float = None) -> dict[str, float]:
+    manager = ConnectionManager(**(client_options or {}))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+    for session in sessions:
+        manager.add(session)
+    try:
+        await asyncio.wait_for(stop.wait(), duration)
+    except asyncio.TimeoutError:
+        pass
+    stats = manager.stats()
+    await manager.close()
+    return stats
+
+
+def run_shard(sessions: list[Session], client_options: dict = None, duration: float = None) -> dict[str, float]:
+    return asyncio.run(serve(sessions, client_options, duration))
+
+
+# Splits the sessions over worker processes, each with its own loop; returns the merged final stats
+async def run_sharded(
+    sessions: list[Session], workers: int, client_options: dict = None, duration: float = None
+) -> dict[str, float]:
+    shards = [shard for shard in (sessions[i::workers] for i in range(workers)) if shard]
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(len(shards)) as pool:
+        stats = await asyncio.gather(
+            *(loop.run_in_executor(pool, run_shard, shard, client_options, duration) for shard in shards)
+        )
+    return merge_stats(stats)
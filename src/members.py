@@ -0,0 +1,116 @@
+from bisect import bisect_left, insort
+from collections import namedtuple
+from typing import Iterable
+
+from src.isupport import ISupport
+from src.membership import ChannelMembership
+from src.users import UserRegistry
+
+# membership is the display name of the prefix; rank is its position in the server's PREFIX
+Member = namedtuple('Member', ['membership', 'nick', 'prefix', 'rank'])
+MembersUpdate = namedtuple(
+    'MembersUpdate', ['channel', 'added', 'removed', 'changed', 'reset'], defaults=[(), (), (), False]
+)
+
+
+# Channel members keyed by casemapped nick, kept sorted by PREFIX rank and nick.
+# Each member is also linked to its shared record in the client-wide UserRegistry.
+class MemberIndex:
+    def __init__(self, isupport: ISupport, users: UserRegistry = None, channel: str = ''):
+        self.isupport = isupport
+        self.users: UserRegistry = users if users is not None else UserRegistry(isupport)
+        self.channel: str = isupport.casefold(channel)
+        self._members: dict[str, Member] = {}
+        self._prefixes: dict[str, str] = {}
+        self._order: list[tuple[int, str]] = []
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return (self._members[key] for _, key in self._order)
+
+    def __contains__(self, nick: str) -> bool:
+        return self.isupport.casefold(nick) in self._members
+
+    def get(self, nick: str) -> Member | None:
+        return self._members.get(self.isupport.casefold(nick))
+
+    def clear(self):
+        self.users.part_all(self._members, self.channel)
+        self._members.clear()
+        self._prefixes.clear()
+        self._order.clear()
+
+    # A complete NAMES list, applied in place: members who stayed keep their shared record and
+    # their Member when the prefixes are unchanged, only those gone are parted
+    def replace(self, names: Iterable[str]):
+        casefold, split_prefixes, join = self.isupport.casefold, self.isupport.split_prefixes, self.users.join
+        members, all_prefixes = self._members, self._prefixes
+        gone = set(members)
+        for name in names:
+            prefixes, nick = split_prefixes(name)
+            key = casefold(nick)
+            gone.discard(key)
+            if all_prefixes.get(key) != prefixes:
+                members[key] = self._member(join(nick, self.channel, key).nick, prefixes)
+                all_prefixes[key] = prefixes
+        for key in gone:
+            del members[key], all_prefixes[key]
+        self.users.part_all(gone, self.channel)
+        order = self._order
+        order.clear()
+        order.extend((member.rank, key) for key, member in members.items())
+        order.sort()
+
+    def add(self, nick: str, prefixes: str = '') -> Member:
+        key = self.isupport.casefold(nick)
+        if key in self._members:
+            self._discard(key)
+        user = self.users.join(nick, self.channel, key)
+        return self._store(key, user.nick, prefixes)
+
+    def remove(self, nick: str) -> Member | None:
+        key = self.isupport.casefold(nick)
+        if key not in self._members:
+            return None
+        member = self._members[key]
+        self._discard(key)
+        self.users.part(nick, self.channel, key)
+        return member
+
+    def rename(self, nick: str, new_nick: str) -> tuple[Member, Member] | None:
+        key = self.isupport.casefold(nick)
+        if key not in self._members:
+            return None
+        member, prefixes = self._members[key], self._prefixes[key]
+        self._discard(key)
+        # The shared record is renamed by whichever channel sees the change first
+        user = self.users.get(new_nick) if nick not in self.users else self.users.rename(nick, new_nick)
+        return member, self._store(self.isupport.casefold(new_nick), user.nick, prefixes)
+
+    def set_prefix(self, nick: str, prefix: str, enabled: bool) -> tuple[Member, Member] | None:
+        key = self.isupport.casefold(nick)
+        if key not in self._members:
+            return None
+        member, prefixes = self._members[key], self._prefixes[key]
+        if enabled == (prefix in prefixes):
+            return None
+        prefixes = prefixes + prefix if enabled else prefixes.replace(prefix, '')
+        self._discard(key)
+        return member, self._store(key, member.nick, prefixes)
+
+    def _member(self, nick: str, prefixes: str) -> Member:
+        prefix = self.isupport.highest_prefix(prefixes)
+        return Member(ChannelMembership.from_prefix(prefix), nick, prefix, self.isupport.rank(prefix))
+
+    def _store(self, key: str, nick: str, prefixes: str) -> Member:
+        member = self._members[key] = self._member(nick, prefixes)
+        self._prefixes[key] = prefixes
+        insort(self._order, (member.rank, key))
+        return member
+
+    def _discard(self, key: str):
+        member = self._members.pop(key)
+        del self._prefixes[key]
+        del self._order[bisect_left(self._order, (member.rank, key))]
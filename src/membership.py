@@ -17,18 +17,22 @@ class ChannelMembership(IntEnum):
     VOICE = 4
     DEFAULT = 5
 
+    @staticmethod
+    def from_prefix(prefix: str) -> IntEnum:
+        return PREFIX_MEMBERSHIPS.get(prefix, ChannelMembership.DEFAULT)
+
+    # Without the server's PREFIX at hand; IrcClient splits names with ISupport.split_prefixes
     @staticmethod
     def parse_name(name: str) -> tuple[IntEnum, str, str]:
-        membership = None
-        prefix = None
-        for i in range(len(MEMBERSHIP_PREFIXES)):
-            for pref in MEMBERSHIP_PREFIXES[i]:
-                if name.startswith(pref):
-                    membership = ChannelMembership(i)
-                    name = name.lstrip(pref)
-                    prefix = pref
-                    break
-        if membership is None:
-            membership = ChannelMembership.DEFAULT
-            prefix = ''
-        return membership, name, prefix
+        end = 0
+        while end < len(name) and name[end] in PREFIX_MEMBERSHIPS:
+            if end and PREFIX_MEMBERSHIPS[name[end]] <= PREFIX_MEMBERSHIPS[name[end - 1]]:
+                break
+            end += 1
+        prefix = name[:1] if end else ''
+        return ChannelMembership.from_prefix(prefix), name[end:], prefix
+
+
+PREFIX_MEMBERSHIPS: dict[str, ChannelMembership] = {
+    prefix: ChannelMembership(rank) for rank, (prefix, _) in enumerate(MEMBERSHIP_PREFIXES)
+}
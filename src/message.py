@@ -0,0 +1,74 @@
+from collections import namedtuple
+from functools import lru_cache
+
+TAG_ESCAPES = {':': ';', 's': ' ', '\\': '\\', 'r': '\r', 'n': '\n'}
+
+
+def unescape_tag_value(value: str) -> str:
+    if '\\' not in value:
+        return value
+    result = []
+    chars = iter(value)
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, '')
+            result.append(TAG_ESCAPES.get(escaped, escaped))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def parse_tags(raw: str) -> dict[str, str]:
+    tags = {}
+    for tag in raw.split(';'):
+        if not tag:
+            continue
+        key, _, value = tag.partition('=')
+        tags[key] = unescape_tag_value(value)
+    return tags
+
+
+# The same few thousand senders repeat on every line
+@lru_cache(maxsize=4096)
+def parse_prefix(prefix: str) -> tuple[str, str, str]:
+    nick, _, host = prefix.partition('@')
+    nick, _, user = nick.partition('!')
+    return nick, user, host
+
+
+class Message(namedtuple('Message', ['tags', 'prefix', 'command', 'params'])):
+    __slots__ = ()
+
+    @property
+    def trailing(self) -> str:
+        return self.params[-1] if self.params else ''
+
+    @property
+    def nick(self) -> str:
+        return parse_prefix(self.prefix)[0] if self.prefix else ''
+
+    @property
+    def full_name(self) -> str:
+        nick, user, host = parse_prefix(self.prefix) if self.prefix else ('', '', '')
+        return f'{user}@{host}' if user else host
+
+
+def parse_message(line: str) -> Message:
+    line = line.rstrip('\r\n')
+    tags = {}
+    prefix = None
+    if line.startswith('@'):
+        raw_tags, _, line = line[1:].partition(' ')
+        tags = parse_tags(raw_tags)
+        line = line.lstrip(' ')
+    if line.startswith(':'):
+        prefix, _, line = line[1:].partition(' ')
+        line = line.lstrip(' ')
+    line, has_trailing, trailing = line.partition(' :')
+    if line.startswith(':'):
+        line, has_trailing, trailing = '', True, line[1:]
+    params = line.split()
+    command = params.pop(0).upper() if params else ''
+    if has_trailing:
+        params.append(trailing)
+    return Message(tags, prefix, command, params)
@@ -0,0 +1,188 @@
+import asyncio
+import bisect
+import logging
+import logging.handlers
+from collections import defaultdict, namedtuple
+from typing import Callable, Iterable
+
+Metric = namedtuple('Metric', ['kind', 'help', 'label'], defaults=[None])
+# A gauge value from a collector: (metric name, label value, value)
+Sample = tuple[str, str, float]
+
+NAMESPACE = 'irc'
+# Seconds; everything slower lands in the +Inf bucket
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+CLIENT_METRICS = {
+    'lines_received_total': Metric('counter', 'Lines received from the server', 'command'),
+    'lines_sent_total': Metric('counter', 'Lines sent to the server', 'command'),
+    'bytes_received_total': Metric('counter', 'Bytes received from the server'),
+    'bytes_sent_total': Metric('counter', 'Bytes sent to the server'),
+    'handler_seconds': Metric('histogram', 'Time spent handling a received line', 'command'),
+    'reconnects_total': Metric('counter', 'Reconnect attempts'),
+    'sessions_registered': Metric('gauge', 'Sessions registered with their server'),
+    'joined_channels': Metric('gauge', 'Channels joined'),
+    'queue_depth': Metric('gauge', 'Commands waiting to be sent', 'lane'),
+    'filter_hits': Metric('gauge', 'Incoming messages matched by a filter rule', 'rule'),
+}
+
+TRACE_MAX_BYTES = 16 * 1024 * 1024
+TRACE_BACKUPS = 3
+# Their parameters are credentials and never reach the trace
+HIDDEN_COMMANDS = ('PASS', 'AUTHENTICATE', 'OPER')
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        # Prometheus buckets are upper bounds inclusive of the value
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total, counts = 0, []
+        for bound, count in zip((*map(str, self.buckets), '+Inf'), self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Counters and histograms recorded by the client and rendered in the Prometheus text format;
+# gauges are read from the registered collectors when rendered. One instance may be shared by many clients
+class Metrics:
+    def __init__(
+        self,
+        namespace: str = NAMESPACE,
+        metrics: dict[str, Metric] = None,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.namespace = namespace
+        self.metrics: dict[str, Metric] = dict(CLIENT_METRICS if metrics is None else metrics)
+        self.buckets = buckets
+        self.counters: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        self.histograms: dict[str, dict[str, Histogram]] = defaultdict(dict)
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def inc(self, name: str, label: str = '', amount: float = 1):
+        self.counters[name][label] += amount
+
+    def observe(self, name: str, value: float, label: str = ''):
+        histograms = self.histograms[name]
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.remove(collector)
+
+    def gauges(self) -> dict[str, dict[str, float]]:
+        gauges: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        for collector in self._collectors:
+            for name, label, value in collector():
+                gauges[name][label] += value
+        return gauges
+
+    def stats(self) -> dict[str, float]:
+        stats = {}
+        for name, values in (*self.counters.items(), *self.gauges().items()):
+            stats[name] = sum(values.values())
+            stats.update((f'{name}:{label}', value) for label, value in values.items() if label)
+        for name, histograms in self.histograms.items():
+            stats[f'{name}_count'] = sum(histogram.count for histogram in histograms.values())
+            stats[f'{name}_sum'] = sum(histogram.sum for histogram in histograms.values())
+            stats[f'max_{name}'] = max(histogram.max for histogram in histograms.values())
+        return stats
+
+    def render(self) -> str:
+        lines = []
+        gauges = self.gauges()
+        for name in sorted({*self.counters, *self.histograms, *gauges}):
+            metric = self.metrics.get(name) or Metric('histogram' if name in self.histograms else 'counter', name)
+            full_name = f'{self.namespace}_{name}' if self.namespace else name
+            lines.append(f'# HELP {full_name} {metric.help}')
+            lines.append(f'# TYPE {full_name} {metric.kind}')
+            if name in self.histograms:
+                for label, histogram in sorted(self.histograms[name].items()):
+                    labels = self._labels(metric, label)
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{full_name}_bucket{{{labels}le="{bound}"}} {count}')
+                    lines.append(f'{full_name}_sum{self._braces(labels)} {histogram.sum}')
+                    lines.append(f'{full_name}_count{self._braces(labels)} {histogram.count}')
+                continue
+            values = self.counters[name] if name in self.counters else gauges[name]
+            for label, value in sorted(values.items()):
+                lines.append(f'{full_name}{self._braces(self._labels(metric, label))} {value}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(metric: Metric, label: str) -> str:
+        return f'{metric.label}="{escape_label(label)}",' if metric.label and label else ''
+
+    @staticmethod
+    def _braces(labels: str) -> str:
+        return f'{{{labels.rstrip(",")}}}' if labels else ''
+
+
+# A minimal HTTP endpoint for scrapers: GET /metrics answers with Metrics.render()
+async def serve_metrics(metrics: Metrics, host: str = '127.0.0.1', port: int = 9100) -> asyncio.Server:
+    async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            while await reader.readline() not in (b'\r\n', b'\n', b''):
+                pass
+            method, path, *_ = (*request.decode('latin-1').split(), '', '')
+            if method == 'GET' and path.partition('?')[0] == '/metrics':
+                status, body = '200 OK', metrics.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not found\n'
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(respond, host, port)
+
+
+# Every line on the wire with a timestamp, in a file rotated by size; '<<' received, '>>' sent
+class WireTrace:
+    def __init__(self, path: str, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS):
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True
+        )
+        self._handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+
+    def received(self, line: str):
+        self._write('<<', line)
+
+    def sent(self, line: str):
+        command, space, _ = line.partition(' ')
+        if space and command.upper() in HIDDEN_COMMANDS:
+            line = f'{command} <hidden>'
+        self._write('>>', line)
+
+    def close(self):
+        self._handler.close()
+
+    def _write(self, direction: str, line: str):
+        self._handler.handle(logging.makeLogRecord({'msg': f'{direction} {line}'}))
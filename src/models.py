@@ -0,0 +1,138 @@
+from bisect import bisect_left
+
+from PyQt6.QtCore import QAbstractListModel, QAbstractTableModel, QModelIndex, Qt
+
+from src.channel_list import Channel, ChannelListUpdate
+from src.members import Member, MembersUpdate
+
+
+def member_sort_key(member: Member) -> tuple:
+    return member.rank, member.nick.lower()
+
+
+class ChannelListModel(QAbstractTableModel):
+    HEADERS = ('Название', 'Users', 'Topic')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._channels: list[Channel] = []
+        self._rows: dict[str, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._channels)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        channel = self._channels[index.row()]
+        if index.column() == 1:
+            return channel.client_count
+        return channel.channel if index.column() == 0 else channel.topic
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def channel(self, row: int) -> Channel:
+        return self._channels[row]
+
+    def clear(self):
+        self.beginResetModel()
+        self._channels = []
+        self._rows = {}
+        self.endResetModel()
+
+    def apply(self, update: ChannelListUpdate):
+        if update.reset:
+            self.clear()
+        self.remove_channels(update.removed)
+        added = []
+        for channel in update.channels:
+            row = self._rows.get(channel.channel)
+            if row is None:
+                added.append(channel)
+                continue
+            self._channels[row] = channel
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+        self.append_channels(added)
+
+    def append_channels(self, channels: list[Channel]):
+        if not channels:
+            return
+        first = len(self._channels)
+        self.beginInsertRows(QModelIndex(), first, first + len(channels) - 1)
+        self._channels.extend(channels)
+        self._rows.update((channel.channel, row) for row, channel in enumerate(channels, first))
+        self.endInsertRows()
+
+    def remove_channels(self, names: list[str]):
+        rows = sorted((self._rows[name] for name in names if name in self._rows), reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._channels[row]
+            self.endRemoveRows()
+        if rows:
+            self._rows = {channel.channel: row for row, channel in enumerate(self._channels)}
+
+
+class MemberListModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._members: list[Member] = []
+        self._by_nick: dict[str, Member] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._members)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        member = self._members[index.row()]
+        return member.prefix + member.nick
+
+    def member(self, row: int) -> Member:
+        return self._members[row]
+
+    def clear(self):
+        self.beginResetModel()
+        self._members = []
+        self._by_nick = {}
+        self.endResetModel()
+
+    def apply(self, update: MembersUpdate):
+        if update.reset:
+            self.beginResetModel()
+            self._members = sorted(update.added, key=member_sort_key)
+            self._by_nick = {member.nick: member for member in self._members}
+            self.endResetModel()
+            return
+        for member in update.removed:
+            self._remove(member)
+        for old, new in update.changed:
+            self._remove(old)
+            self._insert(new)
+        for member in update.added:
+            self._insert(member)
+
+    def _insert(self, member: Member):
+        if member.nick in self._by_nick:
+            self._remove(self._by_nick[member.nick])
+        row = bisect_left(self._members, member_sort_key(member), key=member_sort_key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._members.insert(row, member)
+        self._by_nick[member.nick] = member
+        self.endInsertRows()
+
+    def _remove(self, member: Member):
+        member = self._by_nick.get(member.nick)
+        if member is None:
+            return
+        row = bisect_left(self._members, member_sort_key(member), key=member_sort_key)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._members[row]
+        del self._by_nick[member.nick]
+        self.endRemoveRows()
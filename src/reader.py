@@ -0,0 +1,147 @@
+import asyncio
+from ssl import SSLContext
+
+# 8191 bytes of IRCv3 tags plus a 512-byte message
+MAX_LINE_LENGTH = 8703
+# Reading pauses while this many lines wait for the parser
+HIGH_WATER_LINES = 10000
+
+
+# Splits every complete line out of the receive buffer in one pass and hands them over in batches
+class LineProtocol(asyncio.Protocol):
+    def __init__(self, max_line_length: int = MAX_LINE_LENGTH, high_water: int = HIGH_WATER_LINES):
+        self.max_line_length = max_line_length
+        self.high_water = high_water
+        self.transport: asyncio.Transport = None
+
+        self._buffer = bytearray()
+        self._lines: list[bytes] = []
+        self._discarding = False
+        self._paused = False
+        self._eof = False
+        self._exception: Exception = None
+        self._waiter: asyncio.Future = None
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self._closed = asyncio.get_running_loop().create_future()
+
+        self.overlong = 0
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def connection_lost(self, exception: Exception | None):
+        self._eof = True
+        self._exception = exception
+        self._can_write.set()
+        self._wake()
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    def eof_received(self):
+        self._eof = True
+        self._wake()
+
+    def data_received(self, data: bytes):
+        buffer = self._buffer
+        buffer += data
+        end = buffer.rfind(b'\n')
+        if end == -1:
+            if len(buffer) > self.max_line_length:
+                self._drop_partial_line()
+            return
+        with memoryview(buffer) as view:
+            chunk = view[:end + 1].tobytes()
+        del buffer[:end + 1]
+        # splitlines() takes \r\n and bare \n alike; a \r waiting for its \n stays in the buffer
+        lines = chunk.splitlines()
+        if self._discarding:
+            self._discarding = False
+            del lines[0]
+        limit = self.max_line_length
+        batch = [line for line in lines if line and len(line) <= limit]
+        if len(batch) != len(lines):
+            self.overlong += sum(len(line) > limit for line in lines)
+        self._lines += batch
+        if len(buffer) > limit:
+            self._drop_partial_line()
+        if len(self._lines) >= self.high_water and not self._paused:
+            self._paused = True
+            self.transport.pause_reading()
+        self._wake()
+
+    def pause_writing(self):
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self._can_write.set()
+
+    async def read_lines(self) -> list[bytes]:
+        while not self._lines:
+            if self._exception is not None:
+                raise self._exception
+            if self._eof:
+                return []
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        lines, self._lines = self._lines, []
+        if self._paused:
+            self._paused = False
+            self.transport.resume_reading()
+        return lines
+
+    async def drain(self):
+        if self._exception is not None:
+            raise self._exception
+        if self._eof and self.transport.is_closing():
+            raise ConnectionResetError('Connection lost')
+        await self._can_write.wait()
+
+    async def wait_closed(self):
+        await self._closed
+
+    def _drop_partial_line(self):
+        self.overlong += not self._discarding
+        self._discarding = True
+        self._buffer.clear()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+# The StreamWriter calls the client makes, backed by the protocol's flow control
+class LineWriter:
+    def __init__(self, transport: asyncio.Transport, protocol: LineProtocol):
+        self.transport = transport
+        self.protocol = protocol
+
+    def write(self, data: bytes):
+        self.transport.write(data)
+
+    async def drain(self):
+        await self.protocol.drain()
+
+    def close(self):
+        self.transport.close()
+
+    def is_closing(self) -> bool:
+        return self.transport.is_closing()
+
+    async def wait_closed(self):
+        await self.protocol.wait_closed()
+
+    def get_extra_info(self, name: str, default=None):
+        return self.transport.get_extra_info(name, default)
+
+
+async def open_line_connection(
+    host: str, port: int, ssl: SSLContext = None, max_line_length: int = MAX_LINE_LENGTH
+) -> tuple[LineProtocol, LineWriter]:
+    transport, protocol = await asyncio.get_running_loop().create_connection(
+        lambda: LineProtocol(max_line_length), host, port, ssl=ssl
+    )
+    return protocol, LineWriter(transport, protocol)
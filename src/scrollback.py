@@ -0,0 +1,65 @@
+import tempfile
+from array import array
+from collections import deque
+
+
+# Keeps the last max_lines in memory, older lines are optionally spilled to a temporary file
+class Scrollback:
+    def __init__(self, max_lines: int = 1000, spill: bool = False):
+        self.max_lines: int = max_lines
+        self.spill: bool = spill
+        self._lines: deque[str] = deque()
+        self._dropped: int = 0
+        self._offsets: array = array('Q')
+        self._file = None
+
+    def __len__(self):
+        return self._dropped + len(self._offsets) + len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    @property
+    def first_index(self) -> int:
+        return self._dropped
+
+    def append(self, line: str):
+        if len(self._lines) >= self.max_lines:
+            self._evict(self._lines.popleft())
+        self._lines.append(line)
+
+    def extend(self, lines: list[str]):
+        for line in lines:
+            self.append(line)
+
+    def lines(self, start: int, stop: int) -> list[str]:
+        start, stop = max(start, self._dropped), min(stop, len(self))
+        if start >= stop:
+            return []
+        memory_start = self._dropped + len(self._offsets)
+        result = self._read_spilled(start - self._dropped, min(stop, memory_start) - self._dropped)
+        if stop > memory_start:
+            result.extend(self._lines[index - memory_start] for index in range(max(start, memory_start), stop))
+        return result
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _evict(self, line: str):
+        if not self.spill:
+            self._dropped += 1
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(0, 2)
+        self._offsets.append(self._file.tell())
+        self._file.write(line.encode('utf-8', 'replace') + b'\n')
+
+    def _read_spilled(self, start: int, stop: int) -> list[str]:
+        if start >= stop:
+            return []
+        end = self._offsets[stop] if stop < len(self._offsets) else self._file.seek(0, 2)
+        self._file.seek(self._offsets[start])
+        return self._file.read(end - self._offsets[start]).decode('utf-8').split('\n')[:-1]
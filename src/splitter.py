@@ -0,0 +1,77 @@
+import re
+import unicodedata
+
+MAX_LINE_BYTES = 512
+# Until the server shows us our hostmask assume the longest one it could assign
+DEFAULT_USER_LENGTH = 10
+DEFAULT_HOST_LENGTH = 63
+
+ZERO_WIDTH_JOINER = '\u200d'
+JOINERS = {ZERO_WIDTH_JOINER, '\u034f'}
+# Only real line breaks; str.splitlines() would also split on formatting codes like \x1d (italic)
+NEWLINES = re.compile(r'\r\n|\r|\n')
+
+
+def payload_size(hostmask: str, command: str, target: str, encoding: str) -> int:
+    return MAX_LINE_BYTES - len(f':{hostmask} {command} {target} :\r\n'.encode(encoding, 'replace'))
+
+
+def default_hostmask(nickname: str) -> str:
+    return f'{nickname}!{"u" * DEFAULT_USER_LENGTH}@{"h" * DEFAULT_HOST_LENGTH}'
+
+
+def _is_attached(char: str) -> bool:
+    code = ord(char)
+    return (
+        bool(unicodedata.combining(char))
+        or char in JOINERS
+        or 0xFE00 <= code <= 0xFE0F
+        # Emoji skin tones and tag sequences
+        or 0x1F3FB <= code <= 0x1F3FF
+        or 0xE0020 <= code <= 0xE007F
+    )
+
+
+def _is_joined(previous: str, following: str) -> bool:
+    return _is_attached(following) or previous == ZERO_WIDTH_JOINER
+
+
+def _cut(data: bytes, start: int, end: int, encoding: str) -> tuple[str, int]:
+    try:
+        text = data[start:end].decode(encoding)
+    except UnicodeDecodeError as error:
+        end = start + error.start
+        text = data[start:end].decode(encoding)
+    # Keep combining marks, modifiers and ZWJ emoji sequences together with the character they belong to
+    following = data[end:end + 8].decode(encoding, 'ignore')[:1]
+    if following and text and _is_joined(text[-1], following):
+        stripped = text
+        while stripped and _is_joined(stripped[-1], following):
+            following = stripped[-1]
+            stripped = stripped[:-1]
+        if stripped:
+            text = stripped
+            end = start + len(text.encode(encoding))
+    return text, end
+
+
+def split_message(text: str, encoding: str, max_bytes: int) -> list[str]:
+    if max_bytes < 4:
+        raise ValueError(f'No room for the message text: {max_bytes} bytes left')
+    chunks = []
+    for line in NEWLINES.split(text):
+        data = line.encode(encoding, 'replace')
+        start, size = 0, len(data)
+        while start < size:
+            end = start + max_bytes
+            if end >= size:
+                chunks.append(data[start:].decode(encoding))
+                break
+            space = data.rfind(b' ', start + 1, end + 1)
+            if space != -1:
+                chunks.append(data[start:space].decode(encoding))
+                start = space + 1
+            else:
+                chunk, start = _cut(data, start, end, encoding)
+                chunks.append(chunk)
+    return [chunk for chunk in chunks if chunk]
@@ -0,0 +1,58 @@
+import hashlib
+import ssl
+
+TLS_PORT = 6697
+
+
+class FingerprintMismatchError(ssl.SSLError):
+    pass
+
+
+def certificate_fingerprint(certificate: bytes) -> str:
+    return hashlib.sha256(certificate).hexdigest()
+
+
+def normalize_fingerprint(fingerprint: str) -> str:
+    return fingerprint.replace(':', '').strip().lower()
+
+
+# asyncio has no way to pass a session to the handshake, so the context hands out the
+# last session for the host itself; a reconnect then resumes instead of a full handshake
+class ResumingSSLContext(ssl.SSLContext):
+    def __new__(cls, protocol: int = ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        context = super().__new__(cls, protocol, *args, **kwargs)
+        context.sessions = {}
+        return context
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+
+    def remember(self, ssl_object: ssl.SSLObject):
+        # TLS 1.3 tickets arrive after the handshake, so this is called when the connection ends
+        if ssl_object.session is not None and ssl_object.session.has_ticket:
+            self.sessions[ssl_object.server_hostname] = ssl_object.session
+
+
+def create_context(
+    verify: bool = True, cafile: str = None, certfile: str = None, keyfile: str = None
+) -> ResumingSSLContext:
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if cafile:
+        context.load_verify_locations(cafile)
+    elif verify:
+        context.load_default_certs()
+    if not verify:
+        # Self-signed servers are still checked when a fingerprint is pinned
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    if certfile:
+        context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+def check_fingerprint(ssl_object: ssl.SSLObject, fingerprint: str):
+    actual = certificate_fingerprint(ssl_object.getpeercert(binary_form=True))
+    if actual != normalize_fingerprint(fingerprint):
+        raise FingerprintMismatchError(f'Server certificate fingerprint {actual} does not match the pinned one')
@@ -0,0 +1,90 @@
+import sys
+from typing import Iterable
+
+from src.isupport import ISupport
+from src.message import parse_prefix
+
+
+# One record per user however many channels we share with them
+class User:
+    __slots__ = ('nick', 'ident', 'host', 'away', 'channels')
+
+    def __init__(self, nick: str, ident: str = '', host: str = ''):
+        self.nick: str = sys.intern(nick)
+        self.ident: str = sys.intern(ident)
+        self.host: str = sys.intern(host)
+        self.away: str | None = None
+        # Casemapped names of the channels the user is seen in, in join order
+        self.channels: dict[str, None] = {}
+
+    def __repr__(self):
+        return f'User({self.nick!r}, {self.ident!r}, {self.host!r})'
+
+    @property
+    def full_name(self) -> str:
+        return f'{self.ident}@{self.host}' if self.ident else self.host
+
+
+# Client-wide users keyed by casemapped nick; a record lives while it has a channel
+class UserRegistry:
+    def __init__(self, isupport: ISupport):
+        self.isupport = isupport
+        self._users: dict[str, User] = {}
+
+    def __len__(self):
+        return len(self._users)
+
+    def __iter__(self):
+        return iter(self._users.values())
+
+    def __contains__(self, nick: str) -> bool:
+        return self.isupport.casefold(nick) in self._users
+
+    def get(self, nick: str) -> User | None:
+        return self._users.get(self.isupport.casefold(nick))
+
+    def clear(self):
+        self._users.clear()
+
+    # key is the casemapped nick when the caller has it already
+    def join(self, nick: str, channel: str, key: str = None) -> User:
+        key = key or self.isupport.casefold(nick)
+        user = self._users.get(key)
+        if user is None:
+            user = self._users[key] = User(nick)
+        user.channels[channel] = None
+        return user
+
+    def part(self, nick: str, channel: str, key: str = None) -> User | None:
+        key = key or self.isupport.casefold(nick)
+        user = self._users.get(key)
+        if user is None:
+            return None
+        user.channels.pop(channel, None)
+        if not user.channels:
+            del self._users[key]
+        return user
+
+    # Leaving a whole channel at once, e.g. when its member list is reset
+    def part_all(self, keys: Iterable[str], channel: str):
+        users = self._users
+        for key in keys:
+            channels = users[key].channels
+            channels.pop(channel, None)
+            if not channels:
+                del users[key]
+
+    def rename(self, nick: str, new_nick: str) -> User | None:
+        user = self._users.pop(self.isupport.casefold(nick), None)
+        if user is not None:
+            user.nick = sys.intern(new_nick)
+            self._users[self.isupport.casefold(new_nick)] = user
+        return user
+
+    # Refreshes ident and host from a message prefix; unknown users are not stored
+    def update(self, prefix: str) -> User | None:
+        nick, ident, host = parse_prefix(prefix)
+        user = self._users.get(self.isupport.casefold(nick))
+        if user is not None and host and (user.ident != ident or user.host != host):
+            user.ident, user.host = sys.intern(ident), sys.intern(host)
+        return user
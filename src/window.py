@@ -1,38 +1,66 @@
 import asyncio
+import os
 from datetime import datetime
 
 from PyQt6 import QtCore
-from PyQt6.QtGui import QAction
+from PyQt6.QtCore import QSortFilterProxyModel, QStringListModel
+from PyQt6.QtGui import QAction, QTextCursor, QTextDocument
 from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QCheckBox,
     QFormLayout,
     QHBoxLayout,
     QLabel,
     QLineEdit,
+    QListView,
     QMainWindow,
     QPushButton,
+    QSpinBox,
+    QTabBar,
     QTabWidget,
     QTextEdit,
-    QTreeWidget,
-    QTreeWidgetItem,
+    QTreeView,
     QVBoxLayout,
     QWidget, QMenu,
 )
 from qasync import asyncSlot
 
-from client import IrcClient
+from src.channel_cache import ChannelCache
+from src.channel_list import ChannelListUpdate
+from src.channel_state import BUFFER_SIZE, ChannelState
+from src.client import IrcClient
+from src.coalescer import UpdateCoalescer
+from src.logstore import LogStore
+from src.members import MembersUpdate
+from src.models import ChannelListModel, MemberListModel
+from src.tls import create_context
+
+HISTORY_PAGE_LINES = 200
+# Seconds the previous client gets to send QUIT before it is cancelled
+CLOSE_TIMEOUT = 5
+LOGS_DIRECTORY = 'logs'
 
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        self.users_items = None
-        self.users = None
         self.save_log_button = None
         self.encoding_line_edit = None
         self.irc_client: IrcClient = None
-        self.channel_data = []
-        self.channel_items = []
+        self.client_task: asyncio.Task = None
+        self.log_store: LogStore = None
+        self.search_line_edit = None
+        self.search_results_model = QStringListModel(self)
+        self.channels_model = ChannelListModel(self)
+        self.channels_proxy_model = QSortFilterProxyModel(self)
+        self.members_model = MemberListModel(self)
+        self.members_models: dict[str, MemberListModel] = {}
+        self.coalescer = UpdateCoalescer(self.change_chat_view, self.change_chat_members)
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self.show_stats)
+        self.chat_documents: dict[str, QTextDocument] = {}
         self.chat_text = []
         self.current_channel = None
 
@@ -42,9 +70,13 @@ class MainWindow(QMainWindow):
         self.send_message_line_edit = None
         self.send_command_line_edit = None
         self.chat_view: QTextEdit = None
-        self.channel_view: QTreeWidget = None
+        self.chat_tabs: QTabBar = None
+        self.channel_view: QTreeView = None
         self.server_line_edit = None
+        self.tls_check_box = None
+        self.fingerprint_line_edit = None
         self.nickname_line_edit = None
+        self.scrollback_spin_box = None
         self.button_connect = None
 
         main_widget = QTabWidget()
@@ -59,6 +91,12 @@ class MainWindow(QMainWindow):
         self.server_line_edit = QLineEdit('irc.ircnet.ru:6688')
         layout.addWidget(self.server_line_edit)
 
+        self.tls_check_box = QCheckBox('TLS')
+        layout.addWidget(self.tls_check_box)
+        layout.addWidget(QLabel('SHA-256 отпечаток сертификата (для самоподписанных):'))
+        self.fingerprint_line_edit = QLineEdit()
+        layout.addWidget(self.fingerprint_line_edit)
+
         layout.addWidget(QLabel('Кодировка'))
         self.encoding_line_edit = QLineEdit('utf-8')
         layout.addWidget(self.encoding_line_edit)
@@ -67,6 +105,12 @@ class MainWindow(QMainWindow):
         self.nickname_line_edit = QLineEdit('pevel')
         layout.addWidget(self.nickname_line_edit)
 
+        layout.addWidget(QLabel('Строк истории в окне канала:'))
+        self.scrollback_spin_box = QSpinBox()
+        self.scrollback_spin_box.setRange(100, 1000000)
+        self.scrollback_spin_box.setValue(BUFFER_SIZE)
+        layout.addWidget(self.scrollback_spin_box)
+
         self.button_connect = QPushButton('Подключиться!')
         layout.addWidget(self.button_connect)
         self.button_connect.clicked.connect(self.connect_button_clicked)
@@ -81,10 +125,29 @@ class MainWindow(QMainWindow):
         layout_left_users = QVBoxLayout()
         layout_right = QVBoxLayout()
 
-        self.channel_view = QTreeWidget()
-        self.channel_view.headerItem().setText(0, "Название")
-        self.channel_view.headerItem().setText(1, "Users")
-        self.channel_view.headerItem().setText(2, 'Topic')
+        layout_channels_filter = QHBoxLayout()
+        self.channels_mask_line_edit = QLineEdit()
+        self.channels_mask_line_edit.setPlaceholderText('Маска, например *linux*')
+        self.channels_mask_line_edit.textChanged.connect(self.channels_proxy_model.setFilterWildcard)
+        layout_channels_filter.addWidget(self.channels_mask_line_edit)
+        self.channels_min_users_spin_box = QSpinBox()
+        self.channels_min_users_spin_box.setRange(0, 100000)
+        self.channels_min_users_spin_box.setPrefix('от ')
+        layout_channels_filter.addWidget(self.channels_min_users_spin_box)
+        self.update_channels_button = QPushButton('Обновить')
+        self.update_channels_button.clicked.connect(self.update_channels)
+        layout_channels_filter.addWidget(self.update_channels_button)
+        layout_left_channels.addLayout(layout_channels_filter)
+
+        self.channels_proxy_model.setSourceModel(self.channels_model)
+        self.channels_proxy_model.setFilterCaseSensitivity(QtCore.Qt.CaseSensitivity.CaseInsensitive)
+        self.channels_proxy_model.setFilterKeyColumn(0)
+        self.channel_view = QTreeView()
+        self.channel_view.setRootIsDecorated(False)
+        self.channel_view.setUniformRowHeights(True)
+        self.channel_view.setModel(self.channels_proxy_model)
+        self.channel_view.setSortingEnabled(True)
+        self.channel_view.sortByColumn(1, QtCore.Qt.SortOrder.DescendingOrder)
         layout_left_channels.addWidget(self.channel_view)
         self.connect_channel_button = QPushButton('Подключиться к каналу')
         layout_left_channels.addWidget(self.connect_channel_button)
@@ -98,12 +161,13 @@ class MainWindow(QMainWindow):
         self.save_log_button.clicked.connect(self.save_log)
         layout_left_channels.addWidget(self.save_log_button)
 
-        self.users_view = QTreeWidget()
+        self.users_view = QListView()
+        self.users_view.setUniformItemSizes(True)
+        self.users_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.users_view.setModel(self.members_model)
 
         self.users_view.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
         self.users_view.customContextMenuRequested.connect(self.open_menu)
-
-        self.users_view.headerItem().setText(0, "Ник")
         layout_left_users.addWidget(self.users_view)
 
         channel_user_tab = QTabWidget()
@@ -117,13 +181,35 @@ class MainWindow(QMainWindow):
         layout_left_users_widget.setLayout(layout_left_users)
         channel_user_tab.addTab(layout_left_users_widget, 'Пользователи')
 
+        layout_left_search = QVBoxLayout()
+        self.search_line_edit = QLineEdit()
+        self.search_line_edit.setPlaceholderText('Поиск по логам')
+        self.search_line_edit.returnPressed.connect(self.search_logs)
+        layout_left_search.addWidget(self.search_line_edit)
+        search_results_view = QListView()
+        search_results_view.setUniformItemSizes(True)
+        search_results_view.setWordWrap(True)
+        search_results_view.setModel(self.search_results_model)
+        layout_left_search.addWidget(search_results_view)
+        layout_left_search_widget = QWidget()
+        layout_left_search_widget.setLayout(layout_left_search)
+        channel_user_tab.addTab(layout_left_search_widget, 'Поиск')
+
         self.send_command_line_edit = QLineEdit()
         self.send_command_line_edit.setPlaceholderText('Command line')
         layout_right.addWidget(self.send_command_line_edit)
         self.send_command_line_edit.returnPressed.connect(self.command_enter_pressed)
 
+        self.chat_tabs = QTabBar()
+        self.chat_tabs.addTab('Статус')
+        self.chat_tabs.setTabData(0, None)
+        self.chat_tabs.currentChanged.connect(self.switch_chat_tab)
+        layout_right.addWidget(self.chat_tabs)
+
         self.chat_view = QTextEdit()
         self.chat_view.setReadOnly(True)
+        self.chat_view.setDocument(self.create_chat_document(None))
+        self.chat_view.verticalScrollBar().valueChanged.connect(self.chat_scrolled)
         layout_right.addWidget(self.chat_view)
 
         self.send_message_line_edit = QLineEdit()
@@ -153,13 +239,45 @@ class MainWindow(QMainWindow):
             self.encoding_line_edit.text(),
         )
         host, port = addr[0], addr[1]
-
+        fingerprint = self.fingerprint_line_edit.text().strip() or None
+        # A pinned fingerprint replaces the CA check and always means TLS
+        if fingerprint is not None:
+            self.tls_check_box.setChecked(True)
+        tls = create_context(verify=fingerprint is None) if self.tls_check_box.isChecked() else None
+
+        if self.irc_client is not None:
+            self.irc_client.close()
+            # The old client keeps writing to its log store and the coalescer until run() returns
+            done, _ = await asyncio.wait([self.client_task], timeout=CLOSE_TIMEOUT)
+            if not done:
+                self.client_task.cancel()
+                await asyncio.wait([self.client_task])
+        if self.log_store is not None:
+            self.log_store.close()
+        os.makedirs(LOGS_DIRECTORY, exist_ok=True)
+        self.log_store = LogStore(os.path.join(LOGS_DIRECTORY, f'{host}-{port}.sqlite3'))
         self.irc_client = IrcClient(
-            host, port, nickname, encoding, self.change_channels_list, self.change_chat_members, self.change_chat_view
+            host,
+            port,
+            nickname,
+            encoding,
+            self.change_channels_list,
+            self.coalescer.push_members,
+            self.coalescer.push_message,
+            self.change_joined_channels,
+            scrollback_lines=self.scrollback_spin_box.value(),
+            spill_scrollback=True,
+            log_store=self.log_store,
+            tls=tls,
+            fingerprint=fingerprint,
+            channel_cache=ChannelCache(LOGS_DIRECTORY),
         )
-        await self.irc_client.connect()
+        for document in self.chat_documents.values():
+            document.setMaximumBlockCount(self.irc_client.scrollback_lines)
+        self.coalescer.max_pending_lines = self.irc_client.scrollback_lines
+        self.stats_timer.start()
         loop = asyncio.get_event_loop()
-        loop.create_task(self.irc_client.handle())
+        self.client_task = loop.create_task(self.irc_client.run())
 
     @asyncSlot()
     async def message_enter_pressed(self):
@@ -168,71 +286,181 @@ class MainWindow(QMainWindow):
             await self.irc_client.send_message(message)
             self.send_message_line_edit.clear()
 
+    @asyncSlot()
+    async def update_channels(self):
+        if self.irc_client is None:
+            return
+        min_users = self.channels_min_users_spin_box.value() or None
+        mask = self.channels_mask_line_edit.text().strip() or None
+        self.irc_client.update_channels(min_users, mask)
+
     @asyncSlot()
     async def connect_channel(self):
-        self.irc_client.leave_channel()
-        for index, item in enumerate(self.channel_items):
-            if item.isSelected():
-                self.irc_client.join_channel(self.channel_data[index])
-                self.irc_client.update_members()
-        self.leave_channel_button.setDisabled(False)
+        channel = self.selected_channel()
+        if channel is None:
+            return
+        self.irc_client.join_channel(channel)
+        self.select_chat_tab(self.irc_client.current_channel)
 
     @asyncSlot()
     async def leave_channel(self):
         self.irc_client.leave_channel()
-        self.leave_channel_button.setDisabled(True)
-        self.users_view.clear()
 
     @asyncSlot()
     async def save_log(self):
+        if self.log_store is None:
+            return
         path = f'{datetime.now().strftime("%d-%m-%Y-%H-%M-%S")}.txt'
-        with open(path, 'w', encoding=self.irc_client.encoding) as log_file:
-            log_file.write(self.chat_view.toPlainText())
+        channel = self.chat_tabs.tabData(self.chat_tabs.currentIndex())
+        await self.log_store.export(channel, path, self.irc_client.encoding)
+
+    @asyncSlot()
+    async def search_logs(self):
+        query = self.search_line_edit.text().strip()
+        if self.log_store is None or not query:
+            return
+        entries = await self.log_store.search(query)
+        self.search_results_model.setStringList(
+            [f'[{datetime.fromtimestamp(entry.time):%d.%m.%Y %H:%M}] {entry.channel} {entry.text}' for entry in entries]
+        )
 
     @asyncSlot()
     async def ban(self):
-        user = None
-        for index, item in enumerate(self.users_items):
-            if item.isSelected():
-                user = self.users[index]
-        if user:
-            await self.irc_client.execute_command(f"MODE {self.irc_client.last_channel} +b {user}")
+        member = self.selected_member()
+        if member:
+            await self.irc_client.execute_command(f"MODE {self.irc_client.current_channel} +b {member.nick}")
 
     @asyncSlot()
     async def kick(self):
-        user = None
-        for index, item in enumerate(self.users_items):
-            if item.isSelected():
-                user = self.users[index]
-        if user:
-            await self.irc_client.execute_command(f"KICK {self.irc_client.last_channel} {user}")
-
-    async def change_channels_list(self, list_channels) -> None:
-        self.channel_view.clear()
-        self.channel_data.clear()
-        self.channel_items.clear()
-        for name, count, topic in list_channels:
-            current_tree_item = QTreeWidgetItem(self.channel_view)
-            current_tree_item.setText(0, name)
-            current_tree_item.setText(1, count)
-            current_tree_item.setText(2, topic)
-            self.channel_items.append(current_tree_item)
-        self.channel_data = list_channels.copy()
-        for i in range(3):
-            self.channel_view.resizeColumnToContents(i)
-
-    async def change_chat_view(self, text: str) -> None:
-        self.chat_view.append(text)
-
-    async def change_chat_members(self, members) -> None:
-        self.users_view.clear()
-        self.users = []
-        self.users_items = []
-        for membership, nick, prefix in members:
-            current_tree_item = QTreeWidgetItem(self.users_view)
-            current_tree_item.setText(0, prefix + nick)
-            self.users_items.append(current_tree_item)
-            self.users.append(nick)
+        member = self.selected_member()
+        if member:
+            await self.irc_client.execute_command(f"KICK {self.irc_client.current_channel} {member.nick}")
+
+    def selected_channel(self):
+        index = self.channel_view.currentIndex()
+        if not index.isValid():
+            return None
+        return self.channels_model.channel(self.channels_proxy_model.mapToSource(index).row())
+
+    def selected_member(self):
+        index = self.users_view.currentIndex()
+        return self.members_model.member(index.row()) if index.isValid() else None
+
+    async def change_channels_list(self, update: ChannelListUpdate) -> None:
+        self.channels_model.apply(update)
+        if update.reset:
+            for i in range(3):
+                self.channel_view.resizeColumnToContents(i)
+
+    def chat_tab_index(self, channel: str | None) -> int:
+        for index in range(self.chat_tabs.count()):
+            if self.chat_tabs.tabData(index) == channel:
+                return index
+        return -1
+
+    def select_chat_tab(self, channel: str | None):
+        index = self.chat_tab_index(channel)
+        if index != -1:
+            self.chat_tabs.setCurrentIndex(index)
+
+    def create_chat_document(self, channel: str | None) -> QTextDocument:
+        document = QTextDocument(self)
+        document.setMaximumBlockCount(self.irc_client.scrollback_lines if self.irc_client else BUFFER_SIZE)
+        self.chat_documents[channel] = document
+        return document
+
+    def chat_scrolled(self, value: int):
+        scroll_bar = self.chat_view.verticalScrollBar()
+        document = self.chat_view.document()
+        if value == scroll_bar.maximum() and document.maximumBlockCount() > self.irc_client.scrollback_lines:
+            document.setMaximumBlockCount(self.irc_client.scrollback_lines)
+        elif value == scroll_bar.minimum():
+            self.load_older_lines()
+
+    def load_older_lines(self):
+        state = self.irc_client.channel_state(self.chat_tabs.tabData(self.chat_tabs.currentIndex()))
+        if state is None:
+            return
+        document = self.chat_view.document()
+        first = len(state.buffer) - self.coalescer.pending_lines(state.name) - document.blockCount()
+        lines = state.buffer.lines(first - HISTORY_PAGE_LINES, first)
+        if not lines:
+            return
+        scroll_bar = self.chat_view.verticalScrollBar()
+        distance_to_bottom = scroll_bar.maximum() - scroll_bar.value()
+        document.setMaximumBlockCount(document.blockCount() + len(lines))
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.MoveOperation.Start)
+        cursor.insertText('\n'.join(lines))
+        cursor.insertBlock()
+        scroll_bar.setValue(scroll_bar.maximum() - distance_to_bottom)
+
+    def switch_chat_tab(self, index: int):
+        channel = self.chat_tabs.tabData(index)
+        self.chat_view.setDocument(self.chat_documents[channel])
+        self.chat_view.moveCursor(QTextCursor.MoveOperation.End)
+        self.members_model = self.members_models.get(channel) or MemberListModel(self)
+        self.users_view.setModel(self.members_model)
+        self.leave_channel_button.setDisabled(channel is None)
+        if self.irc_client is not None:
+            self.irc_client.switch_channel(channel)
+        if channel is not None:
+            self.chat_tabs.setTabText(index, channel)
+
+    async def change_joined_channels(self, channels: list[ChannelState]) -> None:
+        names = [state.name for state in channels]
+        for index in reversed(range(1, self.chat_tabs.count())):
+            channel = self.chat_tabs.tabData(index)
+            if channel not in names:
+                self.chat_tabs.removeTab(index)
+                self.chat_documents.pop(channel).deleteLater()
+                self.members_models.pop(channel).deleteLater()
+        for name in names:
+            if name not in self.chat_documents:
+                self.create_chat_document(name)
+                self.members_models[name] = MemberListModel(self)
+                self.chat_tabs.setTabData(self.chat_tabs.addTab(name), name)
+        self.select_chat_tab(self.irc_client.current_channel)
+
+    def change_chat_view(self, channel: str | None, lines: list[str]) -> None:
+        document = self.chat_documents.get(channel)
+        if document is None:
+            document = self.chat_documents[None]
+            lines = [f'[{channel}] {text}' for text in lines]
+        scroll_bar = self.chat_view.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        if not document.isEmpty():
+            cursor.insertBlock()
+        cursor.insertText('\n'.join(lines))
+        if document is self.chat_view.document():
+            if at_bottom:
+                scroll_bar.setValue(scroll_bar.maximum())
+        elif (state := self.irc_client.channel_state(channel)) and state.unread:
+            mentions = f', {state.highlights}!' if state.highlights else ''
+            self.chat_tabs.setTabText(self.chat_tab_index(state.name), f'{state.name} ({state.unread}{mentions})')
+
+    def change_chat_members(self, update: MembersUpdate) -> None:
+        if model := self.members_models.get(update.channel):
+            model.apply(update)
+
+    def closeEvent(self, event):
+        if self.log_store is not None:
+            self.log_store.close()
+        super().closeEvent(event)
+
+    def show_stats(self):
+        stats = self.coalescer.stats()
+        commands = self.irc_client.commands.stats()
+        decoder = self.irc_client.decoder.stats()
+        self.statusBar().showMessage(
+            f'Очередь UI: {stats["queue_depth"]} (макс. {stats["max_queue_depth"]}), '
+            f'объединено: {stats["merged"]}, отброшено: {stats["dropped"]}; '
+            f'к отправке: {commands["normal_depth"] + commands["chat_depth"]}, '
+            f'задержка отправки: {commands["average_latency"]:.2f} с; '
+            f'не UTF-8: {decoder["fallback_rate"]:.1%}'
+        )
 
     def open_menu(self, position):
         menu = QMenu()
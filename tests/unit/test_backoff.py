@@ -0,0 +1,16 @@
+from src.backoff import Backoff
+
+
+def test_delays_grow_up_to_maximum():
+    backoff = Backoff(initial=1, maximum=10, randomize=lambda low, high: high)
+    assert [backoff.next() for _ in range(6)] == [1, 2, 4, 8, 10, 10]
+
+    backoff.reset()
+    assert backoff.next() == 1
+
+
+def test_delays_are_jittered():
+    backoff = Backoff(initial=2, maximum=60)
+    delays = [backoff.next() for _ in range(10)]
+    assert all(1 <= delay <= 60 for delay in delays)
+    assert len(set(delays)) > 1
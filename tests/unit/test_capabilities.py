@@ -0,0 +1,75 @@
+import base64
+
+from src.capabilities import (
+    CapabilityNegotiation,
+    SaslCredentials,
+    authenticate_commands,
+    parse_capabilities,
+    server_time,
+)
+from src.command_queue import Command
+
+
+def test_parse_capabilities():
+    assert parse_capabilities('sasl=PLAIN,EXTERNAL batch  server-time') == {
+        'sasl': 'PLAIN,EXTERNAL',
+        'batch': '',
+        'server-time': '',
+    }
+
+
+def test_server_time():
+    assert server_time({'time': '2011-10-19T16:40:51.620Z'}) == 1319042451.62
+    assert server_time({'time': 'yesterday'}) is None
+    assert server_time({}) is None
+
+
+def test_negotiation_without_sasl():
+    negotiation = CapabilityNegotiation()
+    assert negotiation.start() == [Command('CAP', ['LS', '302'])]
+    assert negotiation.on_cap(['*', 'LS', '*', 'multi-prefix sasl=PLAIN']) == []
+    assert negotiation.on_cap(['*', 'LS', 'batch account-notify']) == [Command('CAP', ['REQ', ':batch multi-prefix'])]
+    assert negotiation.on_cap(['*', 'ACK', 'batch multi-prefix']) == [Command('CAP', ['END'])]
+    assert 'batch' in negotiation and 'sasl' not in negotiation
+    assert not negotiation.negotiating
+
+
+def test_nothing_to_request_ends_negotiation():
+    negotiation = CapabilityNegotiation()
+    negotiation.start()
+    assert negotiation.on_cap(['*', 'LS', 'account-notify']) == [Command('CAP', ['END'])]
+
+
+def test_sasl_plain():
+    negotiation = CapabilityNegotiation(SaslCredentials('PLAIN', 'user', 'secret'))
+    negotiation.start()
+    assert negotiation.on_cap(['*', 'LS', 'sasl=EXTERNAL,PLAIN']) == [Command('CAP', ['REQ', ':sasl'])]
+    assert negotiation.on_cap(['*', 'ACK', 'sasl']) == [Command('AUTHENTICATE', ['PLAIN'])]
+    [command] = negotiation.on_authenticate('+')
+    assert base64.b64decode(command.parameters[0]) == b'user\0user\0secret'
+    assert negotiation.end() == [Command('CAP', ['END'])]
+    assert negotiation.end() == []
+
+
+def test_sasl_mechanism_not_offered():
+    negotiation = CapabilityNegotiation(SaslCredentials('PLAIN', 'user', 'secret'))
+    negotiation.start()
+    assert negotiation.on_cap(['*', 'LS', 'sasl=EXTERNAL']) == [Command('CAP', ['END'])]
+
+
+def test_cap_new_and_del():
+    negotiation = CapabilityNegotiation()
+    negotiation.start()
+    negotiation.on_cap(['*', 'LS', 'batch'])
+    negotiation.on_cap(['*', 'ACK', 'batch'])
+    assert negotiation.on_cap(['*', 'NEW', 'echo-message']) == [Command('CAP', ['REQ', ':echo-message'])]
+    assert negotiation.on_cap(['*', 'ACK', 'echo-message']) == []
+    negotiation.on_cap(['*', 'DEL', 'batch'])
+    assert negotiation.enabled == {'echo-message'}
+
+
+def test_authenticate_chunks():
+    assert authenticate_commands(b'') == [Command('AUTHENTICATE', ['+'])]
+    chunks = authenticate_commands(b'x' * 300)
+    assert [len(command.parameters[0]) for command in chunks] == [400, 1]
+    assert [len(command.parameters[0]) for command in authenticate_commands(b'x' * 301)] == [400, 4]
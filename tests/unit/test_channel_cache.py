@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+from src.channel_cache import ChannelCache, ChannelSnapshot
+from src.channel_list import Channel
+
+
+@pytest.mark.asyncio
+async def test_round_trip(tmp_path):
+    cache = ChannelCache(str(tmp_path / 'cache'))
+    snapshot = ChannelSnapshot(time.time(), [Channel('#канал', 10, 'тема\tс табом')], {'#канал': ['@op', 'nick']})
+    cache.save('irc.example', 6667, snapshot)
+    await cache.flush()
+    assert await cache.load('irc.example', 6667) == snapshot
+    assert cache.is_fresh(snapshot)
+
+
+@pytest.mark.asyncio
+async def test_missing_or_damaged_cache_is_empty(tmp_path):
+    cache = ChannelCache(str(tmp_path), ttl=60)
+    assert await cache.load('irc.example', 6667) == ChannelSnapshot(0.0, [], {})
+    with open(cache.path('irc.example', 6667), 'wb') as file:
+        file.write(b'not zlib')
+    snapshot = await cache.load('irc.example', 6667)
+    assert snapshot.channels == [] and not cache.is_fresh(snapshot)
@@ -0,0 +1,54 @@
+from src.channel_list import Channel, ChannelListing, ChannelListUpdate, parse_client_count
+
+
+def test_batches_by_size():
+    listing = ChannelListing(batch_size=2, batch_interval=60)
+    listing.start()
+    assert listing.add(Channel('#a', 1, '')) is None
+    update = listing.add(Channel('#b', 2, ''))
+    assert update == ChannelListUpdate([Channel('#a', 1, ''), Channel('#b', 2, '')], True, False)
+    assert listing.add(Channel('#c', 3, '')) is None
+    assert listing.finish() == ChannelListUpdate([Channel('#c', 3, '')], False, True)
+    assert len(listing.channels) == 3
+
+
+def test_batches_by_interval():
+    listing = ChannelListing(batch_size=1000, batch_interval=0)
+    listing.start()
+    assert listing.add(Channel('#a', 1, '')) == ChannelListUpdate([Channel('#a', 1, '')], True, False)
+
+
+def test_start_resets_result():
+    listing = ChannelListing(batch_size=1000, batch_interval=60)
+    listing.start()
+    listing.add(Channel('#a', 1, ''))
+    listing.finish()
+    listing.start()
+    assert listing.channels == []
+    assert listing.finish() == ChannelListUpdate([], True, True)
+
+
+def test_local_filters():
+    listing = ChannelListing()
+    listing.start(min_users=10, mask='#PY*')
+    assert listing.matches(Channel('#python', 10, ''))
+    assert not listing.matches(Channel('#python', 9, ''))
+    assert not listing.matches(Channel('#linux', 100, ''))
+
+
+def test_revalidate_keeps_list_until_end():
+    listing = ChannelListing(batch_size=1, batch_interval=0)
+    listing.restore([Channel('#a', 1, ''), Channel('#b', 2, ''), Channel('#c', 3, '')])
+    listing.start(revalidate=True)
+    assert listing.add(Channel('#b', 5, 'busy')) is None
+    assert listing.add(Channel('#c', 3, '')) is None
+    assert listing.add(Channel('#d', 1, '')) is None
+    assert len(listing.channels) == 3
+    update = listing.finish()
+    assert update == ChannelListUpdate([Channel('#b', 5, 'busy'), Channel('#d', 1, '')], False, True, ['#a'])
+    assert [channel.channel for channel in listing.channels] == ['#b', '#c', '#d']
+
+
+def test_parse_client_count():
+    assert parse_client_count('42') == 42
+    assert parse_client_count('n/a') == 0
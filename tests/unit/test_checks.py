@@ -1,20 +1,38 @@
+import asyncio
+import ssl
+import time
+
 import pytest
 
-from src.client import Command, Channel
+from src.backoff import Backoff
+from src.channel_cache import ChannelCache, ChannelSnapshot
+from src.channel_list import ChannelListUpdate
+from src.channel_state import ChatLine
+from src.client import Channel, Command, IrcClient
+from src.dcc import DccManager
+from src.filters import DROP, MASK, REGEX, ROUTE, FilterEngine, FilterRule
+from src.message import parse_message
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
 async def test_ping(irc_client, mock_update_channels_func):
     host = 'host'
-    await irc_client._on_ping(f'PING :{host}')
+    await irc_client._on_ping(parse_message(f'PING :{host}'))
     assert Command('PONG', [":" + host]) in irc_client.commands
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
 async def test_ping_negative(irc_client):
-    await irc_client._on_ping(f'PIG :123')
+    await irc_client._process_response('PIG :123')
+    assert len(irc_client.commands) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_ping_in_message_negative(irc_client):
+    await irc_client._process_response(':nick!user@host PRIVMSG #channel :PING me')
     assert len(irc_client.commands) == 0
 
 
@@ -22,8 +40,8 @@ async def test_ping_negative(irc_client):
 @pytest.mark.checks
 async def test_322(irc_client):
     rpl_322 = ":host 322 user #name_channel 1 :topic"
-    await irc_client._on_322(rpl_322)
-    assert Channel("#name_channel", "1", "topic") in irc_client.channels
+    await irc_client._on_322(parse_message(rpl_322))
+    assert Channel("#name_channel", 1, "topic") in irc_client.channels
 
 
 @pytest.mark.asyncio
@@ -36,7 +54,7 @@ async def test_322(irc_client):
 ]
                          )
 async def test_322_negative(irc_client, rpl):
-    await irc_client._on_322(rpl)
+    await irc_client._process_response(rpl)
     assert len(irc_client.channels) == 0
 
 
@@ -47,12 +65,57 @@ async def test_323(irc_client, mock_update_channels_func):
 
     rpl_322 = ":host 322 user #name_channel 1 :topic"
 
-    await irc_client._on_322(rpl_322)
-    assert Channel("#name_channel", "1", "topic") in irc_client.channels
+    await irc_client._on_322(parse_message(rpl_322))
+    assert Channel("#name_channel", 1, "topic") in irc_client.channels
 
     rpl_323 = ":host 323 user :End of /LIST"
-    await irc_client._on_323(rpl_323)
-    assert Channel("#name_channel", "1", "topic") in mock_update_channels_func[1][0]
+    await irc_client._on_323(parse_message(rpl_323))
+    assert Channel("#name_channel", 1, "topic") in mock_update_channels_func[1][0].channels
+    assert mock_update_channels_func[1][0].reset
+    assert mock_update_channels_func[1][0].done
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_last_list_batch_flushed_by_timer(irc_client, mock_update_channels_func):
+    irc_client.update_channels()
+    irc_client.channel_listing.batch_interval = 0.05
+    mock_update_channels_func[1].clear()
+    await irc_client._process_response(':host 322 user #a 1 :topic')
+    await irc_client._process_response(':host 322 user #b many :broken count')
+    await asyncio.sleep(0.2)
+    assert mock_update_channels_func[1] == [
+        ChannelListUpdate([Channel('#a', 1, 'topic'), Channel('#b', 0, 'broken count')], True, False)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_list_request_starts_fresh_result(irc_client):
+    await irc_client._on_322(parse_message(":host 322 user #name_channel 1 :topic"))
+    irc_client.update_channels()
+    assert len(irc_client.channels) == 0
+    assert Command('LIST', []) in irc_client.commands
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_list_request_uses_elist(irc_client):
+    await irc_client._process_response(":host 005 user ELIST=CMNTU SAFELIST :are supported by this server")
+    irc_client.update_channels(min_users=100, mask='*linux*')
+    assert Command('LIST', ['>99,*linux*']) in irc_client.commands
+    assert irc_client.channel_listing.matches(Channel('#a', 1, ''))
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_list_request_without_elist_filters_locally(irc_client):
+    irc_client.update_channels(min_users=100, mask='*linux*')
+    assert Command('LIST', []) in irc_client.commands
+    await irc_client._on_322(parse_message(":host 322 user #linux 150 :topic"))
+    await irc_client._on_322(parse_message(":host 322 user #linux-ru 10 :topic"))
+    await irc_client._on_322(parse_message(":host 322 user #python 500 :topic"))
+    assert irc_client.channels == [Channel('#linux', 150, 'topic')]
 
 
 @pytest.mark.asyncio
@@ -64,55 +127,568 @@ async def test_323(irc_client, mock_update_channels_func):
 ])
 async def test_323_negative(irc_client, rpl, mock_update_channels_func):
     mock_update_channels_func[1].clear()
-    await irc_client._on_323(rpl)
+    await irc_client._process_response(rpl)
     assert len(mock_update_channels_func[1]) == 0
 
 
+async def join(irc_client, names):
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    await irc_client._process_response(f':host 353 nick = #channel :{names}')
+
+
 @pytest.mark.asyncio
 @pytest.mark.checks
 async def test_353(irc_client):
-    pass
-    # rpl_353 = ":host"
-    # await irc_client._on_353(rpl_353)
+    await join(irc_client, '@op +voiced')
+    await irc_client._process_response(':host 353 nick = #channel :nick')
+    assert irc_client.channel_state('#channel').names == ['@op', '+voiced', 'nick']
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
 async def test_353_negative(irc_client):
-    pass
+    await join(irc_client, '')
+    await irc_client._process_response(':host 353 nick = #other :someone')
+    assert irc_client.channel_state('#channel').names == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_366(irc_client, mock_update_members_func):
+    await join(irc_client, '@op +voiced nick')
+    mock_update_members_func[1].clear()
+    await irc_client._process_response(':host 366 nick #channel :End of /NAMES list.')
+    update = mock_update_members_func[1][0]
+    assert update.reset
+    assert [member.nick for member in update.added] == ['op', 'voiced', 'nick']
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_366_negative(irc_client, mock_update_members_func):
+    await join(irc_client, '@op')
+    mock_update_members_func[1].clear()
+    await irc_client._process_response(':host 366 nick #other :End of /NAMES list.')
+    assert len(mock_update_members_func[1]) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_chat_message(irc_client, mock_receiving_message_func):
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':nick!user@host PRIVMSG #channel :time is 12:30: ok\r\n')
+    assert mock_receiving_message_func[1] == [ChatLine('#channel', '<nick (user@host)> time is 12:30: ok')]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_chat_message_negative(irc_client, mock_receiving_message_func):
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':nick!user@host PRIVMSG\r\n')
+    assert len(mock_receiving_message_func[1]) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_members_list_change(irc_client, mock_update_members_func):
+    await join(irc_client, '@op alice bob')
+    await irc_client._process_response(':host 366 nick #channel :End of /NAMES list.')
+    mock_update_members_func[1].clear()
+
+    await irc_client._process_response(':carol!user@host JOIN #channel')
+    await irc_client._process_response(':alice!user@host PART #channel :bye')
+    await irc_client._process_response(':op!user@host KICK #channel bob :spam')
+    await irc_client._process_response(':carol!user@host NICK :Carol')
+    await irc_client._process_response(':op!user@host MODE #channel +v Carol')
+
+    updates = mock_update_members_func[1]
+    assert [member.nick for member in updates[0].added] == ['carol']
+    assert [member.nick for member in updates[1].removed] == ['alice']
+    assert [member.nick for member in updates[2].removed] == ['bob']
+    assert [(old.nick, new.nick) for old, new in updates[3].changed] == [('carol', 'Carol')]
+    assert [new.prefix for old, new in updates[4].changed] == ['+']
+    assert [member.prefix + member.nick for member in irc_client.channel_state('#CHANNEL').members] == ['@op', '+Carol']
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_members_list_change_negative(irc_client, mock_update_members_func):
+    await join(irc_client, 'alice')
+    await irc_client._process_response(':host 366 nick #channel :End of /NAMES list.')
+    mock_update_members_func[1].clear()
+
+    await irc_client._process_response(':carol!user@host JOIN #other')
+    await irc_client._process_response(':op!user@host MODE #channel +l 10')
+    await irc_client._process_response(':op!user@host MODE #channel +v stranger')
+    assert len(mock_update_members_func[1]) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_multiple_channels(irc_client, mock_receiving_message_func):
+    await join(irc_client, 'alice')
+    await irc_client._process_response(':nick!user@host JOIN #second')
+    await irc_client._process_response(':host 332 nick #second :second topic')
+    await irc_client._process_response(':host 324 nick #second +ntl 10')
+    assert irc_client.current_channel == '#second'
+    assert set(irc_client.joined_channels) == {'#channel', '#second'}
+
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':alice!user@host PRIVMSG #channel :hello')
+    assert mock_receiving_message_func[1] == [ChatLine('#channel', '<alice (user@host)> hello')]
+    assert irc_client.channel_state('#channel').unread == 1
+    assert irc_client.channel_state('#second').topic == 'second topic'
+    assert irc_client.channel_state('#second').mode_string == '+lnt 10'
+
+    irc_client.switch_channel('#channel')
+    assert irc_client.current_channel == '#channel'
+    assert irc_client.channel_state('#channel').unread == 0
+
+    irc_client.switch_channel(None)
+    assert irc_client.current_channel is None
+    irc_client.commands.pop_ready()
+    await irc_client.send_message('typed in the status tab')
+    assert irc_client.commands.pop_ready() == []
+    irc_client.switch_channel('#channel')
+
+    await irc_client._process_response(':nick!user@host PART #channel')
+    assert set(irc_client.joined_channels) == {'#second'}
+    assert irc_client.current_channel == '#second'
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_send_message_uses_learned_hostmask(irc_client):
+    await irc_client._process_response(':nick!user@host.example JOIN #channel')
+    assert irc_client.hostmask == 'nick!user@host.example'
+    irc_client.commands.pop_ready()
+
+    await irc_client.send_message('ё' * 600)
+    overhead = len(':nick!user@host.example PRIVMSG #channel :\r\n')
+    chunks = [command.parameters[1][1:] for command in irc_client.commands]
+    assert len(chunks) == 3
+    assert len(chunks[0].encode()) == 512 - overhead
+    assert ''.join(chunks) == 'ё' * 600
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_001_rejoins_in_batches(irc_client):
+    irc_client.commands.hold()
+    for i in range(60):
+        await irc_client._process_response(f':nick!user@host JOIN #channel{i:02}')
+    await irc_client._process_response(':nick!user@host JOIN #channel00')
+    assert irc_client.current_channel == '#channel59'
+    irc_client.commands.pop_ready()
+
+    await irc_client._process_response(':host 001 nick :Welcome')
+    joins = irc_client.commands.pop_ready()
+    assert irc_client.registered
+    assert len(joins) == 2
+    assert all(len(f'JOIN {join.parameters[0]}\r\n') <= 512 for join in joins)
+    assert ','.join(join.parameters[0] for join in joins).split(',') == [f'#channel{i:02}' for i in range(60)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_433_before_registration(irc_client):
+    await irc_client._process_response(':host 433 * nick :Nickname is already in use')
+    assert irc_client.nickname == 'nick_'
+    assert Command('NICK', ['nick_']) in irc_client.commands
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_fallback_nick_regained(irc_client):
+    await irc_client._process_response(':host 433 * nick :Nickname is already in use')
+    await irc_client._process_response(':host 001 nick_ :Welcome')
+    await irc_client._process_response(':nick_!user@host JOIN #channel')
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    assert Command('NICK', ['nick']) not in irc_client.commands
+    await irc_client._process_response(':nick!user@host QUIT :Ping timeout')
+    assert Command('NICK', ['nick']) in irc_client.commands
+    await irc_client._process_response(':nick_!user@host NICK :nick')
+    assert irc_client.nickname == irc_client.preferred_nickname == 'nick'
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_reconnect_starts_from_preferred_nick(irc_client, monkeypatch):
+    async def open_connection():
+        return None, FakeWriter()
+
+    class FakeWriter:
+        def get_extra_info(self, name):
+            return None
+
+    monkeypatch.setattr(irc_client, '_open_connection', open_connection)
+    await irc_client._process_response(':host 433 * nick :Nickname is already in use')
+    assert irc_client.nickname == 'nick_'
+    await irc_client.connect()
+    assert irc_client.nickname == 'nick'
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
-async def test_366(irc_client):
-    pass
+async def test_produce_stops_on_tls_write_error(irc_client):
+    class FailingWriter:
+        def write(self, data):
+            pass
+
+        async def drain(self):
+            raise ssl.SSLError('bad record mac')
+
+    irc_client.writer = FailingWriter()
+    irc_client.commands.append(Command('PING', ['irc.example']))
+    await asyncio.wait_for(irc_client._produce(), 1)
+
+
+async def start_server(handle_connection):
+    server = await asyncio.start_server(handle_connection, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_run_reconnects_and_rejoins(irc_client):
+    connections = []
+    rejoined = asyncio.get_running_loop().create_future()
+
+    async def handle_connection(reader, writer):
+        connections.append(writer)
+        if len(connections) == 1:
+            await reader.readline()
+            writer.close()
+            return
+        writer.write(b':host 001 nick :Welcome\r\n')
+        while line := await reader.readline():
+            if line.startswith(b'JOIN'):
+                rejoined.set_result(line)
+            elif line.startswith(b'QUIT'):
+                writer.close()
+
+    server, irc_client.port = await start_server(handle_connection)
+    irc_client.host = '127.0.0.1'
+    irc_client.backoff = Backoff(initial=0.01, randomize=lambda low, high: high)
+    irc_client.commands.bucket = None
+    await irc_client._process_response(':nick!user@host JOIN #one')
+    await irc_client._process_response(':nick!user@host JOIN #two')
+    irc_client.commands.append(Command('PRIVMSG', ['#one', ':queued while offline']))
+
+    runner = asyncio.create_task(irc_client.run())
+    assert await asyncio.wait_for(rejoined, 5) == b'JOIN #one,#two\r\n'
+    assert len(connections) == 2
+    irc_client.close()
+    await asyncio.wait_for(runner, 5)
+    server.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_keepalive_detects_silent_server(irc_client):
+    received = []
+
+    async def handle_connection(reader, writer):
+        while line := await reader.readline():
+            received.append(line)
+
+    server, irc_client.port = await start_server(handle_connection)
+    irc_client.host = '127.0.0.1'
+    irc_client.keepalive_interval = irc_client.keepalive_timeout = 0.05
+    await irc_client.connect()
+    await asyncio.wait_for(irc_client.handle(), 5)
+    assert b'PING :keepalive\r\n' in received
+    server.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_authorize_negotiates_capabilities(irc_client):
+    irc_client.realname = 'Real Name'
+    irc_client._authorize()
+    assert list(irc_client.commands) == [
+        Command('CAP', ['LS', '302']),
+        Command('NICK', ['nick']),
+        Command('USER', ['nick', '8', '*', ':Real Name']),
+    ]
+    irc_client.commands.pop_ready()
+    await irc_client._process_response(':host CAP * LS :echo-message server-time')
+    await irc_client._process_response(':host CAP * ACK :echo-message server-time')
+    assert list(irc_client.commands) == [Command('CAP', ['REQ', ':echo-message server-time']), Command('CAP', ['END'])]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_multi_prefix_names(irc_client):
+    await join(irc_client, '@+op +voiced')
+    await irc_client._process_response(':host 366 nick #channel :End of /NAMES list.')
+    members = {member.nick: member.prefix for member in irc_client.channel_state('#channel').members}
+    assert members == {'op': '@', 'voiced': '+'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_quit_removes_member_everywhere(irc_client, mock_update_members_func):
+    for channel in ('#one', '#two'):
+        await irc_client._process_response(f':nick!user@host JOIN {channel}')
+        await irc_client._process_response(f':other!user@host JOIN {channel}')
+    mock_update_members_func[1].clear()
+
+    await irc_client._process_response(':other!user@host QUIT :Bye')
+    assert [update.channel for update in mock_update_members_func[1]] == ['#one', '#two']
+    assert 'other' not in irc_client.channel_state('#one').members
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_netsplit_batch_is_one_update(irc_client, mock_update_members_func, mock_receiving_message_func):
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    for i in range(50):
+        await irc_client._process_response(f':user{i}!user@host JOIN #channel')
+    mock_update_members_func[1].clear()
+    mock_receiving_message_func[1].clear()
+
+    await irc_client._process_response(':host BATCH +split netsplit irc.hub.net irc.leaf.net')
+    for i in range(40):
+        await irc_client._process_response(f'@batch=split :user{i}!user@host QUIT :irc.hub.net irc.leaf.net')
+    assert mock_update_members_func[1] == []
+    await irc_client._process_response(':host BATCH -split')
+
+    [update] = mock_update_members_func[1]
+    assert update.reset and len(update.added) == 10
+    assert [line.text for line in mock_receiving_message_func[1]] == [
+        'Netsplit irc.hub.net irc.leaf.net: 40 users quit'
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_chathistory_batch_keeps_server_time(irc_client, mock_receiving_message_func):
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':host BATCH +history chathistory #channel')
+    await irc_client._process_response(
+        '@batch=history;time=2011-10-19T16:40:51.620Z :other!user@host PRIVMSG #channel :old line'
+    )
+    assert mock_receiving_message_func[1] == []
+    await irc_client._process_response(':host BATCH -history')
+    assert mock_receiving_message_func[1] == [ChatLine('#channel', '<other (user@host)> old line', 1319042451.62)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_nested_batch_waits_for_outer(irc_client, mock_receiving_message_func):
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':host BATCH +outer example/wrapper')
+    await irc_client._process_response('@batch=outer :host BATCH +inner chathistory #channel')
+    await irc_client._process_response('@batch=inner :other!user@host PRIVMSG #channel :inner line')
+    await irc_client._process_response('@batch=outer :host BATCH -inner')
+    await irc_client._process_response('@batch=outer :other!user@host PRIVMSG #channel :outer line')
+    assert mock_receiving_message_func[1] == []
+    await irc_client._process_response(':host BATCH -outer')
+    assert [line.text for line in mock_receiving_message_func[1]] == [
+        '<other (user@host)> inner line',
+        '<other (user@host)> outer line',
+    ]
+    assert irc_client.batches == {}
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
-async def test_366_negative(irc_client):
-    pass
+async def test_unfinished_batch_expires(irc_client, mock_receiving_message_func, monkeypatch):
+    monkeypatch.setattr('src.client.BATCH_TIMEOUT', 0.05)
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':host BATCH +stuck chathistory #channel')
+    await irc_client._process_response('@batch=stuck :other!user@host PRIVMSG #channel :first')
+    await irc_client._process_response('@batch=stuck :other!user@host PRIVMSG #channel :second')
+    assert mock_receiving_message_func[1] == []
+    # Nothing else arrives on the connection, the timer alone hands the lines out
+    await asyncio.sleep(0.2)
+    assert [line.text for line in mock_receiving_message_func[1]] == [
+        '<other (user@host)> first',
+        '<other (user@host)> second',
+    ]
+    assert irc_client.batches == {}
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
-async def test_chat_message(irc_client):
-    pass
+async def test_batch_timer_cancelled_on_end_and_reconnect(irc_client, monkeypatch):
+    async def open_connection():
+        return None, FakeWriter()
+
+    class FakeWriter:
+        def get_extra_info(self, name):
+            return None
+
+    monkeypatch.setattr(irc_client, '_open_connection', open_connection)
+    await irc_client._process_response(':host BATCH +done chathistory #channel')
+    timer = irc_client.batches['done'].timer
+    await irc_client._process_response(':host BATCH -done')
+    assert timer.cancelled()
+
+    await irc_client._process_response(':host BATCH +open chathistory #channel')
+    timer = irc_client.batches['open'].timer
+    await irc_client.connect()
+    assert timer.cancelled() and irc_client.batches == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_echo_message_replaces_local_echo(irc_client, mock_receiving_message_func):
+    irc_client.capabilities.enabled.add('echo-message')
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    mock_receiving_message_func[1].clear()
+
+    await irc_client.send_message('hello', 'friend')
+    assert mock_receiving_message_func[1] == []
+    await irc_client._process_response(':nick!user@host PRIVMSG friend :hello')
+    assert mock_receiving_message_func[1][0].channel == 'friend'
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_legacy_encoded_line_is_not_dropped(irc_client, mock_receiving_message_func):
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    line = ':other!user@host PRIVMSG #channel :Привет всем, как дела?\r\n'.encode('cp1251')
+    await irc_client._process_response(irc_client.decoder.decode(line))
+    assert mock_receiving_message_func[1][-1].text == '<other (user@host)> Привет всем, как дела?'
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_names_use_advertised_prefix(irc_client):
+    await irc_client._process_response(':host 005 nick PREFIX=(Yov)!@+ :are supported by this server')
+    await join(irc_client, '!@admin @op +voiced')
+    await irc_client._process_response(':host 366 nick #channel :End of /NAMES list.')
+    members = {member.nick: member.prefix for member in irc_client.channel_state('#channel').members}
+    assert members == {'admin': '!', 'op': '@', 'voiced': '+'}
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
-async def test_chat_message_negative(irc_client):
-    pass
+async def test_user_shared_across_channels(irc_client, mock_update_members_func):
+    for channel in ('#one', '#two', '#three'):
+        await irc_client._process_response(f':nick!user@host JOIN {channel}')
+    for channel in ('#one', '#three'):
+        await irc_client._process_response(f':other!ident@example.org JOIN {channel}')
+    user = irc_client.users.get('other')
+    assert list(user.channels) == ['#one', '#three'] and user.full_name == 'ident@example.org'
+
+    await irc_client._process_response(':other!ident@example.org AWAY :lunch')
+    assert user.away == 'lunch'
+    mock_update_members_func[1].clear()
+    await irc_client._process_response(':other!ident@example.org NICK :Other2')
+    assert [update.channel for update in mock_update_members_func[1]] == ['#one', '#three']
+    assert irc_client.users.get('other2') is user
+
+    await irc_client._process_response(':nick!user@host PART #one')
+    assert list(user.channels) == ['#three']
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
-async def test_members_list_change(irc_client):
-    pass
+async def test_names_refresh_keeps_user_records(irc_client):
+    for channel in ('#one', '#two'):
+        await irc_client._process_response(f':nick!user@host JOIN {channel}')
+        await irc_client._process_response(f':other!ident@example.org JOIN {channel}')
+        await irc_client._process_response(f':gone!ident@example.org JOIN {channel}')
+    await irc_client._process_response(':other!ident@example.org AWAY :lunch')
+    user = irc_client.users.get('other')
+
+    await irc_client._process_response(':host 353 nick = #one :@nick +other')
+    await irc_client._process_response(':host 366 nick #one :End of /NAMES list.')
+    assert irc_client.users.get('other') is user
+    assert (user.full_name, user.away, list(user.channels)) == ('ident@example.org', 'lunch', ['#one', '#two'])
+    assert [member.nick for member in irc_client.channel_state('#one').members] == ['nick', 'other']
+    assert list(irc_client.users.get('gone').channels) == ['#two']
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_filters_drop_route_and_highlight(irc_client, mock_receiving_message_func):
+    irc_client.filters = FilterEngine(
+        [FilterRule(MASK, '*!*@spam.host', DROP), FilterRule(REGEX, r'https?://', ROUTE, 'links')]
+    )
+    await irc_client._process_response(':nick!user@host JOIN #channel')
+    await irc_client._process_response(':nick!user@host JOIN #other')
+    mock_receiving_message_func[1].clear()
+
+    await irc_client._process_response(':bot!x@spam.host PRIVMSG #channel :buy now')
+    await irc_client._process_response(':alice!a@host PRIVMSG #channel :see http://example.org')
+    await irc_client._process_response(':alice!a@host PRIVMSG #channel :nick, ping')
+    assert mock_receiving_message_func[1] == [
+        ChatLine('links', '[#channel] <alice (a@host)> see http://example.org'),
+        ChatLine('#channel', '<alice (a@host)> nick, ping', highlight=True),
+    ]
+    assert irc_client.channel_state('#channel').highlights == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_cached_channels_shown_then_revalidated(
+    irc_client, tmp_path, mock_update_channels_func, mock_update_members_func
+):
+    cache = ChannelCache(str(tmp_path), ttl=60)
+    snapshot = ChannelSnapshot(time.time() - 120, [Channel('#old', 1, ''), Channel('#kept', 2, '')], {})
+    snapshot.members['#kept'] = ['@op', 'alice']
+    cache.save(irc_client.host, irc_client.port, snapshot)
+    await cache.flush()
+    irc_client.channel_cache = cache
+    mock_update_channels_func[1].clear()
+    mock_update_members_func[1].clear()
+
+    await irc_client._restore_channels()
+    assert mock_update_channels_func[1] == [ChannelListUpdate(snapshot.channels, True, True)]
+    assert Command('LIST', []) in irc_client.commands
+    await irc_client._process_response(':nick!user@host JOIN #kept')
+    assert [(member.nick, member.rank) for member in mock_update_members_func[1][0].added] == [('op', 2), ('alice', 5)]
+
+    await irc_client._process_response(':host 322 nick #kept 3 :topic')
+    await irc_client._process_response(':host 322 nick #new 1 :')
+    await irc_client._process_response(':host 323 nick :End of /LIST')
+    assert mock_update_channels_func[1][-1] == ChannelListUpdate(
+        [Channel('#kept', 3, 'topic'), Channel('#new', 1, '')], False, True, ['#old']
+    )
+    await cache.flush()
+    stored = await cache.load(irc_client.host, irc_client.port)
+    assert cache.is_fresh(stored) and len(stored.channels) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_fresh_cache_skips_list(irc_client, tmp_path):
+    cache = ChannelCache(str(tmp_path), ttl=60)
+    cache.save(irc_client.host, irc_client.port, ChannelSnapshot(time.time(), [Channel('#a', 1, '')], {}))
+    await cache.flush()
+    irc_client.channel_cache = cache
+    await irc_client._restore_channels()
+    assert irc_client.channels == [Channel('#a', 1, '')]
+    assert len(irc_client.commands) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.checks
+async def test_dcc_offer_is_not_chat(irc_client, tmp_path, mock_receiving_message_func):
+    irc_client.dcc = DccManager(str(tmp_path))
+    mock_receiving_message_func[1].clear()
+    await irc_client._process_response(':alice!a@host PRIVMSG nick :\x01DCC SEND file.bin 2130706433 5000 10\x01')
+    await irc_client._process_response(':alice!a@host PRIVMSG nick :\x01DCC RESUME file.bin 5000 5\x01')
+    assert mock_receiving_message_func[1] == []
+    assert [transfer.filename for transfer in irc_client.dcc.transfers] == ['file.bin']
+    assert len(irc_client.commands) == 0
 
 
 @pytest.mark.asyncio
 @pytest.mark.checks
-async def test_members_list_change_negative(irc_client):
-    pass
+async def test_subclass_overrides_handler():
+    class LoggingClient(IrcClient):
+        async def _on_ping(self, message):
+            self.pinged = message.trailing
+            await super()._on_ping(message)
+
+    client = LoggingClient('host', 6667, 'nick', 'utf-8')
+    await client._process_response('PING :token')
+    assert client.pinged == 'token' and Command('PONG', [':token']) in client.commands
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from src.channel_state import ChatLine
+from src.coalescer import UpdateCoalescer
+from src.members import Member, MembersUpdate
+from src.membership import ChannelMembership
+
+ALICE = Member(ChannelMembership.DEFAULT, 'alice', '', 5)
+BOB = Member(ChannelMembership.DEFAULT, 'bob', '', 5)
+VOICED_BOB = Member(ChannelMembership.VOICE, 'bob', '+', 4)
+
+
+def make_coalescer(**kwargs):
+    lines, updates = [], []
+    coalescer = UpdateCoalescer(lambda channel, batch: lines.append((channel, batch)), updates.append, **kwargs)
+    return coalescer, lines, updates
+
+
+@pytest.mark.asyncio
+async def test_lines_flushed_once_per_frame():
+    coalescer, lines, _ = make_coalescer(interval=0.01)
+    for i in range(3):
+        await coalescer.push_message(ChatLine('#a', f'line {i}'))
+    await coalescer.push_message(ChatLine(None, 'status'))
+    assert coalescer.pending_lines('#a') == 3
+    assert lines == []
+
+    await asyncio.sleep(0.05)
+    assert lines == [('#a', ['line 0', 'line 1', 'line 2']), (None, ['status'])]
+    assert coalescer.stats()['flushes'] == 1
+    assert coalescer.stats()['max_queue_depth'] == 4
+
+
+@pytest.mark.asyncio
+async def test_lines_over_limit_dropped():
+    coalescer, lines, _ = make_coalescer(max_pending_lines=2)
+    for i in range(5):
+        await coalescer.push_message(ChatLine('#a', f'line {i}'))
+    coalescer.flush()
+    assert lines == [('#a', ['line 3', 'line 4'])]
+    assert coalescer.dropped == 3
+
+
+@pytest.mark.asyncio
+async def test_member_updates_merged():
+    coalescer, _, updates = make_coalescer()
+    await coalescer.push_members(MembersUpdate('#a', added=[ALICE]))
+    await coalescer.push_members(MembersUpdate('#a', added=[BOB]))
+    await coalescer.push_members(MembersUpdate('#a', changed=[(BOB, VOICED_BOB)]))
+    await coalescer.push_members(MembersUpdate('#a', removed=[ALICE]))
+    coalescer.flush()
+    assert updates == [MembersUpdate('#a', [VOICED_BOB], [], (), False)]
+    assert coalescer.merged == 5
+
+
+@pytest.mark.asyncio
+async def test_member_reset_replaces_pending():
+    coalescer, _, updates = make_coalescer()
+    await coalescer.push_members(MembersUpdate('#a', removed=[ALICE]))
+    await coalescer.push_members(MembersUpdate('#a', added=[BOB], reset=True))
+    await coalescer.push_members(MembersUpdate('#a', removed=[ALICE]))
+    coalescer.flush()
+    assert updates == [MembersUpdate('#a', [BOB], [], (), True)]
@@ -0,0 +1,49 @@
+import pytest
+
+from src.codec import LineDecoder, line_sender
+
+TEXT = 'Привет, как дела? Всё хорошо'
+
+
+@pytest.mark.parametrize('data, sender', [
+    (b':nick!user@host PRIVMSG #channel :hi', b'nick'),
+    (b'@time=2011-10-19T16:40:51.620Z :nick!user@host PRIVMSG #channel :hi', b'nick'),
+    (b':irc.server.net 001 nick :Welcome', b'irc.server.net'),
+    (b'PING :server', b''),
+])
+def test_line_sender(data, sender):
+    assert line_sender(data) == sender
+
+
+def test_utf8_first():
+    decoder = LineDecoder('cp1251')
+    assert decoder.decode(TEXT.encode()) == TEXT
+    assert decoder.stats()['fallback'] == 0
+
+
+@pytest.mark.parametrize('encoding', ['cp1251', 'koi8-r'])
+def test_detects_legacy_code_page(encoding):
+    decoder = LineDecoder('utf-8')
+    line = f':nick!user@host PRIVMSG #channel :{TEXT}'
+    assert decoder.decode(line.encode(encoding)) == line
+    assert decoder.stats()[f'fallback_{encoding}'] == 1
+
+
+def test_sender_encoding_is_cached():
+    decoder = LineDecoder('utf-8')
+    decoder.decode(f':nick!user@host PRIVMSG #channel :{TEXT}'.encode('koi8-r'))
+    # Too short to tell the code pages apart, the sender's earlier line decides
+    assert decoder.decode(':nick!user@host PRIVMSG #channel :Да'.encode('koi8-r')).endswith('Да')
+    assert decoder.stats()['cache_hits'] == 1
+
+
+def test_without_detection_uses_configured_encoding():
+    decoder = LineDecoder('koi8-r', detect=False)
+    assert decoder.decode(TEXT.encode('koi8-r')) == TEXT
+    assert decoder.fallbacks[0] == 'koi8-r'
+
+
+def test_never_drops_lines():
+    decoder = LineDecoder('utf-8', fallbacks=('ascii',))
+    assert decoder.decode(b'caf\xe9') == 'caf\ufffd'
+    assert decoder.stats()['replaced'] == 1
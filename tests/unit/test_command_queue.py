@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from src.client import Command
+from src.command_queue import CommandQueue, command_size
+from src.flood import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_get_waits_for_command():
+    queue = CommandQueue()
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+    assert not getter.done()
+
+    queue.append(Command('PING', [':host']))
+    assert await asyncio.wait_for(getter, 1) == Command('PING', [':host'])
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_pop_ready():
+    queue = CommandQueue()
+    queue.append(Command('NICK', ['nick']))
+    queue.append(Command('LIST', []))
+    assert await queue.get() == Command('NICK', ['nick'])
+    assert queue.pop_ready() == [Command('LIST', [])]
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_priority_lanes():
+    queue = CommandQueue()
+    queue.append(Command('PRIVMSG', ['#chan', ':hello']))
+    queue.append(Command('JOIN', ['#chan']))
+    queue.append(Command('PONG', [':host']))
+    assert [command.command for command in queue.pop_ready()] == ['PONG', 'JOIN', 'PRIVMSG']
+    assert queue.stats()['sent'] == 3
+
+
+@pytest.mark.asyncio
+async def test_bucket_paces_chat_but_not_urgent():
+    clock = FakeClock()
+    queue = CommandQueue(TokenBucket(rate=0.5, burst=3, clock=clock))
+    for i in range(4):
+        queue.append(Command('PRIVMSG', ['#chan', f':{i}']))
+    queue.append(Command('PONG', [':host']))
+
+    assert [command.command for command in queue.pop_ready()] == ['PONG', 'PRIVMSG']
+    assert queue.stats()['chat_depth'] == 3
+    assert queue.pop_ready() == []
+
+    clock.now += 1
+    assert queue.pop_ready() == [Command('PRIVMSG', ['#chan', ':1'])]
+
+
+def test_command_size_counts_encoded_bytes():
+    assert command_size(Command('PRIVMSG', ['#chan', ':hi'])) == 19
+    assert command_size(Command('PRIVMSG', ['#chan', ':ééé'])) == 23
+    assert command_size(Command('PRIVMSG', ['#chan', ':ééé']), 'latin-1') == 20
+
+    clock = FakeClock()
+    queue = CommandQueue(TokenBucket(rate=0.5, burst=3, clock=clock))
+    queue.append(Command('PRIVMSG', ['#chan', ':' + 'é' * 240]))
+    queue.pop_ready()
+    assert queue.bucket.tokens == pytest.approx(3 - (1 + 497 / 240))
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, burst=5, clock=clock)
+    assert bucket.delay(5) == 0
+    bucket.consume(5)
+    assert bucket.delay(1) == 2
+    clock.now += 100
+    assert bucket.tokens <= 5 and bucket.delay(10) == 0
+
+
+@pytest.mark.asyncio
+async def test_hold_until_registered():
+    queue = CommandQueue()
+    queue.hold()
+    queue.append(Command('JOIN', ['#chan']))
+    queue.append(Command('NICK', ['nick']))
+    assert queue.pop_ready() == [Command('NICK', ['nick'])]
+
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+    assert not getter.done()
+    queue.release()
+    assert await asyncio.wait_for(getter, 1) == Command('JOIN', ['#chan'])
+
+
+def test_discard():
+    queue = CommandQueue()
+    queue.append(Command('NICK', ['nick']))
+    queue.append(Command('PONG', [':host']))
+    queue.append(Command('PRIVMSG', ['#chan', ':hello']))
+    queue.discard({'NICK', 'PONG'})
+    assert list(queue) == [Command('PRIVMSG', ['#chan', ':hello'])]
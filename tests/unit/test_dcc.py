@@ -0,0 +1,224 @@
+import asyncio
+import os
+
+import pytest
+
+from src.dcc import DONE, FAILED, OFFERED, RECEIVE, SEND, DccManager, decode_address, encode_address, parse_dcc
+from src.isupport import ISupport
+
+
+def ctcp(commands) -> str:
+    [command] = commands
+    assert command.command == 'PRIVMSG'
+    return command.parameters[1][1:]
+
+
+async def wait_done(*managers: DccManager):
+    await asyncio.gather(*(transfer._task for manager in managers for transfer in manager.transfers))
+
+
+def write_file(path, size: int) -> bytes:
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return data
+
+
+def test_parse_dcc():
+    assert parse_dcc('\x01DCC SEND "my file.txt" 2130706433 5000 1024\x01') == (
+        'SEND',
+        'my file.txt',
+        ['2130706433', '5000', '1024'],
+    )
+    assert parse_dcc('\x01DCC resume file.txt 5000 512 7\x01') == ('RESUME', 'file.txt', ['5000', '512', '7'])
+    assert parse_dcc('\x01VERSION\x01') is None
+
+
+def test_address_round_trip():
+    assert encode_address('127.0.0.1') == '2130706433'
+    assert decode_address('2130706433') == '127.0.0.1'
+    assert decode_address(encode_address('::1')) == '::1'
+
+
+@pytest.mark.asyncio
+async def test_send_and_receive(tmp_path):
+    data = write_file(tmp_path / 'file name.bin', 3 * 1024 * 1024 + 17)
+    sender = DccManager(str(tmp_path))
+    receiver = DccManager(str(tmp_path / 'in'), buffer_size=64 * 1024)
+    os.mkdir(receiver.directory)
+    updates = []
+
+    async def on_update(transfer):
+        updates.append(transfer.state)
+
+    receiver.on_update = on_update
+
+    offer = ctcp(await sender.offer('bob', str(tmp_path / 'file name.bin')))
+    assert offer.startswith('\x01DCC SEND "file name.bin" 2130706433 ')
+    assert await receiver.on_ctcp('alice', offer) == []
+    [transfer] = receiver.transfers
+    assert (transfer.direction, transfer.state, transfer.size) == (RECEIVE, OFFERED, len(data))
+
+    assert await receiver.accept(transfer) == []
+    await wait_done(sender, receiver)
+    assert [sent.state for sent in sender.transfers] == [DONE]
+    assert transfer.state == DONE and transfer.progress == 1.0 and transfer.throughput > 0
+    assert (tmp_path / 'in' / 'file name.bin').read_bytes() == data
+    assert updates[0] == OFFERED and updates[-1] == DONE
+    assert receiver.stats()['bytes'] == len(data)
+
+
+@pytest.mark.asyncio
+async def test_passive_send(tmp_path):
+    data = write_file(tmp_path / 'file.bin', 100_000)
+    sender = DccManager(str(tmp_path))
+    receiver = DccManager(str(tmp_path / 'in'), auto_accept=True)
+    os.mkdir(receiver.directory)
+
+    offer = ctcp(await sender.offer('bob', str(tmp_path / 'file.bin'), passive=True))
+    assert offer.endswith(f' 0 {len(data)} 1\x01')
+    reply = ctcp(await receiver.on_ctcp('alice', offer))
+    assert reply.startswith('\x01DCC SEND file.bin 2130706433 ') and reply.endswith(' 1\x01')
+    assert await sender.on_ctcp('bob', reply) == []
+    await wait_done(sender, receiver)
+    assert [transfer.state for transfer in sender.transfers + receiver.transfers] == [DONE, DONE]
+    assert (tmp_path / 'in' / 'file.bin').read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_resume(tmp_path):
+    data = write_file(tmp_path / 'file.bin', 200_000)
+    os.mkdir(tmp_path / 'in')
+    (tmp_path / 'in' / 'file.bin').write_bytes(data[:50_000])
+    sender = DccManager(str(tmp_path))
+    receiver = DccManager(str(tmp_path / 'in'))
+
+    await receiver.on_ctcp('alice', ctcp(await sender.offer('bob', str(tmp_path / 'file.bin'))))
+    [transfer] = receiver.transfers
+    resume = ctcp(await receiver.accept(transfer))
+    assert resume == f'\x01DCC RESUME file.bin {transfer.port} 50000\x01'
+    accept = ctcp(await sender.on_ctcp('bob', resume))
+    assert accept == f'\x01DCC ACCEPT file.bin {transfer.port} 50000\x01'
+    assert await receiver.on_ctcp('alice', accept) == []
+    await wait_done(sender, receiver)
+    assert transfer.state == DONE and transfer.transferred == 150_000
+    assert [sent.transferred for sent in sender.transfers if sent.direction == SEND] == [150_000]
+    assert (tmp_path / 'in' / 'file.bin').read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_resume_matches_casemapped_nick(tmp_path):
+    data = write_file(tmp_path / 'file.bin', 1000)
+    sender = DccManager(str(tmp_path))
+    sender.casefold = ISupport().casefold
+    [command] = await sender.offer('Bob[away]', str(tmp_path / 'file.bin'))
+    port = ctcp([command]).split()[4]
+    accept = ctcp(await sender.on_ctcp('bob{AWAY}', f'\x01DCC RESUME file.bin {port} 400\x01'))
+    assert accept == f'\x01DCC ACCEPT file.bin {port} 400\x01'
+    assert sender.transfers[0].position == 400 and len(data) == 1000
+
+
+@pytest.mark.asyncio
+async def test_data_past_offered_size_refused(tmp_path):
+    acks = []
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b'x' * 1500)
+        await writer.drain()
+        while data := await reader.read(4):
+            acks.append(int.from_bytes(data, 'big'))
+        writer.close()
+
+    server = await asyncio.start_server(serve, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    receiver = DccManager(str(tmp_path), auto_accept=True)
+    await receiver.on_ctcp('alice', f'\x01DCC SEND file.bin 2130706433 {port} 1000\x01')
+    await wait_done(receiver)
+    server.close()
+    [transfer] = receiver.transfers
+    assert transfer.state == FAILED and transfer.transferred == 1000
+    assert (tmp_path / 'file.bin').read_bytes() == b'x' * 1000
+    assert max(acks) == 1000
+
+
+@pytest.mark.asyncio
+async def test_existing_file_is_not_overwritten(tmp_path):
+    write_file(tmp_path / 'file.bin', 1000)
+    os.mkdir(tmp_path / 'in')
+    (tmp_path / 'in' / 'file.bin').write_bytes(b'x' * 1000)
+    sender = DccManager(str(tmp_path))
+    receiver = DccManager(str(tmp_path / 'in'), auto_accept=True)
+    await receiver.on_ctcp('alice', ctcp(await sender.offer('bob', str(tmp_path / 'file.bin'))))
+    await wait_done(sender, receiver)
+    assert receiver.transfers[0].path == str(tmp_path / 'in' / 'file.1.bin')
+    assert (tmp_path / 'in' / 'file.bin').read_bytes() == b'x' * 1000
+
+
+@pytest.mark.asyncio
+async def test_offer_filename_is_sanitized(tmp_path):
+    receiver = DccManager(str(tmp_path))
+    await receiver.on_ctcp('alice', '\x01DCC SEND ../../.bashrc 2130706433 5000 10\x01')
+    assert receiver.transfers[0].path == os.path.join(str(tmp_path), 'bashrc')
+    assert await receiver.on_ctcp('alice', '\x01DCC SEND file nonsense\x01') == []
+
+
+@pytest.mark.asyncio
+async def test_accept_at_other_offset_refused(tmp_path):
+    os.mkdir(tmp_path / 'in')
+    (tmp_path / 'in' / 'file.bin').write_bytes(b'x' * 500)
+    receiver = DccManager(str(tmp_path / 'in'))
+    await receiver.on_ctcp('alice', '\x01DCC SEND file.bin 2130706433 5000 1000\x01')
+    [transfer] = receiver.transfers
+    assert ctcp(await receiver.accept(transfer)) == '\x01DCC RESUME file.bin 5000 500\x01'
+    assert await receiver.on_ctcp('alice', '\x01DCC ACCEPT file.bin 5000 0\x01') == []
+    assert transfer.state == FAILED
+    assert (tmp_path / 'in' / 'file.bin').read_bytes() == b'x' * 500
+
+
+@pytest.mark.asyncio
+async def test_empty_file_and_missing_directory(tmp_path):
+    (tmp_path / 'empty.bin').write_bytes(b'')
+    sender = DccManager(str(tmp_path))
+    receiver = DccManager(str(tmp_path / 'new' / 'in'), auto_accept=True)
+    await receiver.on_ctcp('alice', ctcp(await sender.offer('bob', str(tmp_path / 'empty.bin'))))
+    await asyncio.wait_for(wait_done(sender, receiver), 5)
+    assert [transfer.state for transfer in sender.transfers + receiver.transfers] == [DONE, DONE]
+    assert (tmp_path / 'new' / 'in' / 'empty.bin').read_bytes() == b''
+
+
+@pytest.mark.asyncio
+async def test_unwritable_directory_fails_transfer(tmp_path):
+    (tmp_path / 'in').write_bytes(b'not a directory')
+    receiver = DccManager(str(tmp_path / 'in'))
+    updates = []
+
+    async def on_update(transfer):
+        updates.append(transfer.state)
+
+    receiver.on_update = on_update
+    await receiver.on_ctcp('alice', '\x01DCC SEND file.bin 2130706433 5000 10\x01')
+    assert await receiver.accept(receiver.transfers[0]) == []
+    assert receiver.transfers[0].state == FAILED and updates == [OFFERED, FAILED]
+
+
+@pytest.mark.asyncio
+async def test_unaccepted_offer_expires(tmp_path):
+    receiver = DccManager(str(tmp_path), offer_timeout=0.01)
+    await receiver.on_ctcp('alice', '\x01DCC SEND file.bin 2130706433 5000 10\x01')
+    [transfer] = receiver.transfers
+    await asyncio.sleep(0.05)
+    assert receiver.transfers == [] and transfer.state == FAILED
+
+
+@pytest.mark.asyncio
+async def test_send_without_loop_sendfile(tmp_path, monkeypatch):
+    async def sendfile(*args):
+        raise NotImplementedError
+
+    monkeypatch.setattr(asyncio.get_running_loop(), 'sendfile', sendfile)
+    data = write_file(tmp_path / 'file.bin', 300_000)
+    sender = DccManager(str(tmp_path), buffer_size=64 * 1024)
+    receiver = DccManager(str(tmp_path / 'in'), auto_accept=True)
+    await receiver.on_ctcp('alice', ctcp(await sender.offer('bob', str(tmp_path / 'file.bin'))))
+    await wait_done(sender, receiver)
+    assert [transfer.state for transfer in sender.transfers + receiver.transfers] == [DONE, DONE]
+    assert (tmp_path / 'in' / 'file.bin').read_bytes() == data
@@ -0,0 +1,57 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from src.events import MEMBERS, MESSAGE, Event, EventBus
+
+
+@pytest.mark.asyncio
+async def test_decorated_handlers():
+    events = EventBus()
+    received = []
+
+    @events.on(MESSAGE)
+    async def on_message(payload):
+        received.append(payload)
+
+    await events.emit(MESSAGE, 'hello')
+    await events.emit(MEMBERS, 'ignored')
+    assert received == ['hello']
+
+    events.remove_handler(MESSAGE, on_message)
+    await events.emit(MESSAGE, 'again')
+    assert received == ['hello']
+
+
+@pytest.mark.asyncio
+async def test_stream_filters_and_unsubscribes():
+    events = EventBus()
+    stream = events.stream(MESSAGE)
+    reader = asyncio.create_task(anext(stream))
+    await asyncio.sleep(0)
+
+    await events.emit(MEMBERS, 'ignored')
+    await events.emit(MESSAGE, 'hello')
+    assert await asyncio.wait_for(reader, 1) == Event(MESSAGE, 'hello')
+
+    await stream.aclose()
+    assert events._streams == []
+
+
+@pytest.mark.asyncio
+async def test_client_emits_events(irc_client):
+    lines = []
+
+    @irc_client.events.on(MESSAGE)
+    async def on_message(line):
+        lines.append(line)
+
+    await irc_client._process_response(':nick!user@host PRIVMSG #channel :hi')
+    assert lines[-1].text == '<nick (user@host)> hi'
+
+
+def test_package_does_not_import_qt():
+    code = 'import sys, src; sys.exit(any(name.startswith("PyQt6") for name in sys.modules))'
+    assert subprocess.run([sys.executable, '-c', code]).returncode == 0
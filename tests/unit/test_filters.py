@@ -0,0 +1,113 @@
+import re
+
+import pytest
+
+from src.filters import (
+    DROP,
+    HIGHLIGHT,
+    MASK,
+    REGEX,
+    ROUTE,
+    WORD,
+    FilterEngine,
+    FilterRule,
+    literal_prefix,
+    trie_pattern,
+)
+
+SPAM_HOST = FilterRule(MASK, '*!*@*.spam.example', DROP)
+LINKS = FilterRule(REGEX, r'https?://\S+', ROUTE, 'links')
+PYTHON = FilterRule(WORD, 'python')
+
+
+def test_trie_pattern_prefers_longest_word():
+    assert trie_pattern(['py', 'python', 'perl']) == 'p(?:erl|y(?:thon)?)'
+
+
+def test_highlight_whole_words_only():
+    engine = FilterEngine([PYTHON])
+    assert engine.match('a!b@c', 'I like Python!').action == HIGHLIGHT
+    assert engine.match('a!b@c', 'cpython internals') is None
+
+
+def test_own_nick_is_highlighted():
+    engine = FilterEngine()
+    assert engine.match('a!b@c', 'nick: hi', 'Nick').action == HIGHLIGHT
+    assert engine.match('a!b@c', 'nick: hi', 'other') is None
+
+
+def test_strongest_action_wins():
+    engine = FilterEngine([PYTHON, LINKS])
+    verdict = engine.match('a!b@c', 'python docs: https://docs.python.org')
+    assert (verdict.action, verdict.buffer) == (ROUTE, 'links')
+    assert verdict.rules == [PYTHON, LINKS]
+
+
+def test_ignore_mask_drops_before_text_rules():
+    engine = FilterEngine([PYTHON, SPAM_HOST])
+    verdict = engine.match('bot!x@node1.SPAM.example', 'python')
+    assert verdict.action == DROP and verdict.rules == [SPAM_HOST]
+    assert engine.hits == {PYTHON: 0, SPAM_HOST: 1}
+
+
+def test_rules_recompiled_on_change():
+    engine = FilterEngine([PYTHON])
+    assert engine.match('a!b@c', 'perl') is None
+    engine.add(FilterRule(WORD, 'perl', DROP))
+    assert engine.match('a!b@c', 'perl').action == DROP
+    engine.remove(PYTHON)
+    assert engine.match('a!b@c', 'python') is None
+    assert engine.rules == [FilterRule(WORD, 'perl', DROP)]
+
+
+def test_invalid_rules_rejected():
+    with pytest.raises(ValueError):
+        FilterEngine([FilterRule(WORD, 'x', 'explode')])
+    with pytest.raises(re.error):
+        FilterEngine([FilterRule(REGEX, '(')])
+
+
+def test_literal_prefix():
+    assert literal_prefix(r'ticket-\d+') == 'ticket-'
+    assert literal_prefix(r'https?://') == 'http'
+    assert literal_prefix(r'a\.b') == 'a.b'
+    assert literal_prefix('foo|bar') == ''
+    assert literal_prefix('(?i)foo') == ''
+    assert literal_prefix('[ab]c') == ''
+
+
+def test_masks_do_not_cross_separators():
+    engine = FilterEngine([FilterRule(MASK, 'bad*!*@*', DROP), FilterRule(MASK, '*!*@Exact.Host', HIGHLIGHT)])
+    assert engine.match('badguy!u@h', 'x').action == DROP
+    assert engine.match('good!bad@h', 'x') is None
+    assert engine.match('good!u@exact.host', 'x').action == HIGHLIGHT
+    assert engine.match('badguy!u@exact.host', 'x').action == DROP
+
+
+def test_regex_rules_compiled_on_their_own():
+    engine = FilterEngine(
+        [
+            FilterRule(REGEX, r'(?P<x>foo)\d', HIGHLIGHT),
+            FilterRule(REGEX, r'(?P<x>bar)\d', ROUTE, 'bars'),
+            FilterRule(REGEX, r'(?i)baz', HIGHLIGHT),
+            FilterRule(REGEX, r'(\w)\1{3}', DROP),
+        ]
+    )
+    assert engine.match('a!b@c', 'bar1').action == ROUTE
+    assert engine.match('a!b@c', 'foo1 BAZ').action == HIGHLIGHT
+    assert engine.match('a!b@c', 'zzzz').action == DROP
+    assert engine.match('a!b@c', 'zzz') is None
+
+
+def test_word_does_not_hide_stronger_regex():
+    spam = FilterRule(REGEX, 'spam.*buy', DROP)
+    engine = FilterEngine([FilterRule(WORD, 'spam'), spam])
+    verdict = engine.match('a!b@c', 'spam buy now')
+    assert verdict.action == DROP and spam in verdict.rules
+
+
+def test_regex_rules_found_in_any_case():
+    engine = FilterEngine([FilterRule(REGEX, r'ticket-\d+', ROUTE, 'tickets')])
+    assert engine.match('a!b@c', 'see TICKET-42').action == ROUTE
+    assert engine.match('a!b@c', 'смотри ticket-42').action == ROUTE
+    assert engine.match('a!b@c', 'смотри ticket') is None
@@ -0,0 +1,47 @@
+from src.isupport import ISupport
+
+
+def test_update():
+    isupport = ISupport()
+    isupport.update(['ELIST=mu', 'SAFELIST', 'NETWORK=Test\\x20Net', 'EXCEPTS'])
+    assert isupport.elist == 'MU'
+    assert 'SAFELIST' in isupport
+    assert isupport.get('NETWORK') == 'Test Net'
+
+    isupport.update(['-EXCEPTS'])
+    assert 'EXCEPTS' not in isupport
+
+
+def test_prefix_tables():
+    isupport = ISupport()
+    isupport.update(['PREFIX=(Yov)!@+', 'CHANTYPES=#', 'CHANMODES=b,k,l,imnt'])
+    assert isupport.prefix == {'Y': '!', 'o': '@', 'v': '+'}
+    assert isupport.prefix_ranks == {'!': 0, '@': 1, '+': 2}
+    assert isupport.highest_prefix('+@') == '@'
+    assert isupport.highest_prefix('') == ''
+    assert isupport.is_channel('#chan')
+    assert not isupport.is_channel('&chan')
+    assert isupport.parse_modes('+Ybk-l', ['nick', 'mask', 'key']) == [
+        (True, 'Y', 'nick'),
+        (True, 'b', 'mask'),
+        (True, 'k', 'key'),
+        (False, 'l', None),
+    ]
+
+
+def test_split_prefixes():
+    isupport = ISupport()
+    assert isupport.split_prefixes('@+op') == ('@+', 'op')
+    assert isupport.split_prefixes('nick') == ('', 'nick')
+    # Prefixes only ever come highest first, the rest belongs to the nick
+    assert isupport.split_prefixes('+@nick') == ('+', '@nick')
+    assert isupport.split_prefixes('@@nick') == ('@', '@nick')
+
+
+def test_reset_restores_defaults():
+    isupport = ISupport()
+    isupport.update(['CASEMAPPING=ascii', 'CHANTYPES=!'])
+    assert isupport.casefold('[A]') == '[a]'
+    isupport.reset()
+    assert isupport.casefold('[A]') == '{a}'
+    assert isupport.chantypes == {'#', '&'}
@@ -0,0 +1,62 @@
+import pytest
+
+from src.logstore import LogEntry, LogStore
+
+
+@pytest.fixture
+def log_store(tmp_path):
+    store = LogStore(str(tmp_path / 'log.sqlite3'))
+    yield store
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_search(log_store):
+    log_store.append('#python', '<alice> asyncio question', timestamp=1)
+    log_store.append('#python', '<bob> answer about "asyncio"', timestamp=2)
+    log_store.append('#linux', '<carol> asyncio in kernel?', timestamp=3)
+    log_store.append(None, '<server> welcome', timestamp=4)
+
+    assert await log_store.search('asyncio', limit=2) == [
+        LogEntry(3, '#linux', '<carol> asyncio in kernel?'),
+        LogEntry(2, '#python', '<bob> answer about "asyncio"'),
+    ]
+    assert await log_store.search('"asyncio', channel='#python') == [
+        LogEntry(2, '#python', '<bob> answer about "asyncio"'),
+        LogEntry(1, '#python', '<alice> asyncio question'),
+    ]
+    assert await log_store.search('welcome', channel='') == [LogEntry(4, '', '<server> welcome')]
+    assert await log_store.search('missing') == []
+
+
+@pytest.mark.asyncio
+async def test_export(log_store, tmp_path):
+    log_store.append('#python', 'first')
+    log_store.append('#linux', 'other')
+    log_store.append('#python', 'второй')
+    path = tmp_path / 'export.txt'
+    await log_store.export('#python', str(path), 'cp1251')
+    lines = path.read_text(encoding='cp1251').splitlines()
+    assert [line.split('] ', 1)[1] for line in lines] == ['first', 'второй']
+
+
+def test_persists_between_sessions(tmp_path):
+    path = str(tmp_path / 'log.sqlite3')
+    store = LogStore(path)
+    store.append('#a', 'line')
+    store.close()
+
+    store = LogStore(path)
+    assert store._search('line', None, 10)[0].text == 'line'
+    store.close()
+
+
+def test_append_after_close_is_dropped(tmp_path):
+    store = LogStore(str(tmp_path / 'log.sqlite3'))
+    store.append('#a', 'kept')
+    store.close()
+    store.append('#a', 'late')
+    store.flush()
+    store.close()
+    assert store._search('late', None, 10) == []
+    assert [entry.text for entry in store._search('kept', None, 10)] == ['kept']
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from src.client import IrcClient
+from src.manager import ConnectionManager, Session, merge_stats, session_name
+
+
+async def handle_connection(reader, writer):
+    nick = '*'
+    while (line := await reader.readline()) and not line.startswith(b'QUIT'):
+        command, *params = line.decode().split()
+        if command == 'NICK':
+            nick = params[0]
+        elif command == 'USER':
+            writer.write(f':host 001 {nick} :Welcome\r\n'.encode())
+        elif command == 'JOIN':
+            writer.write(f':{nick}!user@host JOIN {params[0]}\r\n'.encode())
+    writer.close()
+
+
+async def wait_for_stat(manager: ConnectionManager, key: str, expected: int):
+    while manager.stats()[key] != expected:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_sessions_share_one_loop():
+    server = await asyncio.start_server(handle_connection, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    manager = ConnectionManager(flood_rate=0)
+    sessions = [Session('127.0.0.1', port, f'bot{i}', channels=('#channel',)) for i in range(3)]
+    for session in sessions:
+        manager.add(session)
+    with pytest.raises(ValueError):
+        manager.add(sessions[0])
+
+    await asyncio.wait_for(wait_for_stat(manager, 'joined_channels', 3), 5)
+    assert manager.stats()['registered'] == 3
+    assert all(client.handlers is IrcClient.handlers for client in manager)
+
+    await manager.remove(session_name(sessions[0]))
+    assert len(manager) == 2 and session_name(sessions[0]) not in manager
+    await manager.close()
+    assert manager.stats()['sessions'] == 0
+    server.close()
+
+
+def test_merge_stats():
+    shards = [{'sessions': 2, 'max_command_latency': 0.5}, {'sessions': 3, 'max_command_latency': 0.25}]
+    assert merge_stats(shards) == {'sessions': 5, 'max_command_latency': 0.5}
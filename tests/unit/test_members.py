@@ -0,0 +1,66 @@
+from src.isupport import ISupport
+from src.members import Member, MemberIndex
+from src.membership import ChannelMembership
+
+
+def make_index() -> MemberIndex:
+    return MemberIndex(ISupport())
+
+
+def test_sorted_by_membership_then_nick():
+    index = make_index()
+    index.add('zed')
+    index.add('bob', '+')
+    index.add('Alice')
+    index.add('op', '@')
+    assert [member.nick for member in index] == ['op', 'bob', 'Alice', 'zed']
+
+
+def test_sorted_by_server_prefix_ranks():
+    isupport = ISupport()
+    isupport.update(['PREFIX=(Yov)!@+'])
+    index = MemberIndex(isupport)
+    for name in ('!admin', '@op', '+v', 'plain'):
+        index.add(*reversed(isupport.split_prefixes(name)))
+    assert [(member.nick, member.rank) for member in index] == [('admin', 0), ('op', 1), ('v', 2), ('plain', 3)]
+    index.set_prefix('admin', '!', False)
+    assert [member.nick for member in index] == ['op', 'v', 'admin', 'plain']
+    assert index.remove('admin').rank == 3 and len(index) == 3
+
+
+def test_casemapped_lookup():
+    index = make_index()
+    index.add('Nick[away]')
+    assert 'nick{AWAY}' in index
+    assert index.remove('NICK{away}') == Member(ChannelMembership.DEFAULT, 'Nick[away]', '', 5)
+    assert len(index) == 0
+
+
+def test_ascii_casemapping():
+    isupport = ISupport()
+    isupport.update(['CASEMAPPING=ascii'])
+    index = MemberIndex(isupport)
+    index.add('Nick[away]')
+    assert 'nick{away}' not in index
+    assert 'nick[AWAY]' in index
+
+
+def test_rename_keeps_prefixes():
+    index = make_index()
+    index.add('old', '@')
+    old, new = index.rename('old', 'new')
+    assert old == Member(ChannelMembership.OPERATOR, 'old', '@', 2)
+    assert new == Member(ChannelMembership.OPERATOR, 'new', '@', 2)
+    assert 'old' not in index
+    assert list(index) == [new]
+
+
+def test_set_prefix_tracks_all_modes():
+    index = make_index()
+    index.add('nick', '+')
+    _, member = index.set_prefix('nick', '@', True)
+    assert member.prefix == '@'
+    _, member = index.set_prefix('nick', '@', False)
+    assert member.prefix == '+'
+    assert index.set_prefix('nick', '+', True) is None
+    assert index.set_prefix('missing', '+', True) is None
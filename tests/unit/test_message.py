@@ -0,0 +1,31 @@
+import pytest
+
+from src.message import Message, parse_message, parse_prefix
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('PING :irc.host\r\n', Message({}, None, 'PING', ['irc.host'])),
+    (':irc.host 322 me #chan 12 :topic: with colon',
+     Message({}, 'irc.host', '322', ['me', '#chan', '12', 'topic: with colon'])),
+    (':nick!user@host JOIN #chan', Message({}, 'nick!user@host', 'JOIN', ['#chan'])),
+    (':nick!user@host PRIVMSG #chan ::)', Message({}, 'nick!user@host', 'PRIVMSG', ['#chan', ':)'])),
+    (':nick!user@host QUIT :', Message({}, 'nick!user@host', 'QUIT', [''])),
+    ('@id=1;time=2023-01-01T00:00:00Z;flag :n!u@h privmsg #c :hi',
+     Message({'id': '1', 'time': '2023-01-01T00:00:00Z', 'flag': ''}, 'n!u@h', 'PRIVMSG', ['#c', 'hi'])),
+    ('@a=x\\sy\\:z\\\\ PING :t', Message({'a': 'x y;z\\'}, None, 'PING', ['t'])),
+    ('', Message({}, None, '', [])),
+])
+def test_parse_message(line, expected):
+    assert parse_message(line) == expected
+
+
+def test_message_properties():
+    message = parse_message(':nick!user@host PRIVMSG #chan :hello world')
+    assert message.nick == 'nick'
+    assert message.full_name == 'user@host'
+    assert message.trailing == 'hello world'
+
+
+def test_parse_prefix():
+    assert parse_prefix('nick!user@host') == ('nick', 'user', 'host')
+    assert parse_prefix('irc.server') == ('irc.server', '', '')
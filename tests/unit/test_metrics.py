@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from src.client import Command, IrcClient
+from src.metrics import Metrics, WireTrace, serve_metrics
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data: bytes):
+        self.data += data
+
+
+def test_counters_and_histograms():
+    metrics = Metrics(buckets=(0.001, 0.01))
+    metrics.inc('lines_received_total', 'PRIVMSG')
+    metrics.inc('lines_received_total', 'PRIVMSG')
+    metrics.inc('lines_received_total', 'PING')
+    metrics.inc('bytes_sent_total', amount=120)
+    for value in (0.0005, 0.001, 0.005, 1):
+        metrics.observe('handler_seconds', value, 'PRIVMSG')
+
+    text = metrics.render()
+    assert '# TYPE irc_lines_received_total counter' in text
+    assert 'irc_lines_received_total{command="PRIVMSG"} 2\n' in text
+    assert 'irc_bytes_sent_total 120\n' in text
+    assert 'irc_handler_seconds_bucket{command="PRIVMSG",le="0.001"} 2\n' in text
+    assert 'irc_handler_seconds_bucket{command="PRIVMSG",le="0.01"} 3\n' in text
+    assert 'irc_handler_seconds_bucket{command="PRIVMSG",le="+Inf"} 4\n' in text
+    assert 'irc_handler_seconds_count{command="PRIVMSG"} 4\n' in text
+
+    stats = metrics.stats()
+    assert stats['lines_received_total'] == 3
+    assert stats['lines_received_total:PING'] == 1
+    assert stats['handler_seconds_count'] == 4
+    assert stats['max_handler_seconds'] == 1
+
+
+def test_labels_are_escaped():
+    metrics = Metrics()
+    metrics.inc('lines_received_total', 'A"B\\C\n')
+    assert 'irc_lines_received_total{command="A\\"B\\\\C\\n"} 1' in metrics.render()
+
+
+def test_collectors_are_summed():
+    metrics = Metrics()
+
+    def first():
+        return [('queue_depth', 'chat', 2), ('joined_channels', '', 1)]
+
+    def second():
+        return [('queue_depth', 'chat', 3)]
+
+    metrics.add_collector(first)
+    metrics.add_collector(second)
+    assert 'irc_queue_depth{lane="chat"} 5\n' in metrics.render()
+    assert '# TYPE irc_joined_channels gauge' in metrics.render()
+    metrics.remove_collector(second)
+    assert metrics.stats()['queue_depth:chat'] == 2
+
+
+def test_trace_rotates_and_hides_credentials(tmp_path):
+    path = tmp_path / 'wire.log'
+    trace = WireTrace(str(path), max_bytes=200, backups=2)
+    trace.sent('AUTHENTICATE c2VjcmV0')
+    trace.received(':host 903 nick :SASL authentication successful')
+    for i in range(20):
+        trace.received(f':nick!user@host PRIVMSG #channel :line {i}')
+    trace.close()
+
+    assert (tmp_path / 'wire.log.1').exists()
+    assert not (tmp_path / 'wire.log.3').exists()
+    assert ':line 19' in path.read_text()
+    logged = ''.join(file.read_text() for file in tmp_path.iterdir())
+    assert 'c2VjcmV0' not in logged
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    metrics = Metrics()
+    metrics.inc('reconnects_total')
+    server = await serve_metrics(metrics, port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def get(path: str) -> bytes:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        response = await reader.read()
+        writer.close()
+        return response
+
+    response = await get('/metrics')
+    assert response.startswith(b'HTTP/1.1 200 OK')
+    assert response.endswith(b'irc_reconnects_total 1\n')
+    assert (await get('/')).startswith(b'HTTP/1.1 404')
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_client_records_metrics_and_trace(tmp_path, capsys):
+    metrics = Metrics()
+    trace = WireTrace(str(tmp_path / 'wire.log'))
+    client = IrcClient('testhost', '6667', 'nick', 'utf-8', metrics=metrics, trace=trace)
+    client.writer = FakeWriter()
+    metrics.add_collector(client._collect_metrics)
+
+    await client._process_response(':nick!user@host JOIN #channel')
+    await client._process_response(':alice!user@host PRIVMSG #channel :hi')
+    client._write_command(Command('PRIVMSG', ['#channel', ':hello']))
+    trace.close()
+
+    stats = metrics.stats()
+    assert stats['lines_received_total:PRIVMSG'] == 1
+    assert stats['handler_seconds_count'] == 2
+    assert stats['lines_sent_total:PRIVMSG'] == 1
+    assert stats['bytes_sent_total'] == len(client.writer.data)
+    assert stats['joined_channels'] == 1
+    assert '>> PRIVMSG #channel :hello' in (tmp_path / 'wire.log').read_text()
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.asyncio
+async def test_client_without_metrics_is_silent(irc_client, capsys):
+    irc_client.writer = FakeWriter()
+    await irc_client._process_response(':alice!user@host PRIVMSG #channel :hi')
+    irc_client._write_command(Command('PONG', [':host']))
+    assert irc_client.metrics is None and irc_client.trace is None
+    assert irc_client.writer.data == b'PONG :host\r\n'
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,59 @@
+from src.channel_list import Channel, ChannelListUpdate
+from src.members import Member, MembersUpdate
+from src.membership import ChannelMembership
+from src.models import ChannelListModel, MemberListModel
+
+OPERATOR = Member(ChannelMembership.OPERATOR, 'op', '@', 2)
+ALICE = Member(ChannelMembership.DEFAULT, 'alice', '', 5)
+BOB = Member(ChannelMembership.DEFAULT, 'Bob', '', 5)
+
+
+def test_channel_list_model():
+    model = ChannelListModel()
+    model.append_channels([Channel('#a', 5, 'topic')])
+    model.append_channels([Channel('#b', 10, '')])
+    assert model.rowCount() == 2
+    assert model.data(model.index(1, 1)) == 10
+    assert model.channel(0) == Channel('#a', 5, 'topic')
+
+    model.clear()
+    assert model.rowCount() == 0
+
+
+def test_member_list_model_keeps_order():
+    model = MemberListModel()
+    model.apply(MembersUpdate('#channel', added=[BOB, ALICE], reset=True))
+    model.apply(MembersUpdate('#channel', added=[OPERATOR]))
+    assert [model.member(row) for row in range(model.rowCount())] == [OPERATOR, ALICE, BOB]
+    assert model.data(model.index(0)) == '@op'
+
+
+def test_member_list_model_emits_incremental_signals():
+    model = MemberListModel()
+    model.apply(MembersUpdate('#channel', added=[ALICE, BOB], reset=True))
+    inserted, removed = [], []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+
+    model.apply(MembersUpdate('#channel', added=[OPERATOR], removed=[BOB]))
+    assert inserted == [(0, 0)]
+    assert removed == [(1, 1)]
+    assert [model.member(row) for row in range(model.rowCount())] == [OPERATOR, ALICE]
+
+
+def test_member_list_model_applies_changes():
+    model = MemberListModel()
+    model.apply(MembersUpdate('#channel', added=[ALICE, BOB], reset=True))
+    model.apply(MembersUpdate('#channel', changed=[(BOB, Member(ChannelMembership.VOICE, 'Bob', '+', 4))]))
+    assert model.data(model.index(0)) == '+Bob'
+
+
+def test_channel_list_model_applies_diff():
+    model = ChannelListModel()
+    model.apply(ChannelListUpdate([Channel('#a', 5, ''), Channel('#b', 1, ''), Channel('#c', 2, '')], True, True))
+    model.apply(ChannelListUpdate([Channel('#b', 3, 'new'), Channel('#d', 1, '')], False, True, ['#a']))
+    assert [model.channel(row) for row in range(model.rowCount())] == [
+        Channel('#b', 3, 'new'),
+        Channel('#c', 2, ''),
+        Channel('#d', 1, ''),
+    ]
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.reader import LineProtocol
+
+
+class FakeTransport:
+    def __init__(self):
+        self.reading = True
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def is_closing(self):
+        return False
+
+
+def make_protocol(**kwargs) -> LineProtocol:
+    protocol = LineProtocol(**kwargs)
+    protocol.connection_made(FakeTransport())
+    return protocol
+
+
+@pytest.mark.asyncio
+async def test_lines_split_across_chunks():
+    protocol = make_protocol()
+    protocol.data_received(b'PING :one\r\nPRIVMSG #channel :t')
+    protocol.data_received(b'wo\r')
+    assert await protocol.read_lines() == [b'PING :one']
+    protocol.data_received(b'\nbare\n\r\n')
+    assert await protocol.read_lines() == [b'PRIVMSG #channel :two', b'bare']
+
+
+@pytest.mark.asyncio
+async def test_read_waits_for_data():
+    protocol = make_protocol()
+    reader = asyncio.create_task(protocol.read_lines())
+    await asyncio.sleep(0)
+    assert not reader.done()
+    protocol.data_received(b'line\r\n')
+    assert await asyncio.wait_for(reader, 1) == [b'line']
+
+
+@pytest.mark.asyncio
+async def test_overlong_lines_are_dropped():
+    protocol = make_protocol(max_line_length=10)
+    protocol.data_received(b'short\r\n' + b'x' * 20 + b'\r\nok\r\n')
+    protocol.data_received(b'y' * 15)
+    protocol.data_received(b'y' * 15 + b'\r\nafter\r\n')
+    assert await protocol.read_lines() == [b'short', b'ok', b'after']
+    assert protocol.overlong == 2
+
+
+@pytest.mark.asyncio
+async def test_reading_pauses_at_high_water():
+    protocol = make_protocol(high_water=3)
+    protocol.data_received(b'a\r\nb\r\nc\r\n')
+    assert not protocol.transport.reading
+    assert len(await protocol.read_lines()) == 3
+    assert protocol.transport.reading
+
+
+@pytest.mark.asyncio
+async def test_eof_and_errors():
+    protocol = make_protocol()
+    protocol.data_received(b'last\r\n')
+    protocol.eof_received()
+    assert await protocol.read_lines() == [b'last']
+    assert await protocol.read_lines() == []
+
+    protocol = make_protocol()
+    protocol.connection_lost(ConnectionResetError())
+    with pytest.raises(ConnectionResetError):
+        await protocol.read_lines()
@@ -0,0 +1,29 @@
+from src.scrollback import Scrollback
+
+
+def test_keeps_last_lines_in_memory():
+    scrollback = Scrollback(max_lines=3)
+    scrollback.extend(str(i) for i in range(5))
+    assert list(scrollback) == ['2', '3', '4']
+    assert len(scrollback) == 5
+    assert scrollback.first_index == 2
+    assert scrollback.lines(0, 5) == ['2', '3', '4']
+
+
+def test_spills_older_lines():
+    scrollback = Scrollback(max_lines=3, spill=True)
+    scrollback.extend(f'line {i}' for i in range(10))
+    assert list(scrollback) == ['line 7', 'line 8', 'line 9']
+    assert scrollback.first_index == 0
+    assert scrollback.lines(0, 2) == ['line 0', 'line 1']
+    assert scrollback.lines(5, 9) == ['line 5', 'line 6', 'line 7', 'line 8']
+    assert scrollback.lines(6, 7) == ['line 6']
+    assert scrollback.lines(8, 100) == ['line 8', 'line 9']
+    scrollback.close()
+
+
+def test_spill_keeps_unicode():
+    scrollback = Scrollback(max_lines=1, spill=True)
+    scrollback.extend(['привет', 'мир'])
+    assert scrollback.lines(0, 2) == ['привет', 'мир']
+    scrollback.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from src.splitter import MAX_LINE_BYTES, default_hostmask, payload_size, split_message
+
+TEXT = 'Съешь же ещё этих мягких французских булок, да выпей чаю. ' * 50
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'cp1251', 'koi8-r'])
+def test_chunks_fit_and_keep_text(encoding):
+    chunks = split_message(TEXT, encoding, 100)
+    assert all(len(chunk.encode(encoding)) <= 100 for chunk in chunks)
+    assert ' '.join(chunks) == TEXT
+
+
+def test_prefers_whitespace():
+    assert split_message('hello world foo', 'utf-8', 11) == ['hello world', 'foo']
+
+
+def test_long_word_cut_on_codepoints():
+    chunks = split_message('приветмир', 'utf-8', 5)
+    assert chunks == ['пр', 'ив', 'ет', 'ми', 'р']
+
+
+def test_combining_marks_stay_with_base():
+    text = 'é' * 3
+    assert split_message(text, 'utf-8', 5) == ['é', 'é', 'é']
+
+
+def test_newlines_start_new_messages():
+    assert split_message('first\r\nsecond\n\nthird', 'utf-8', 100) == ['first', 'second', 'third']
+
+
+def test_formatting_codes_are_not_newlines():
+    text = '\x1ditalic\x1d and \x1estrike\x1e text\x0b\x0c\x1c\x85\u2028'
+    assert split_message(text, 'utf-8', 400) == [text]
+
+
+def test_emoji_sequences_stay_together():
+    assert split_message('xxx\U0001f441\u200d\U0001f5e8', 'utf-8', 12) == ['xxx', '\U0001f441\u200d\U0001f5e8']
+    assert split_message('xxxxxx\U0001f44d\U0001f3fd', 'utf-8', 10) == ['xxxxxx', '\U0001f44d\U0001f3fd']
+
+
+def test_unencodable_characters_replaced():
+    assert split_message('привет ✓', 'cp1251', 100) == ['привет ?']
+
+
+def test_payload_size_uses_full_line():
+    hostmask = 'nick!user@host.example'
+    size = payload_size(hostmask, 'PRIVMSG', '#channel', 'utf-8')
+    line = f':{hostmask} PRIVMSG #channel :{"x" * size}\r\n'
+    assert len(line.encode()) == MAX_LINE_BYTES
+    assert payload_size(default_hostmask('nick'), 'PRIVMSG', '#channel', 'utf-8') < size
+
+
+def test_no_room():
+    with pytest.raises(ValueError):
+        split_message('text', 'utf-8', 0)
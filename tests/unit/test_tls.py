@@ -0,0 +1,89 @@
+import asyncio
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+from src.client import IrcClient
+from src.tls import FingerprintMismatchError, certificate_fingerprint, create_context, normalize_fingerprint
+
+pytestmark = pytest.mark.skipif(shutil.which('openssl') is None, reason='openssl is needed to make a certificate')
+
+
+@pytest.fixture(scope='module')
+def certificate(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tls')
+    certfile, keyfile = directory / 'cert.pem', directory / 'key.pem'
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost',
+         '-addext', 'subjectAltName=DNS:localhost', '-keyout', str(keyfile), '-out', str(certfile)],
+        check=True,
+        capture_output=True,
+    )
+    return str(certfile), str(keyfile)
+
+
+async def start_tls_server(certificate):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(*certificate)
+
+    async def handle_connection(reader, writer):
+        writer.write(b':host 001 nick :Welcome\r\n')
+        await reader.readline()
+        writer.close()
+
+    server = await asyncio.start_server(handle_connection, 'localhost', 0, ssl=context)
+    return server, server.sockets[0].getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resumes_session(irc_client, certificate):
+    server, port = await start_tls_server(certificate)
+    irc_client.host, irc_client.port = 'localhost', port
+    irc_client.tls = create_context(cafile=certificate[0])
+
+    for resumed in (False, True):
+        await irc_client.connect()
+        assert irc_client.tls_resumed is resumed
+        await asyncio.wait_for(irc_client.handle(), 5)
+    assert list(irc_client.tls.sessions) == ['localhost']
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_pinning(irc_client, certificate):
+    server, port = await start_tls_server(certificate)
+    irc_client.host, irc_client.port = 'localhost', port
+    irc_client.tls = create_context(verify=False)
+    with open(certificate[0]) as cert_file:
+        der = ssl.PEM_cert_to_DER_cert(cert_file.read())
+
+    irc_client.fingerprint = ':'.join(f'{byte:02X}' for byte in bytes.fromhex(certificate_fingerprint(der)))
+    await irc_client.connect()
+    irc_client.writer.close()
+
+    irc_client.fingerprint = '00' * 32
+    with pytest.raises(FingerprintMismatchError):
+        await irc_client.connect()
+    server.close()
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_mismatch_stops_reconnecting(irc_client, certificate, mock_receiving_message_func):
+    server, port = await start_tls_server(certificate)
+    irc_client.host, irc_client.port = 'localhost', port
+    irc_client.tls = create_context(verify=False)
+    irc_client.fingerprint = '00' * 32
+    await asyncio.wait_for(irc_client.run(), 5)
+    assert 'does not match' in mock_receiving_message_func[1][-1].text
+    server.close()
+
+
+def test_fingerprint_needs_tls():
+    with pytest.raises(ValueError):
+        IrcClient('host', 6667, 'nick', 'utf-8', fingerprint='00' * 32)
+
+
+def test_normalize_fingerprint():
+    assert normalize_fingerprint(' AB:cd:01 ') == 'abcd01'
@@ -0,0 +1,62 @@
+from src.isupport import ISupport
+from src.members import MemberIndex
+from src.users import UserRegistry
+
+
+def make_indexes(*channels: str) -> tuple[UserRegistry, list[MemberIndex]]:
+    isupport = ISupport()
+    users = UserRegistry(isupport)
+    return users, [MemberIndex(isupport, users, channel) for channel in channels]
+
+
+def test_one_record_across_channels():
+    users, (one, two) = make_indexes('#One', '#two')
+    one.add('Alice', '@')
+    two.add('alice')
+    assert len(users) == 1
+    user = users.get('ALICE')
+    assert list(user.channels) == ['#one', '#two']
+    assert one.get('alice').nick is two.get('alice').nick is user.nick
+
+
+def test_record_dropped_with_last_channel():
+    users, (one, two) = make_indexes('#one', '#two')
+    one.add('alice')
+    two.add('alice')
+    one.remove('alice')
+    assert list(users.get('alice').channels) == ['#two']
+    two.clear()
+    assert 'alice' not in users
+
+
+def test_replace_parts_only_members_gone():
+    users, (one,) = make_indexes('#one')
+    for nick in ('alice', 'bob', 'carol'):
+        one.add(nick)
+    alice = users.get('alice')
+    one.replace(['@Alice', 'carol', '+dave'])
+    assert users.get('alice') is alice and 'bob' not in users
+    assert [(member.nick, member.prefix) for member in one] == [('alice', '@'), ('dave', '+'), ('carol', '')]
+    one.remove('dave')
+    assert len(one) == 2 and 'dave' not in users
+
+
+def test_rename_moves_record_once():
+    users, (one, two) = make_indexes('#one', '#two')
+    one.add('alice')
+    two.add('alice', '+')
+    user = users.get('alice')
+    one.rename('alice', 'Alicia')
+    _, renamed = two.rename('alice', 'Alicia')
+    assert users.get('alicia') is user
+    assert 'alice' not in users
+    assert renamed.nick == 'Alicia' and renamed.prefix == '+'
+
+
+def test_update_from_prefix():
+    users, (one,) = make_indexes('#one')
+    one.add('alice')
+    user = users.update('alice!ident@example.org')
+    assert user.full_name == 'ident@example.org'
+    assert users.update('stranger!ident@example.org') is None
+    assert 'stranger' not in users